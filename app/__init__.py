@@ -1,6 +1,15 @@
 from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
-from app.models import db, Server, MonitorLog, ScheduleTask, Threshold, MonitorReport, AdminUser, NotificationChannel, ServiceConfig, ServiceMonitorLog, GlobalSettings, OSSConfig
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from app.models import db, Server, MonitorLog, ScheduleTask, Threshold, MonitorReport, AdminUser, NotificationChannel, ServiceConfig, ServiceMonitorLog, GlobalSettings, OSSConfig, ServerLatestStatus, DiskMetric, upgrade_schema
+from app.latest_status import refresh_latest_status
+from app.disk_storage import rebase_disk_dependents
+from app.rollups import query_metric_history, rebuild_rollups, summarize_servers
+from app.retention import retention_worker
+from app.response_cache import dashboard_cache
+from app.worker_context import register_app
+from app.sqlite_profile import install_sqlite_profile, get_sqlite_profile
 from app.services import ServerService, ThresholdService
 from app.batch_import_service import BatchImportService
 from app.auth_service import AuthService
@@ -52,9 +61,13 @@ def create_app(config_object='config.Config'):
     # 确保报告目录存在
     os.makedirs(app.config['REPORT_DIR'], exist_ok=True)
     
-    # 初始化数据库
+    # 初始化数据库，SQLite连接在创建时统一执行PRAGMA（WAL、busy_timeout等）
+    install_sqlite_profile(app.config)
     db.init_app(app)
     
+    # 注册应用实例，后台线程通过它获取应用上下文
+    register_app(app)
+    
     # 创建服务实例
     server_service = ServerService()
     threshold_service = ThresholdService()
@@ -72,6 +85,15 @@ def create_app(config_object='config.Config'):
         # 创建数据库表
         db.create_all()
         
+        # 为已有的表补齐新增的列
+        added_columns = upgrade_schema()
+        if added_columns:
+            logger.info(f"数据库结构已升级，新增列/索引: {', '.join(added_columns)}")
+        
+        sqlite_profile = get_sqlite_profile(db.engine)
+        if sqlite_profile:
+            logger.info(f"SQLite 连接配置: {sqlite_profile}")
+        
         # 初始化默认阈值
         if not Threshold.query.first():
             threshold = Threshold(
@@ -95,6 +117,14 @@ def create_app(config_object='config.Config'):
             import traceback
             logger.error(f"调度器启动错误详情: {traceback.format_exc()}")
         
+        # 启动日志定期清理
+        if app.config.get('RETENTION_ENABLED'):
+            retention_worker.start(
+                app.config.get('RETENTION_INTERVAL_HOURS', 24),
+                app.config.get('RETENTION_MONITOR_LOG_DAYS', 30),
+                app.config.get('RETENTION_SERVICE_LOG_DAYS', 30)
+            )
+        
         # 启动服务监控循环
         logger.info("开始启动服务监控循环...")
         try:
@@ -244,80 +274,89 @@ def create_app(config_object='config.Config'):
     def dashboard():
         """仪表板数据"""
         try:
-            # 获取服务器统计
-            servers = server_service.get_active_servers()
-            total_servers = len(servers)
-            
-            # 获取最新服务器状态
-            server_status = host_monitor.get_latest_server_status()
-            
-            success_count = 0
-            warning_count = 0
-            failed_count = 0
-            
-            for server_id, status in server_status.items():
-                if status['status'] == 'success':
-                    success_count += 1
-                elif status['status'] == 'warning':
-                    warning_count += 1
-                else:
-                    failed_count += 1
-            
-            # 补充服务器名称和IP
-            server_dict = {s.id: {'name': s.name, 'host': s.host} for s in servers}
-            for server_id, status in server_status.items():
-                server_info = server_dict.get(server_id, {'name': f'服务器{server_id}', 'host': '未知'})
-                status['server_name'] = server_info['name']
-                status['server_ip'] = server_info['host']
-            
-            # 生成告警概览数据
-            alerts_overview = []
-            for server_id, status in server_status.items():
-                if status['status'] in ['warning', 'failed']:
-                    # 获取最新的监控日志以获取详细告警信息
-                    latest_log = MonitorLog.query.filter_by(server_id=server_id).order_by(MonitorLog.monitor_time.desc()).first()
-                    if latest_log:
-                        alert_details = []
-                        alert_info = latest_log.get_alert_info()
-                        
-                        for alert in alert_info:
-                            if alert['type'] == 'cpu':
-                                alert_details.append(f"CPU告警: CPU使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
-                            elif alert['type'] == 'memory':
-                                alert_details.append(f"内存告警: 内存使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
-                            elif alert['type'] == 'disk':
-                                alert_details.append(f"磁盘告警: 磁盘 {alert['mounted_on']} 使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
-                        
-                        if alert_details or status['status'] == 'failed':
-                            alerts_overview.append({
-                                'server_id': server_id,
-                                'server_name': status['server_name'],
-                                'server_ip': status['server_ip'],
-                                'status': status['status'],
-                                'alert_details': alert_details if alert_details else ['服务器连接失败'] if status['status'] == 'failed' else [],
-                                'monitor_time': status['monitor_time']
-                            })
-            
-            # 获取服务总览数据
-            services_overview = service_monitor_service.get_services_overview()
+            data = dashboard_cache.get_or_compute('dashboard', _build_dashboard_data)
             
             return jsonify({
                 'success': True,
-                'data': {
-                    'total_servers': total_servers,
-                    'success_count': success_count,
-                    'warning_count': warning_count,
-                    'failed_count': failed_count,
-                    'server_status': server_status,
-                    'alerts_overview': alerts_overview,  # 添加告警概览
-                    'services_overview': services_overview
-                }
+                'data': data
             })
             
         except Exception as e:
             logger.error(f"获取仪表板数据失败: {str(e)}")
             return jsonify({'success': False, 'message': str(e)})
     
+    def _build_dashboard_data():
+        """汇总仪表板数据（最新状态一次查出，不逐台查询监控日志）"""
+        # 获取服务器统计
+        servers = server_service.get_active_servers()
+        total_servers = len(servers)
+        
+        # 获取最新服务器状态（含告警详情）
+        server_status = host_monitor.get_latest_server_status(include_alerts=True)
+        
+        success_count = 0
+        warning_count = 0
+        failed_count = 0
+        
+        for server_id, status in server_status.items():
+            if status['status'] == 'success':
+                success_count += 1
+            elif status['status'] == 'warning':
+                warning_count += 1
+            else:
+                failed_count += 1
+        
+        # 补充服务器名称和IP
+        server_dict = {s.id: {'name': s.name, 'host': s.host} for s in servers}
+        for server_id, status in server_status.items():
+            server_info = server_dict.get(server_id, {'name': f'服务器{server_id}', 'host': '未知'})
+            status['server_name'] = server_info['name']
+            status['server_ip'] = server_info['host']
+        
+        # 生成告警概览数据
+        alerts_overview = []
+        for server_id, status in server_status.items():
+            alert_info = status.pop('alert_info', [])
+            if status['status'] not in ['warning', 'failed', 'timeout', 'circuit_open']:
+                continue
+            
+            alert_details = []
+            for alert in alert_info:
+                if alert['type'] == 'cpu':
+                    alert_details.append(f"CPU告警: CPU使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
+                elif alert['type'] == 'memory':
+                    alert_details.append(f"内存告警: 内存使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
+                elif alert['type'] == 'disk':
+                    alert_details.append(f"磁盘告警: 磁盘 {alert['mounted_on']} 使用率过高: {alert['value']:.2f}% (阈值: {alert['threshold']}%)")
+            
+            if alert_details or status['status'] in ['failed', 'timeout', 'circuit_open']:
+                if not alert_details:
+                    alert_details = [{
+                        'timeout': '巡视超时',
+                        'circuit_open': '连续连接失败，已熔断'
+                    }.get(status['status'], '服务器连接失败')]
+                alerts_overview.append({
+                    'server_id': server_id,
+                    'server_name': status['server_name'],
+                    'server_ip': status['server_ip'],
+                    'status': status['status'],
+                    'alert_details': alert_details,
+                    'monitor_time': status['monitor_time']
+                })
+        
+        # 获取服务总览数据
+        services_overview = service_monitor_service.get_services_overview()
+        
+        return {
+            'total_servers': total_servers,
+            'success_count': success_count,
+            'warning_count': warning_count,
+            'failed_count': failed_count,
+            'server_status': server_status,
+            'alerts_overview': alerts_overview,  # 添加告警概览
+            'services_overview': services_overview
+        }
+    
     @app.route('/api/server/<int:server_id>/disk-details')
     @login_required
     def get_server_disk_details(server_id):
@@ -338,8 +377,9 @@ def create_app(config_object='config.Config'):
                     }
                 })
             
+            # 增量保存的磁盘信息与完整快照合并后返回
             try:
-                disk_data = json.loads(latest_log.disk_info)
+                disk_data = latest_log.get_disk_info()
                 if not isinstance(disk_data, list):
                     disk_data = []
             except (json.JSONDecodeError, ValueError):
@@ -357,6 +397,146 @@ def create_app(config_object='config.Config'):
             logger.error(f"获取服务器磁盘详情失败: {str(e)}")
             return jsonify({'success': False, 'message': '获取磁盘详情失败'}), 500
     
+    @app.route('/api/disk-metrics/over-threshold')
+    @login_required
+    def get_disks_over_threshold():
+        """查询时间范围内使用率超过阈值的挂载点（按服务器和挂载点汇总）"""
+        try:
+            threshold = request.args.get('threshold', 90, type=float)
+            hours = request.args.get('hours', 24, type=int)
+            server_id = request.args.get('server_id', type=int)
+            since = datetime.now() - timedelta(hours=max(1, min(hours, 24 * 90)))
+            
+            # 走 (monitor_time, use_percent) 索引，不需要反序列化历史日志中的JSON
+            query = db.session.query(
+                DiskMetric.server_id,
+                DiskMetric.mounted_on,
+                func.max(DiskMetric.use_percent).label('max_use_percent'),
+                func.max(DiskMetric.monitor_time).label('last_seen'),
+                func.count(DiskMetric.id).label('samples')
+            ).filter(
+                DiskMetric.monitor_time >= since,
+                DiskMetric.use_percent > threshold
+            )
+            if server_id:
+                query = query.filter(DiskMetric.server_id == server_id)
+            query = query.group_by(DiskMetric.server_id, DiskMetric.mounted_on)
+            
+            # 增量日志只有变化的挂载点有指标行，未变化的挂载点沿用其完整快照的指标行
+            changed = aliased(DiskMetric)
+            carried = db.session.query(
+                DiskMetric.server_id,
+                DiskMetric.mounted_on,
+                func.max(DiskMetric.use_percent).label('max_use_percent'),
+                func.max(MonitorLog.monitor_time).label('last_seen'),
+                func.count(MonitorLog.id).label('samples')
+            ).join(
+                MonitorLog, MonitorLog.disk_snapshot_id == DiskMetric.monitor_log_id
+            ).filter(
+                MonitorLog.monitor_time >= since,
+                DiskMetric.use_percent > threshold,
+                ~db.session.query(changed.id).filter(
+                    changed.monitor_log_id == MonitorLog.id,
+                    changed.mounted_on == DiskMetric.mounted_on
+                ).exists()
+            )
+            if server_id:
+                carried = carried.filter(MonitorLog.server_id == server_id)
+            carried = carried.group_by(DiskMetric.server_id, DiskMetric.mounted_on)
+            
+            merged = {}
+            for row in list(query) + list(carried):
+                key = (row.server_id, row.mounted_on)
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = {
+                        'server_id': row.server_id,
+                        'mounted_on': row.mounted_on,
+                        'max_use_percent': row.max_use_percent,
+                        'last_seen': row.last_seen,
+                        'samples': row.samples
+                    }
+                else:
+                    current['max_use_percent'] = max(current['max_use_percent'], row.max_use_percent)
+                    current['last_seen'] = max(current['last_seen'], row.last_seen)
+                    current['samples'] += row.samples
+            rows = sorted(merged.values(), key=lambda item: -item['max_use_percent'])
+            
+            server_ids = list({row['server_id'] for row in rows})
+            servers = {
+                server.id: server for server in Server.query.filter(Server.id.in_(server_ids)).all()
+            } if server_ids else {}
+            
+            items = []
+            for row in rows:
+                server = servers.get(row['server_id'])
+                items.append({
+                    'server_id': row['server_id'],
+                    'server_name': server.name if server else None,
+                    'server_ip': server.host if server else None,
+                    'mounted_on': row['mounted_on'],
+                    'max_use_percent': row['max_use_percent'],
+                    'last_seen': row['last_seen'].isoformat() if row['last_seen'] else None,
+                    'samples': row['samples']
+                })
+            
+            return jsonify({
+                'success': True,
+                'data': {
+                    'threshold': threshold,
+                    'since': since.isoformat(),
+                    'disks': items
+                }
+            })
+        except Exception as e:
+            logger.error(f"查询磁盘使用率超阈值记录失败: {str(e)}")
+            return jsonify({'success': False, 'message': '查询磁盘指标失败'}), 500
+    
+    @app.route('/api/server/<int:server_id>/metrics/history')
+    @login_required
+    def get_server_metric_history(server_id):
+        """获取服务器指标历史（从满足时间范围的聚合粒度读取）"""
+        try:
+            Server.query.get_or_404(server_id)
+            
+            end_param = request.args.get('end')
+            start_param = request.args.get('start')
+            try:
+                end_dt = datetime.fromisoformat(end_param) if end_param else datetime.now()
+                if start_param:
+                    start_dt = datetime.fromisoformat(start_param)
+                else:
+                    start_dt = end_dt - timedelta(hours=request.args.get('hours', 24, type=int))
+            except ValueError:
+                return jsonify({'success': False, 'message': '时间格式错误'}), 400
+            if start_dt >= end_dt:
+                return jsonify({'success': False, 'message': '开始时间必须早于结束时间'}), 400
+            
+            data = query_metric_history(db.session, server_id, start_dt, end_dt, request.args.get('resolution'))
+            return jsonify({'success': True, 'data': data})
+        except Exception as e:
+            logger.error(f"获取服务器指标历史失败: {str(e)}")
+            return jsonify({'success': False, 'message': '获取指标历史失败'}), 500
+    
+    @app.route('/api/metrics/rollups/rebuild', methods=['POST'])
+    @login_required
+    def rebuild_metric_rollups():
+        """用原始监控日志重建指标聚合数据（升级后补建历史数据）"""
+        try:
+            data = request.get_json(silent=True) or {}
+            days = data.get('days')
+            start_dt = datetime.now() - timedelta(days=int(days)) if days else None
+            
+            rebuilt = rebuild_rollups(db.session, start=start_dt)
+            db.session.commit()
+            
+            logger.info(f"重建指标聚合数据完成，时间桶数: {rebuilt}")
+            return jsonify({'success': True, 'message': f'已重建 {rebuilt} 个时间桶', 'data': {'rebuilt': rebuilt}})
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"重建指标聚合数据失败: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)})
+    
     @app.route('/api/servers/with-services', methods=['GET'])
     @login_required
     def get_servers_with_service_stats():
@@ -368,47 +548,29 @@ def create_app(config_object='config.Config'):
             # 获取服务器列表
             result = server_service.get_server_list(page, per_page)
             
+            # 服务统计和最后监控时间（主机巡检）按页内服务器批量查询
+            page_server_ids = [server['id'] for server in result['servers']]
+            service_stats = service_monitor_service.get_service_stats_by_server(page_server_ids)
+            latest_times = dict(
+                db.session.query(ServerLatestStatus.server_id, ServerLatestStatus.monitor_time)
+                .filter(ServerLatestStatus.server_id.in_(page_server_ids)).all()
+            ) if page_server_ids else {}
+            
             # 为每个服务器添加服务统计信息
             for server in result['servers']:
                 server_id = server['id']
-                
-                # 获取该服务器的服务统计
-                services = ServiceConfig.query.filter_by(server_id=server_id).all()
-                total_services = len(services)
-                monitoring_services = len([s for s in services if s.is_monitoring])
-                
-                # 获取最新状态统计
-                normal_count = 0
-                error_count = 0
-                
-                for service in services:
-                    if not service.is_monitoring:
-                        continue
-                    
-                    latest_log = ServiceMonitorLog.query.filter_by(
-                        service_config_id=service.id
-                    ).order_by(ServiceMonitorLog.monitor_time.desc()).first()
-                    
-                    if latest_log:
-                        if latest_log.status == 'running':
-                            normal_count += 1
-                        elif latest_log.status in ['stopped', 'error']:
-                            error_count += 1
-                
-                # 获取服务器最后监控时间（主机巡检）
-                latest_monitor_log = MonitorLog.query.filter_by(
-                    server_id=server_id
-                ).order_by(MonitorLog.monitor_time.desc()).first()
+                stats = service_stats[server_id]
+                status_counts = stats['status_counts']
                 
                 last_monitor_time = None
-                if latest_monitor_log:
-                    last_monitor_time = latest_monitor_log.monitor_time.isoformat()
+                if latest_times.get(server_id):
+                    last_monitor_time = latest_times[server_id].isoformat()
                 
                 server.update({
-                    'total_services': total_services,
-                    'monitoring_services': monitoring_services,
-                    'normal_services': normal_count,
-                    'error_services': error_count,
+                    'total_services': stats['total_services'],
+                    'monitoring_services': stats['monitoring_services'],
+                    'normal_services': status_counts.get('running', 0),
+                    'error_services': status_counts.get('stopped', 0) + status_counts.get('error', 0),
                     'last_monitor_time': last_monitor_time
                 })
             
@@ -832,6 +994,37 @@ def create_app(config_object='config.Config'):
             logger.error(f"监控单个服务器失败: {str(e)}")
             return jsonify({'success': False, 'message': str(e)})
     
+    @app.route('/api/monitor/probe-fallback', methods=['GET'])
+    @login_required
+    def get_probe_fallback_hosts():
+        """获取探针输出不完整、暂时改用逐条命令采集的主机"""
+        try:
+            hosts = host_monitor.ssh_manager.get_probe_unsupported_hosts()
+            return jsonify({'success': True, 'data': hosts})
+        except Exception as e:
+            logger.error(f"获取探针不可用主机失败: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)})
+
+    @app.route('/api/monitor/probe-fallback/reset', methods=['POST'])
+    @login_required
+    def reset_probe_fallback_hosts():
+        """清除探针不可用记录（可指定server_id），下次巡视重新尝试探针脚本"""
+        try:
+            data = request.get_json(silent=True) or {}
+            host_key = None
+            if data.get('server_id'):
+                server = Server.query.get(data['server_id'])
+                if not server:
+                    return jsonify({'success': False, 'message': '服务器不存在'})
+                host_key = f"{server.host}:{server.port}"
+
+            cleared = host_monitor.ssh_manager.reset_probe_unsupported(host_key)
+            logger.info(f"已清除 {cleared} 条探针不可用记录")
+            return jsonify({'success': True, 'message': f'已清除 {cleared} 条记录', 'data': {'cleared': cleared}})
+        except Exception as e:
+            logger.error(f"清除探针不可用记录失败: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)})
+
     @app.route('/api/thresholds', methods=['GET'])
     @login_required
     def get_thresholds():
@@ -965,6 +1158,9 @@ def create_app(config_object='config.Config'):
                 page=page, per_page=per_page, error_out=False
             )
             
+            # 增量保存的磁盘信息所依赖的快照批量读取
+            MonitorLog.preload_disk_snapshots(pagination.items)
+            
             return jsonify({
                 'success': True,
                 'data': {
@@ -1013,9 +1209,14 @@ def create_app(config_object='config.Config'):
             
             log_info = f"日志ID: {log.id}, 服务器: {log.server.name if log.server else '未知'}, 时间: {log.monitor_time}"
             
-            # 删除数据库记录
+            # 删除数据库记录，以它为快照的增量日志先改写为完整磁盘列表
+            server_id = log.server_id
+            rebase_disk_dependents(db.session, [log.id])
             db.session.delete(log)
+            db.session.flush()
+            refresh_latest_status(db.session, [server_id])
             db.session.commit()
+            dashboard_cache.invalidate()
             
             logger.info(f"删除监控日志: {log_info}")
             return jsonify({'success': True, 'message': '日志删除成功'})
@@ -1051,13 +1252,17 @@ def create_app(config_object='config.Config'):
             deleted_count = len(logs)
             log_info_list = []
             
-            # 批量删除
+            # 批量删除，以这些日志为快照的增量日志先改写为完整磁盘列表
+            rebase_disk_dependents(db.session, [log.id for log in logs])
             for log in logs:
                 log_info = f"日志ID: {log.id}, 服务器: {log.server.name if log.server else '未知'}, 时间: {log.monitor_time}"
                 log_info_list.append(log_info)
                 db.session.delete(log)
             
+            db.session.flush()
+            refresh_latest_status(db.session, [log.server_id for log in logs])
             db.session.commit()
+            dashboard_cache.invalidate()
             
             logger.info(f"批量删除监控日志: {deleted_count}条")
             for info in log_info_list:
@@ -1085,23 +1290,48 @@ def create_app(config_object='config.Config'):
             if total_count == 0:
                 return jsonify({'success': False, 'message': '没有监控日志可删除'})
             
-            # 删除所有监控日志
-            MonitorLog.query.delete()
-            db.session.commit()
+            # 在后台按主键范围分批删除监控日志及其磁盘指标，不长时间占用写锁
+            if not retention_worker.submit('delete_all'):
+                return jsonify({'success': False, 'message': '已有日志清理任务在执行，请稍后再试'})
             
-            logger.info(f"一键删除所有监控日志成功，删除数量: {total_count}")
+            logger.info(f"已开始在后台删除所有监控日志，数量: {total_count}")
             
             return jsonify({
                 'success': True, 
-                'message': f'成功删除所有 {total_count} 条监控日志',
-                'deleted_count': total_count
+                'message': f'已开始在后台删除所有 {total_count} 条监控日志',
+                'deleted_count': total_count,
+                'background': True
             })
             
         except Exception as e:
-            db.session.rollback()
             logger.error(f"一键删除所有监控日志失败: {str(e)}")
             return jsonify({'success': False, 'message': str(e)})
     
+    @app.route('/api/logs/retention', methods=['GET'])
+    @login_required
+    def get_log_retention_status():
+        """获取日志清理任务状态和上一次运行的统计"""
+        return jsonify({'success': True, 'data': retention_worker.get_status()})
+    
+    @app.route('/api/logs/retention/run', methods=['POST'])
+    @login_required
+    def run_log_retention():
+        """立即在后台执行一次过期日志清理"""
+        try:
+            data = request.get_json(silent=True) or {}
+            monitor_days = int(data.get('monitor_days') or app.config.get('RETENTION_MONITOR_LOG_DAYS', 30))
+            service_days = int(data.get('service_days') or app.config.get('RETENTION_SERVICE_LOG_DAYS', 30))
+            
+            if not retention_worker.submit('retention', monitor_days=monitor_days, service_days=service_days):
+                return jsonify({'success': False, 'message': '已有日志清理任务在执行，请稍后再试'})
+            
+            return jsonify({
+                'success': True,
+                'message': f'已开始清理 {monitor_days} 天前的主机监控日志和 {service_days} 天前的服务监控日志'
+            })
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': '保留天数必须是整数'}), 400
+    
     @app.route('/api/reports', methods=['GET'])
     @login_required
     def get_reports():
@@ -1339,6 +1569,48 @@ def create_app(config_object='config.Config'):
             logger.error(f"生成报告失败: {str(e)}")
             return jsonify({'success': False, 'message': str(e)})
     
+    @app.route('/api/reports/summary', methods=['POST'])
+    @login_required
+    def generate_summary_report():
+        """按日期范围生成汇总报告（统计数据来自指标聚合表）"""
+        try:
+            data = request.get_json(silent=True) or {}
+            try:
+                start_dt = datetime.strptime(data['start_date'], '%Y-%m-%d')
+                end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'success': False, 'message': '请提供开始和结束日期（YYYY-MM-DD）'}), 400
+            if end_date < start_dt:
+                return jsonify({'success': False, 'message': '结束日期不能早于开始日期'}), 400
+            
+            summary = summarize_servers(db.session, start_dt, end_date + timedelta(days=1))
+            server_stats = summary['server_stats']
+            report_path = report_generator.generate_summary_report(start_dt, end_date, server_stats)
+            
+            if not report_path:
+                return jsonify({'success': False, 'message': '报告生成失败'})
+            
+            report = MonitorReport(
+                report_name=os.path.splitext(os.path.basename(report_path))[0],
+                report_type='summary',
+                report_path=report_path,
+                server_count=len(server_stats),
+                success_count=sum(stat['success_count'] for stat in server_stats),
+                failed_count=sum(stat['failed_count'] for stat in server_stats),
+                warning_count=sum(stat['warning_count'] for stat in server_stats)
+            )
+            db.session.add(report)
+            db.session.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': '报告生成成功',
+                'data': report.to_dict()
+            })
+        except Exception as e:
+            logger.error(f"生成汇总报告失败: {str(e)}")
+            return jsonify({'success': False, 'message': str(e)})
+    
     # 通知通道管理路由
     @app.route('/api/notifications', methods=['GET'])
     @login_required
@@ -1881,6 +2153,9 @@ def create_app(config_object='config.Config'):
         except Exception as e:
             logger.error(f"停止服务监控循环失败: {str(e)}")
         
+        # 停止日志清理线程
+        retention_worker.stop()
+        
         # 停止调度器
         if hasattr(scheduler_service, 'scheduler') and scheduler_service.scheduler:
             try:
@@ -0,0 +1,249 @@
+"""
+异步主机指标采集引擎
+基于 asyncio + asyncssh，在单个事件循环中并发采集大量主机的指标
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+from app.ssh_manager import (
+    SSHConnectionManager,
+    METRIC_PROBE_SCRIPT,
+    SYSTEM_INFO_COMMANDS,
+    TOP_CPU_COMMAND,
+    FREE_MEMORY_COMMAND,
+    DF_DISK_COMMAND,
+    parse_probe_sections,
+    parse_probe_metrics,
+    resolve_cpu_metrics,
+)
+from app.cpu_sampler import cpu_sampler, PROC_STAT_COMMAND
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHostCollector:
+    """异步主机指标采集器"""
+
+    def __init__(self, max_concurrency: int = 500, host_timeout: float = 60, connect_timeout: float = 30):
+        """
+        Args:
+            max_concurrency: 全局并发SSH会话上限
+            host_timeout: 单台主机的采集超时时间（秒），包含连接和命令执行
+            connect_timeout: SSH连接超时时间（秒）
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.host_timeout = host_timeout
+        self.connect_timeout = connect_timeout
+        # 后台事件循环（start/submit/close 方式使用）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._started_ids = set()
+
+    @staticmethod
+    def is_available() -> bool:
+        """asyncssh 是否可用"""
+        return asyncssh is not None
+
+    def collect(self, targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        并发采集所有目标主机的指标（阻塞直到全部完成或超时）
+
+        Args:
+            targets: 目标主机列表，每项包含 server_id、host、port、username、password、private_key_path
+
+        Returns:
+            与 targets 顺序一致的采集结果列表，每项包含 server_id、success、metrics、error_message、error（异常对象）、execution_time
+        """
+        if not self.is_available():
+            raise RuntimeError("未安装asyncssh，无法使用异步采集引擎")
+
+        if not targets:
+            return []
+
+        return asyncio.run(self._collect_all(targets))
+
+    def start(self):
+        """在后台线程中启动事件循环，之后用 submit 逐台提交主机"""
+        if not self.is_available():
+            raise RuntimeError("未安装asyncssh，无法使用异步采集引擎")
+
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._started_ids = set()
+        threading.Thread(target=self._run_loop, args=(self._loop,), name='async-host-collector', daemon=True).start()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, target: Dict[str, Any]) -> concurrent.futures.Future:
+        """
+        提交一台主机到后台事件循环
+
+        Args:
+            target: 目标主机，字段同 collect
+
+        Returns:
+            采集结果的Future，结果字段同 collect 的列表项；取消尚未开始采集的主机时调用其 cancel()
+        """
+        return asyncio.run_coroutine_threadsafe(self._collect_one(self._semaphore, target), self._loop)
+
+    def has_started(self, server_id: int) -> bool:
+        """主机是否已经开始采集（已取得并发名额）"""
+        return server_id in self._started_ids
+
+    def close(self):
+        """不再提交新主机，仍在采集的主机完成后停止后台事件循环（不阻塞调用方）"""
+        if self._loop is None:
+            return
+
+        async def _drain():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*tasks, return_exceptions=True)
+            asyncio.get_running_loop().stop()
+
+        asyncio.run_coroutine_threadsafe(_drain(), self._loop)
+        self._loop = None
+
+    async def _collect_all(self, targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """在事件循环中采集所有主机"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start_time = time.time()
+
+        results = await asyncio.gather(
+            *[self._collect_one(semaphore, target) for target in targets]
+        )
+
+        logger.info(f"异步采集完成: 主机数={len(targets)}, 并发上限={self.max_concurrency}, 耗时={time.time() - start_time:.2f}s")
+        return results
+
+    async def _collect_one(self, semaphore: asyncio.Semaphore, target: Dict[str, Any]) -> Dict[str, Any]:
+        """采集单台主机，受全局并发上限和单机超时约束"""
+        result = {
+            'server_id': target['server_id'],
+            'success': False,
+            'metrics': None,
+            'error_message': '',
+            'error': None,
+            'execution_time': 0
+        }
+
+        async with semaphore:
+            self._started_ids.add(target['server_id'])
+            start_time = time.time()
+            try:
+                result['metrics'] = await asyncio.wait_for(self._poll_host(target), timeout=self.host_timeout)
+                result['success'] = True
+            except asyncio.TimeoutError as e:
+                result['error'] = e
+                result['error_message'] = f"主机采集超时（{self.host_timeout}秒）"
+                logger.error(f"异步采集 {target['host']}:{target['port']} 超时")
+            except asyncssh.PermissionDenied as e:
+                result['error'] = e
+                result['error_message'] = "认证失败，请检查用户名和密码/私钥"
+                logger.error(f"异步采集 {target['host']}:{target['port']} 认证失败")
+            except Exception as e:
+                result['error'] = e
+                result['error_message'] = f"连接失败: {str(e)}"
+                logger.error(f"异步采集 {target['host']}:{target['port']} 失败: {str(e)}")
+            finally:
+                result['execution_time'] = time.time() - start_time
+
+        return result
+
+    async def _poll_host(self, target: Dict[str, Any]) -> Dict[str, Any]:
+        """连接主机并采集指标，优先使用探针脚本"""
+        connect_kwargs = {
+            'host': target['host'],
+            'port': target['port'],
+            'username': target['username'],
+            'known_hosts': None,
+            'connect_timeout': self.connect_timeout,
+        }
+
+        if target.get('private_key_path'):
+            connect_kwargs['client_keys'] = [target['private_key_path']]
+        elif target.get('password'):
+            connect_kwargs['password'] = target['password']
+            connect_kwargs['client_keys'] = None
+        else:
+            raise Exception("必须提供密码或私钥文件")
+
+        async with asyncssh.connect(**connect_kwargs) as conn:
+            probe = await conn.run('/bin/sh -s', input=METRIC_PROBE_SCRIPT, check=False)
+            sections = parse_probe_sections(probe.stdout or '')
+            if 'end' in sections:
+                metrics = parse_probe_metrics(sections)
+                resolve_cpu_metrics(metrics, f"{target['host']}:{target['port']}")
+
+                # 个别指标解析失败时只补采该指标，保留探针读到的CPU采样（立即再读 /proc/stat 差值没有意义）
+                if metrics['cpu_usage'] is None:
+                    metrics['cpu_usage'] = await self._top_cpu_usage(conn)
+                if metrics['memory_info'] is None:
+                    memory_text = await self._run_output(conn, FREE_MEMORY_COMMAND)
+                    metrics['memory_info'] = SSHConnectionManager._parse_memory_output(memory_text)
+                return metrics
+
+            # 探针不可用时逐条执行命令
+            return await self._poll_by_commands(conn, f"{target['host']}:{target['port']}")
+
+    @staticmethod
+    async def _run_output(conn, command: str) -> str:
+        """执行单条命令，失败时返回空字符串"""
+        completed = await conn.run(command, check=False)
+        if completed.exit_status != 0:
+            return ''
+        return completed.stdout or ''
+
+    async def _top_cpu_usage(self, conn) -> Optional[float]:
+        """读不到 /proc/stat 的主机回退到top"""
+        try:
+            return float((await self._run_output(conn, TOP_CPU_COMMAND)).strip().split()[0])
+        except (ValueError, IndexError):
+            return None
+
+    async def _poll_by_commands(self, conn, host_key: str) -> Dict[str, Any]:
+        """逐条命令采集指标，在同一连接上并发打开多个通道"""
+        def run(command: str):
+            return self._run_output(conn, command)
+
+        keys = list(SYSTEM_INFO_COMMANDS.keys())
+        outputs = await asyncio.gather(
+            *[run(SYSTEM_INFO_COMMANDS[key]) for key in keys],
+            run(PROC_STAT_COMMAND),
+            run(FREE_MEMORY_COMMAND),
+            run(DF_DISK_COMMAND)
+        )
+
+        system_info = {}
+        for key, output in zip(keys, outputs):
+            system_info[key] = output.strip() if output.strip() else "获取失败: 无输出"
+
+        proc_stat_text, memory_text, disk_text = outputs[len(keys):]
+        cpu_stats = cpu_sampler.sample(host_key, proc_stat_text) if proc_stat_text.strip() else None
+        cpu_usage = cpu_stats['usage'] if cpu_stats else None
+        if cpu_usage is None:
+            cpu_usage = await self._top_cpu_usage(conn)
+
+        return {
+            'system_info': system_info,
+            'cpu_usage': cpu_usage,
+            'cpu_stats': cpu_stats,
+            'memory_info': SSHConnectionManager._parse_memory_output(memory_text),
+            'disk_info': SSHConnectionManager._parse_disk_output(disk_text),
+            'collection_mode': 'async_command'
+        }
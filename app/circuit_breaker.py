@@ -0,0 +1,232 @@
+"""
+主机熔断模块
+按主机（host:port）记录连续的连接失败：达到阈值后熔断（open），熔断期间的连接请求直接失败，
+不再等待连接超时和重试间隔；冷却时间到后只放行一次探测连接（half_open），
+探测成功恢复（closed），失败则以加倍的冷却时间重新熔断
+"""
+
+import logging
+import math
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import paramiko
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """主机处于熔断状态，本次连接未实际尝试"""
+
+    def __init__(self, host_key: str, retry_in: float, last_error: Optional[str] = None):
+        self.host_key = host_key
+        self.retry_in = retry_in
+        self.last_error = last_error
+        message = f"主机 {host_key} 连续连接失败已熔断，{math.ceil(retry_in)} 秒后再次探测"
+        if last_error:
+            message += f"（最近错误: {last_error}）"
+        super().__init__(message)
+
+
+def is_unreachable_error(error: Exception) -> bool:
+    """
+    判断异常是否表示主机不可达（网络、握手层面的失败）
+
+    认证失败、配置错误等说明主机本身可以连通，不计入熔断。
+    """
+    if isinstance(error, paramiko.AuthenticationException):
+        return False
+    if asyncssh is not None and isinstance(error, asyncssh.DisconnectError):
+        # 异步采集引擎的握手、断连错误
+        return not isinstance(error, asyncssh.PermissionDenied)
+    return isinstance(error, (socket.timeout, socket.error, EOFError, paramiko.SSHException))
+
+
+class _HostCircuit:
+    """单台主机的熔断状态"""
+
+    def __init__(self, open_timeout: float):
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.open_timeout = open_timeout
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.last_error: Optional[str] = None
+        self.trips = 0
+        self.rejected = 0
+
+
+class HostCircuitBreaker:
+    """按主机维护熔断状态，线程安全"""
+
+    def __init__(self, failure_threshold: int = 3, open_timeout: float = 300,
+                 max_open_timeout: float = 1800, enabled: bool = True):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            open_timeout: 首次熔断的冷却时间（秒）
+            max_open_timeout: 探测连续失败时冷却时间加倍的上限（秒）
+            enabled: 是否启用熔断
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_timeout = open_timeout
+        self.max_open_timeout = max(open_timeout, max_open_timeout)
+        self.enabled = enabled
+        self._circuits: Dict[str, _HostCircuit] = {}
+        self._lock = threading.Lock()
+
+    def before_attempt(self, host_key: str):
+        """
+        连接前检查熔断状态
+
+        Args:
+            host_key: 主机标识 host:port
+
+        Raises:
+            CircuitOpenError: 主机处于熔断状态，或已有探测连接正在进行
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            circuit = self._circuits.get(host_key)
+            if circuit is None or circuit.state == CIRCUIT_CLOSED:
+                return
+
+            if circuit.state == CIRCUIT_OPEN:
+                retry_at = circuit.opened_at + circuit.open_timeout
+                if now >= retry_at:
+                    # 冷却结束，本次请求作为探测放行
+                    circuit.state = CIRCUIT_HALF_OPEN
+                    circuit.probe_started_at = now
+                    logger.info(f"主机 {host_key} 熔断冷却结束，尝试探测连接")
+                    return
+                circuit.rejected += 1
+                raise CircuitOpenError(host_key, retry_at - now, circuit.last_error)
+
+            # 半开状态只允许一个探测；探测方长时间没有回报结果时再放行一次
+            if now - circuit.probe_started_at >= circuit.open_timeout:
+                circuit.probe_started_at = now
+                return
+            circuit.rejected += 1
+            raise CircuitOpenError(host_key, circuit.probe_started_at + circuit.open_timeout - now, circuit.last_error)
+
+    def record_success(self, host_key: str):
+        """记录主机连接成功，熔断恢复"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            circuit = self._circuits.get(host_key)
+            if circuit is None:
+                return
+            if circuit.state != CIRCUIT_CLOSED:
+                logger.info(f"主机 {host_key} 连接恢复，解除熔断")
+            # 恢复后不保留状态，closed 且没有失败的主机不占用字典
+            del self._circuits[host_key]
+
+    def record_failure(self, host_key: str, error: Exception):
+        """
+        记录一次连接失败
+
+        Args:
+            host_key: 主机标识 host:port
+            error: 连接时的异常，非不可达类异常（认证失败、连接池等待超时等）不改变熔断状态
+        """
+        if not self.enabled or isinstance(error, CircuitOpenError):
+            return
+        if not is_unreachable_error(error):
+            self.release_probe(host_key)
+            return
+
+        now = time.time()
+        with self._lock:
+            circuit = self._circuits.get(host_key)
+            if circuit is None:
+                circuit = _HostCircuit(self.open_timeout)
+                self._circuits[host_key] = circuit
+            circuit.consecutive_failures += 1
+            circuit.last_error = str(error)[:200]
+
+            if circuit.state == CIRCUIT_HALF_OPEN:
+                # 探测失败，冷却时间加倍后重新熔断
+                circuit.open_timeout = min(circuit.open_timeout * 2, self.max_open_timeout)
+            elif circuit.state == CIRCUIT_OPEN or circuit.consecutive_failures < self.failure_threshold:
+                return
+
+            circuit.state = CIRCUIT_OPEN
+            circuit.opened_at = now
+            circuit.trips += 1
+            logger.warning(f"主机 {host_key} 连续 {circuit.consecutive_failures} 次连接失败，熔断 {int(circuit.open_timeout)} 秒")
+
+    def release_probe(self, host_key: str):
+        """探测请求没有得到网络层面的结果时让出探测名额，下一次请求可以立即探测"""
+        with self._lock:
+            circuit = self._circuits.get(host_key)
+            if circuit is not None and circuit.state == CIRCUIT_HALF_OPEN:
+                circuit.probe_started_at = 0.0
+
+    def reset(self, host_key: Optional[str] = None):
+        """
+        手动解除熔断
+
+        Args:
+            host_key: 主机标识 host:port，为空时解除全部
+        """
+        with self._lock:
+            if host_key is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(host_key, None)
+
+    def get_state(self, host_key: str) -> Dict[str, Any]:
+        """获取单台主机的熔断状态"""
+        with self._lock:
+            circuit = self._circuits.get(host_key)
+            return self._describe(circuit, time.time())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断统计信息（只列出有失败记录的主机）"""
+        now = time.time()
+        with self._lock:
+            hosts = {host_key: self._describe(circuit, now) for host_key, circuit in self._circuits.items()}
+
+        return {
+            'enabled': self.enabled,
+            'failure_threshold': self.failure_threshold,
+            'open_timeout': self.open_timeout,
+            'max_open_timeout': self.max_open_timeout,
+            'open_circuits': sum(1 for host in hosts.values() if host['state'] != CIRCUIT_CLOSED),
+            'rejected_attempts': sum(host['rejected'] for host in hosts.values()),
+            'hosts': hosts
+        }
+
+    @staticmethod
+    def _describe(circuit: Optional[_HostCircuit], now: float) -> Dict[str, Any]:
+        if circuit is None:
+            return {'state': CIRCUIT_CLOSED, 'consecutive_failures': 0}
+
+        retry_in = None
+        if circuit.state == CIRCUIT_OPEN:
+            retry_in = round(max(0.0, circuit.opened_at + circuit.open_timeout - now), 1)
+        return {
+            'state': circuit.state,
+            'consecutive_failures': circuit.consecutive_failures,
+            'open_timeout': circuit.open_timeout,
+            'retry_in': retry_in,
+            'trips': circuit.trips,
+            'rejected': circuit.rejected,
+            'last_error': circuit.last_error
+        }
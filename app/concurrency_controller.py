@@ -0,0 +1,182 @@
+"""
+巡视并发控制模块
+主机巡视的自适应并发（AIMD）：从较小的并发数开始，每完成一轮采集根据耗时、失败率和本机CPU
+调整同时进行的主机数——情况良好时加性增加，出现拥塞迹象时乘性减少
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100.0 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class AIMDConcurrencyController:
+    """加性增、乘性减的并发数控制器（只在提交任务的线程中使用，不需要加锁）"""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 latency_tolerance: float = 2.0, error_rate_threshold: float = 0.3,
+                 cpu_threshold: float = 85.0, decrease_factor: float = 0.5):
+        """
+        Args:
+            initial: 初始并发数
+            min_limit: 最小并发数
+            max_limit: 最大并发数
+            latency_tolerance: 一轮采集的P90耗时超过基线耗时的倍数时减少并发
+            error_rate_threshold: 一轮采集的失败率超过该值时减少并发
+            cpu_threshold: 本机CPU使用率（%）超过该值时减少并发（需要psutil）
+            decrease_factor: 减少并发时的乘数
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = max(self.min_limit, min(initial, self.max_limit))
+        self.initial_limit = self.limit
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.cpu_threshold = cpu_threshold
+        self.decrease_factor = decrease_factor
+
+        # 基线耗时：目前为止各轮采集中位数耗时的最小值
+        self.baseline_latency: Optional[float] = None
+        self.peak_limit = self.limit
+        self.decisions: List[Dict[str, Any]] = []
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._started_at = time.time()
+        # 减少并发前提交的任务仍处于拥塞状态，其耗时不计入下一轮
+        self._window_started_at = 0.0
+
+        if psutil is not None:
+            # 首次调用只建立采样起点
+            psutil.cpu_percent(interval=None)
+
+    def record(self, latency: float, success: bool, submitted_at: Optional[float] = None):
+        """
+        记录一台主机的采集结果
+
+        Args:
+            latency: 采集耗时（秒）
+            success: 是否采集成功
+            submitted_at: 任务提交时间，早于上次减少并发的任务不计入统计
+        """
+        if submitted_at is not None and submitted_at < self._window_started_at:
+            return
+        self._latencies.append(latency)
+        if not success:
+            self._errors += 1
+
+    def maybe_adjust(self) -> Optional[Dict[str, Any]]:
+        """
+        一轮（完成数达到当前并发数）采集结束后调整并发数
+
+        Returns:
+            本次调整的决策记录，未到调整时机时返回None
+        """
+        if len(self._latencies) < self.limit:
+            return None
+
+        samples = len(self._latencies)
+        error_rate = self._errors / samples
+        latency_p50 = _percentile(self._latencies, 50)
+        latency_p90 = _percentile(self._latencies, 90)
+        cpu_percent = psutil.cpu_percent(interval=None) if psutil is not None else None
+        self._latencies = []
+        self._errors = 0
+
+        if self.baseline_latency is None or latency_p50 < self.baseline_latency:
+            self.baseline_latency = latency_p50
+
+        reason = None
+        if error_rate > self.error_rate_threshold:
+            reason = f"失败率 {error_rate:.0%} 超过 {self.error_rate_threshold:.0%}"
+        elif cpu_percent is not None and cpu_percent > self.cpu_threshold:
+            reason = f"本机CPU {cpu_percent:.0f}% 超过 {self.cpu_threshold:.0f}%"
+        elif self.baseline_latency > 0 and latency_p90 > self.baseline_latency * self.latency_tolerance:
+            reason = f"P90耗时 {latency_p90:.2f}s 超过基线 {self.baseline_latency:.2f}s 的 {self.latency_tolerance:g} 倍"
+
+        previous = self.limit
+        if reason:
+            action = 'decrease'
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            self._window_started_at = time.time()
+        elif self.limit < self.max_limit:
+            action = 'increase'
+            reason = '耗时、失败率和CPU均正常'
+            self.limit += 1
+        else:
+            action = 'hold'
+            reason = '已达最大并发数'
+        self.peak_limit = max(self.peak_limit, self.limit)
+
+        decision = {
+            'elapsed': round(time.time() - self._started_at, 2),
+            'action': action,
+            'limit_before': previous,
+            'limit_after': self.limit,
+            'reason': reason,
+            'samples': samples,
+            'error_rate': round(error_rate, 3),
+            'latency_p50': round(latency_p50, 3),
+            'latency_p90': round(latency_p90, 3),
+            'cpu_percent': cpu_percent
+        }
+        self.decisions.append(decision)
+        if action == 'decrease':
+            logger.info(f"巡视并发数 {previous} -> {self.limit}: {reason}")
+        else:
+            logger.debug(f"巡视并发数 {previous} -> {self.limit}: {reason}")
+        return decision
+
+    def get_summary(self) -> Dict[str, Any]:
+        """获取本次巡视的并发控制摘要"""
+        return {
+            'mode': 'adaptive',
+            'initial_limit': self.initial_limit,
+            'final_limit': self.limit,
+            'peak_limit': self.peak_limit,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'baseline_latency': round(self.baseline_latency, 3) if self.baseline_latency is not None else None,
+            'cpu_monitoring': psutil is not None,
+            'decisions': self.decisions
+        }
+
+
+def create_sweep_controller(max_workers: int, initial: Optional[int] = None) -> Optional[AIMDConcurrencyController]:
+    """
+    按配置创建巡视并发控制器
+
+    Args:
+        max_workers: 最大并发数
+        initial: 初始并发数，为None时使用配置 ADAPTIVE_INITIAL_CONCURRENCY
+
+    Returns:
+        自适应模式下返回控制器，固定并发模式返回None
+    """
+    from config import Config
+
+    mode = (getattr(Config, 'MONITOR_CONCURRENCY_MODE', 'fixed') or 'fixed').lower()
+    if mode != 'adaptive':
+        return None
+
+    return AIMDConcurrencyController(
+        initial=initial if initial is not None else getattr(Config, 'ADAPTIVE_INITIAL_CONCURRENCY', 5),
+        min_limit=getattr(Config, 'ADAPTIVE_MIN_CONCURRENCY', 2),
+        max_limit=max_workers,
+        latency_tolerance=getattr(Config, 'ADAPTIVE_LATENCY_TOLERANCE', 2.0),
+        error_rate_threshold=getattr(Config, 'ADAPTIVE_ERROR_RATE', 0.3),
+        cpu_threshold=getattr(Config, 'ADAPTIVE_CPU_THRESHOLD', 85.0)
+    )
@@ -0,0 +1,120 @@
+"""
+基于 /proc/stat 的CPU采样模块
+缓存每台主机上一次的jiffies计数，用两次巡视之间的差值计算CPU使用率，远端无需sleep
+"""
+
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# /proc/stat cpu行的字段顺序
+PROC_STAT_FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal')
+
+# 读取 /proc/stat 中cpu行的命令
+PROC_STAT_COMMAND = "grep '^cpu' /proc/stat"
+
+
+def parse_proc_stat(output: str) -> Dict[str, List[int]]:
+    """
+    解析 /proc/stat 的cpu行
+
+    Args:
+        output: grep '^cpu' /proc/stat 的输出
+
+    Returns:
+        cpu名称（cpu、cpu0、cpu1...）到计数列表的字典，计数按 PROC_STAT_FIELDS 顺序，缺失字段补0
+    """
+    counters = {}
+    for line in output.strip().splitlines():
+        parts = line.split()
+        if len(parts) < 5 or not parts[0].startswith('cpu'):
+            continue
+        try:
+            values = [int(value) for value in parts[1:len(PROC_STAT_FIELDS) + 1]]
+        except ValueError:
+            continue
+        values += [0] * (len(PROC_STAT_FIELDS) - len(values))
+        counters[parts[0]] = values
+    return counters
+
+
+def _compute_usage(current: List[int], previous: List[int]) -> Optional[Dict[str, float]]:
+    """根据两次计数计算使用率、iowait和steal百分比"""
+    deltas = [cur - prev for cur, prev in zip(current, previous)]
+    total = sum(deltas)
+    if total <= 0 or any(delta < 0 for delta in deltas):
+        return None
+
+    idle = deltas[3] + deltas[4]  # idle + iowait
+    return {
+        'usage': round((total - idle) / total * 100.0, 2),
+        'iowait': round(deltas[4] / total * 100.0, 2),
+        'steal': round(deltas[7] / total * 100.0, 2)
+    }
+
+
+class ProcStatCPUSampler:
+    """/proc/stat CPU采样器"""
+
+    def __init__(self):
+        self._previous: Dict[str, Dict[str, List[int]]] = {}
+        self._lock = threading.Lock()
+
+    def sample(self, host_key: str, output: str) -> Optional[Dict[str, Any]]:
+        """
+        记录一次采样并计算与上一次采样之间的CPU使用情况
+
+        首次采样（或主机重启导致计数回绕）时没有可用的上一次计数，
+        以开机以来的累计值计算，sample_type 为 since_boot。
+
+        Args:
+            host_key: 主机标识（host:port）
+            output: grep '^cpu' /proc/stat 的输出
+
+        Returns:
+            包含 usage、iowait、steal、per_core、sample_type 的字典；无法解析时返回None
+        """
+        counters = parse_proc_stat(output)
+        if 'cpu' not in counters:
+            return None
+
+        with self._lock:
+            previous = self._previous.get(host_key)
+            self._previous[host_key] = counters
+
+        sample_type = 'delta'
+        overall = None
+        if previous and 'cpu' in previous:
+            overall = _compute_usage(counters['cpu'], previous['cpu'])
+
+        if overall is None:
+            sample_type = 'since_boot'
+            previous = {}
+            overall = _compute_usage(counters['cpu'], [0] * len(PROC_STAT_FIELDS))
+            if overall is None:
+                return None
+
+        per_core = []
+        for name in sorted((key for key in counters if key != 'cpu'), key=lambda key: int(key[3:] or 0)):
+            core = _compute_usage(counters[name], previous.get(name, [0] * len(PROC_STAT_FIELDS)))
+            if core is not None:
+                per_core.append({'cpu': name, **core})
+
+        return {
+            'usage': overall['usage'],
+            'iowait': overall['iowait'],
+            'steal': overall['steal'],
+            'per_core': per_core,
+            'sample_type': sample_type
+        }
+
+    def forget(self, host_key: str):
+        """丢弃某台主机缓存的计数"""
+        with self._lock:
+            self._previous.pop(host_key, None)
+
+
+# 全局采样器实例，线程池引擎与异步引擎共用
+cpu_sampler = ProcStatCPUSampler()
@@ -0,0 +1,141 @@
+"""
+服务器凭据提供模块
+加密密钥只解析一次并复用同一个 Fernet 实例，解密后的密码按服务器缓存，
+避免每次巡视都为每台主机重新构造 Fernet 并解密
+"""
+
+import base64
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cryptography.fernet import Fernet
+
+logger = logging.getLogger(__name__)
+
+
+def _credential_cache_ttl() -> float:
+    from config import Config
+    return float(getattr(Config, 'CREDENTIAL_CACHE_TTL', 300))
+
+
+class CredentialProvider:
+    """加密密钥、Fernet 实例和已解密密码的进程内缓存"""
+
+    def __init__(self, ttl: float):
+        """
+        Args:
+            ttl: 已解密密码的缓存有效期（秒），小于等于0时不缓存
+        """
+        self.ttl = ttl
+        self._cipher_key: Optional[bytes] = None
+        self._fernets: Dict[bytes, Fernet] = {}
+        # server_id -> (过期时间, updated_at, 密文, 明文)
+        self._entries: Dict[int, Tuple[float, object, str, str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0
+        }
+
+    def get_cipher_key(self, loader: Callable[[], Optional[bytes]]) -> bytes:
+        """
+        获取加密密钥，解析到有效的配置密钥后不再调用 loader
+
+        Args:
+            loader: 解析密钥的函数，没有有效的配置密钥时返回None
+
+        Returns:
+            加密密钥；没有有效的配置密钥时返回不缓存的临时密钥，配置修正后下次调用即可取得正确的密钥
+        """
+        with self._lock:
+            if self._cipher_key is not None:
+                return self._cipher_key
+        cipher_key = loader()
+        if cipher_key is None:
+            return Fernet.generate_key()
+        with self._lock:
+            if self._cipher_key is None:
+                self._cipher_key = cipher_key
+            return self._cipher_key
+
+    def get_fernet(self, cipher_key: bytes) -> Fernet:
+        """获取密钥对应的 Fernet 实例（Fernet 无内部状态，可在线程间共享）"""
+        fernet = self._fernets.get(cipher_key)
+        if fernet is None:
+            fernet = Fernet(cipher_key)
+            with self._lock:
+                self._fernets[cipher_key] = fernet
+        return fernet
+
+    def decrypt(self, cipher_key: bytes, encrypted_password: str) -> str:
+        """
+        解密密码（不使用密码缓存）
+
+        Args:
+            cipher_key: 加密密钥
+            encrypted_password: base64编码的密文
+
+        Returns:
+            明文密码
+        """
+        encrypted_data = base64.b64decode(encrypted_password.encode())
+        return self.get_fernet(cipher_key).decrypt(encrypted_data).decode()
+
+    def get_password(self, server_id: int, updated_at, encrypted_password: str,
+                     decrypt: Callable[[str], str]) -> str:
+        """
+        获取服务器的明文密码，缓存以服务器ID为键，updated_at 或密文变化时重新解密
+
+        Args:
+            server_id: 服务器ID
+            updated_at: 服务器记录的更新时间
+            encrypted_password: 密文
+            decrypt: 缓存未命中时的解密函数，解密失败时抛出异常（失败结果不缓存）
+
+        Returns:
+            明文密码
+        """
+        if self.ttl <= 0 or server_id is None:
+            return decrypt(encrypted_password)
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(server_id)
+            if (entry is not None and entry[0] > now
+                    and entry[1] == updated_at and entry[2] == encrypted_password):
+                self._stats['hits'] += 1
+                return entry[3]
+
+        password = decrypt(encrypted_password)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._entries[server_id] = (now + self.ttl, updated_at, encrypted_password, password)
+        return password
+
+    def invalidate(self, server_id: Optional[int] = None):
+        """
+        清除已解密密码缓存
+
+        Args:
+            server_id: 服务器ID，为空时清除全部
+        """
+        with self._lock:
+            if server_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(server_id, None)
+            self._stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_passwords'] = len(self._entries)
+        return stats
+
+
+# 全局凭据提供者
+credential_provider = CredentialProvider(_credential_cache_ttl())
@@ -0,0 +1,164 @@
+"""
+磁盘信息增量存储模块
+与最近一次完整快照相比挂载点集合不变、各挂载点使用率区间（DISK_USAGE_BUCKET）也不变时，
+监控日志只保存有变化的挂载点并记录快照日志ID；挂载点或区间变化、或距上次快照已达
+DISK_FULL_SNAPSHOT_INTERVAL 次时保存完整快照
+"""
+
+import json
+import logging
+from typing import Any, Dict, List
+
+from app.models import MonitorLog, ServerLatestStatus
+
+logger = logging.getLogger(__name__)
+
+# IN 查询每批的参数数量，避免超过SQLite的变量上限
+_IN_CHUNK_SIZE = 500
+
+
+def _usage_bucket(disk: Dict[str, Any], bucket: float) -> int:
+    return int((disk.get('use_percent') or 0.0) // bucket)
+
+
+def _needs_full_snapshot(snapshot: List[Dict[str, Any]], current: List[Dict[str, Any]], bucket: float) -> bool:
+    """相对快照，挂载点集合或任一挂载点的使用率区间发生变化"""
+    snapshot_by_mount = {disk['mounted_on']: disk for disk in snapshot}
+    if len(snapshot_by_mount) != len(current) or any(disk['mounted_on'] not in snapshot_by_mount for disk in current):
+        return True
+    return any(
+        _usage_bucket(disk, bucket) != _usage_bucket(snapshot_by_mount[disk['mounted_on']], bucket)
+        for disk in current
+    )
+
+
+def _changed_disks(snapshot: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """相对快照有变化的磁盘条目"""
+    snapshot_by_mount = {disk['mounted_on']: disk for disk in snapshot}
+    return [disk for disk in current if disk != snapshot_by_mount[disk['mounted_on']]]
+
+
+def encode_disk_deltas(session, monitor_logs: List[MonitorLog]) -> int:
+    """
+    按存储模式把可以增量保存的日志改写为磁盘增量（需在日志写入之前、同一事务中调用）
+
+    Args:
+        session: 数据库会话
+        monitor_logs: 尚未写入的MonitorLog列表，disk_info为完整列表
+
+    Returns:
+        改写为增量的日志数
+    """
+    from config import Config
+
+    if (getattr(Config, 'DISK_STORAGE_MODE', 'full') or 'full').lower() != 'delta':
+        return 0
+
+    bucket = max(float(getattr(Config, 'DISK_USAGE_BUCKET', 5)), 0.1)
+    snapshot_interval = int(getattr(Config, 'DISK_FULL_SNAPSHOT_INTERVAL', 24))
+
+    candidates = {}
+    for log in monitor_logs:
+        if log.disk_snapshot_id is None and log.disk_info and log.disk_info != '[]':
+            candidates.setdefault(log.server_id, []).append(log)
+    if not candidates or snapshot_interval <= 0:
+        return 0
+
+    # 各服务器最近一次完整快照的日志ID
+    states = {}
+    server_ids = list(candidates.keys())
+    for start in range(0, len(server_ids), _IN_CHUNK_SIZE):
+        chunk = server_ids[start:start + _IN_CHUNK_SIZE]
+        rows = session.query(
+            ServerLatestStatus.server_id,
+            ServerLatestStatus.disk_snapshot_id,
+            ServerLatestStatus.disk_delta_count
+        ).filter(ServerLatestStatus.server_id.in_(chunk))
+        for server_id, snapshot_id, delta_count in rows:
+            if snapshot_id and (delta_count or 0) < snapshot_interval:
+                states[server_id] = snapshot_id
+
+    # 完整快照本身的磁盘列表
+    snapshots = {}
+    snapshot_ids = list(set(states.values()))
+    for start in range(0, len(snapshot_ids), _IN_CHUNK_SIZE):
+        chunk = snapshot_ids[start:start + _IN_CHUNK_SIZE]
+        rows = session.query(MonitorLog.id, MonitorLog.disk_info, MonitorLog.disk_snapshot_id).filter(
+            MonitorLog.id.in_(chunk)
+        )
+        for snapshot_id, disk_info, base_id in rows:
+            if base_id is None and disk_info:
+                snapshots[snapshot_id] = json.loads(disk_info)
+
+    encoded = 0
+    for server_id, logs in candidates.items():
+        snapshot_id = states.get(server_id)
+        snapshot = snapshots.get(snapshot_id)
+        if snapshot is None:
+            continue
+
+        for log in logs:
+            disk_data = log.get_disk_info()
+            if _needs_full_snapshot(snapshot, disk_data, bucket):
+                continue
+            log.set_disk_delta(snapshot_id, _changed_disks(snapshot, disk_data), disk_data)
+            encoded += 1
+
+    if encoded:
+        logger.debug(f"磁盘信息按增量保存: {encoded}/{len(monitor_logs)}")
+    return encoded
+
+
+def rebase_disk_logs(logs: List[MonitorLog]) -> int:
+    """
+    把增量日志改写为完整磁盘列表（连同磁盘指标行），需在其快照日志删除之前调用
+
+    Args:
+        logs: 增量保存磁盘信息的MonitorLog列表
+
+    Returns:
+        改写的日志数
+    """
+    logs = [log for log in logs if log.disk_snapshot_id]
+    if not logs:
+        return 0
+
+    MonitorLog.preload_disk_snapshots(logs)
+    for log in logs:
+        disk_data = log.get_disk_info()
+        log.set_disk_info(disk_data)
+        log.set_disk_metrics(disk_data)
+    return len(logs)
+
+
+def rebase_disk_dependents(session, snapshot_ids: List[int]) -> int:
+    """
+    删除监控日志前，改写以这些日志为快照的增量日志，并清除指向它们的最新状态快照记录
+
+    本身也在删除列表中的增量日志不改写。调用方负责提交事务。
+
+    Args:
+        session: 数据库会话
+        snapshot_ids: 即将删除的日志ID列表
+
+    Returns:
+        改写的日志数
+    """
+    snapshot_ids = list(set(snapshot_ids))
+    deleting = set(snapshot_ids)
+    dependents = []
+    for start in range(0, len(snapshot_ids), _IN_CHUNK_SIZE):
+        chunk = snapshot_ids[start:start + _IN_CHUNK_SIZE]
+        dependents.extend(
+            log for log in session.query(MonitorLog).filter(MonitorLog.disk_snapshot_id.in_(chunk))
+            if log.id not in deleting
+        )
+        # 之后的日志不能再基于已删除的快照保存增量
+        session.query(ServerLatestStatus).filter(
+            ServerLatestStatus.disk_snapshot_id.in_(chunk)
+        ).update({'disk_snapshot_id': None, 'disk_delta_count': 0}, synchronize_session=False)
+
+    rebased = rebase_disk_logs(dependents)
+    if rebased:
+        logger.info(f"快照日志被删除，{rebased} 条增量磁盘信息已改写为完整列表")
+    return rebased
@@ -0,0 +1,104 @@
+"""
+服务器最新状态维护模块
+server_latest_status 表每台服务器一行，与监控日志在同一事务中更新，
+仪表板等接口读取该表即可，开销只与服务器数量有关，与历史日志量无关
+"""
+
+import logging
+from typing import Iterable, List
+from sqlalchemy import func
+from app.models import MonitorLog, ServerLatestStatus
+
+logger = logging.getLogger(__name__)
+
+# IN 查询每批的参数数量，避免超过SQLite的变量上限
+_IN_CHUNK_SIZE = 500
+
+
+def upsert_latest_status(session, monitor_logs: List[MonitorLog]) -> None:
+    """
+    用新写入的监控日志更新最新状态表（需在日志flush之后、同一事务中调用）
+
+    Args:
+        session: 数据库会话
+        monitor_logs: 已分配ID的MonitorLog列表
+    """
+    # 同一批内每台服务器只取最新的一条
+    newest = {}
+    for log in monitor_logs:
+        current = newest.get(log.server_id)
+        if current is None or log.monitor_time >= current.monitor_time:
+            newest[log.server_id] = log
+
+    server_ids = list(newest.keys())
+    for start in range(0, len(server_ids), _IN_CHUNK_SIZE):
+        chunk = server_ids[start:start + _IN_CHUNK_SIZE]
+        existing = {
+            row.server_id: row
+            for row in session.query(ServerLatestStatus).filter(ServerLatestStatus.server_id.in_(chunk))
+        }
+        for server_id in chunk:
+            log = newest[server_id]
+            row = existing.get(server_id)
+            if row is None:
+                row = ServerLatestStatus(server_id=server_id)
+                session.add(row)
+            elif row.monitor_time and log.monitor_time < row.monitor_time:
+                # 迟到的旧结果不覆盖更新的状态
+                continue
+            row.record_poll(log)
+            row.update_from_log(log)
+
+
+def refresh_latest_status(session, server_ids: Iterable[int]) -> None:
+    """
+    按监控日志重新计算指定服务器的最新状态（删除日志后调用，由调用方提交）
+
+    Args:
+        session: 数据库会话
+        server_ids: 服务器ID列表
+    """
+    for server_id in set(server_ids):
+        log = session.query(MonitorLog).filter(
+            MonitorLog.server_id == server_id
+        ).order_by(MonitorLog.monitor_time.desc(), MonitorLog.id.desc()).first()
+
+        row = session.get(ServerLatestStatus, server_id)
+        if log is None:
+            if row is not None:
+                session.delete(row)
+            continue
+
+        if row is None:
+            row = ServerLatestStatus(server_id=server_id)
+            session.add(row)
+        row.update_from_log(log)
+
+
+def rebuild_latest_status(session) -> int:
+    """
+    从监控日志全量重建最新状态表（升级后首次使用或数据不一致时调用，由调用方提交）
+
+    Args:
+        session: 数据库会话
+
+    Returns:
+        重建的服务器数量
+    """
+    subquery = session.query(
+        MonitorLog.server_id,
+        func.max(MonitorLog.monitor_time).label('latest_time')
+    ).group_by(MonitorLog.server_id).subquery()
+
+    latest_logs = session.query(MonitorLog).join(
+        subquery,
+        (MonitorLog.server_id == subquery.c.server_id) &
+        (MonitorLog.monitor_time == subquery.c.latest_time)
+    ).all()
+
+    session.query(ServerLatestStatus).delete(synchronize_session=False)
+    upsert_latest_status(session, latest_logs)
+
+    count = len({log.server_id for log in latest_logs})
+    logger.info(f"已从监控日志重建服务器最新状态，服务器数量: {count}")
+    return count
@@ -1,11 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import object_session
 from datetime import datetime
 import json
+import math
 import hashlib
 import secrets
 
 db = SQLAlchemy()
 
+# IN 查询每批的参数数量，避免超过SQLite的变量上限
+_IN_CHUNK_SIZE = 500
+
 # 获取本地时间的辅助函数
 def get_local_time():
     """获取本地时间"""
@@ -30,6 +35,8 @@ class Server(db.Model):
     # 关联关系
     monitor_logs = db.relationship('MonitorLog', backref='server', lazy=True, cascade='all, delete-orphan')
     service_configs = db.relationship('ServiceConfig', backref='server', lazy=True, cascade='all, delete-orphan')
+    latest_status = db.relationship('ServerLatestStatus', backref='server', lazy=True, uselist=False, cascade='all, delete-orphan')
+    metric_rollups = db.relationship('MetricRollup', backref='server', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -103,27 +110,117 @@ class ScheduleTask(db.Model):
 class MonitorLog(db.Model):
     """监控日志表"""
     __tablename__ = 'monitor_logs'
+    __table_args__ = (
+        # 按服务器查询历史、迟到结果查找超时日志
+        db.Index('ix_monitor_logs_server_time', 'server_id', 'monitor_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
     monitor_time = db.Column(db.DateTime, default=get_local_time, comment='监控时间')
     status = db.Column(db.String(20), comment='状态: success/failed/warning')
     cpu_usage = db.Column(db.Float, comment='CPU使用率')
+    cpu_iowait = db.Column(db.Float, comment='CPU iowait占比')
+    cpu_steal = db.Column(db.Float, comment='CPU steal占比')
+    cpu_per_core = db.Column(db.Text, comment='各核CPU使用情况JSON')
     memory_usage = db.Column(db.Float, comment='内存使用率')
     memory_info = db.Column(db.Text, comment='详细内存信息JSON')
+    memory_total_mb = db.Column(db.Integer, comment='内存总量(MB)')
+    memory_used_mb = db.Column(db.Integer, comment='已用内存(MB)')
+    memory_free_mb = db.Column(db.Integer, comment='空闲内存(MB)')
+    memory_available_mb = db.Column(db.Integer, comment='可用内存(MB)')
     disk_info = db.Column(db.Text, comment='磁盘信息JSON')
+    disk_snapshot_id = db.Column(db.Integer, comment='磁盘增量所基于的完整快照日志ID，为空表示disk_info是完整列表')
     system_info = db.Column(db.Text, comment='系统信息JSON')
     alert_info = db.Column(db.Text, comment='告警信息JSON')
     error_message = db.Column(db.Text, comment='错误信息')
     execution_time = db.Column(db.Float, comment='执行耗时(秒)')
     
-    def get_disk_info(self):
-        if self.disk_info:
-            return json.loads(self.disk_info)
+    # 磁盘指标行，与disk_info相同：完整快照每个挂载点一行，增量日志只有变化的挂载点
+    disk_metrics = db.relationship('DiskMetric', backref='monitor_log', lazy=True, cascade='all, delete-orphan')
+    
+    def get_cpu_per_core(self):
+        if self.cpu_per_core:
+            return json.loads(self.cpu_per_core)
         return []
     
+    def set_cpu_per_core(self, per_core_data):
+        self.cpu_per_core = json.dumps(per_core_data)
+    
+    def get_disk_info(self):
+        """获取完整的磁盘列表，增量记录与其完整快照合并后返回"""
+        full_disk_info = getattr(self, '_full_disk_info', None)
+        if full_disk_info is not None:
+            return full_disk_info
+        
+        disk_data = json.loads(self.disk_info) if self.disk_info else []
+        if not self.disk_snapshot_id:
+            return disk_data
+        
+        session = object_session(self) or db.session
+        snapshot = session.get(MonitorLog, self.disk_snapshot_id)
+        if snapshot is None:
+            # 快照已被清理（日志清理会先把依赖它的增量改写为完整列表），只能返回有变化的挂载点
+            return disk_data
+        return self.merge_disk_delta(snapshot.get_disk_info(), disk_data)
+    
+    @staticmethod
+    def merge_disk_delta(snapshot_data, changes):
+        """把增量条目合并到完整快照的磁盘列表"""
+        changed = {disk['mounted_on']: disk for disk in changes}
+        return [changed.get(disk['mounted_on'], disk) for disk in snapshot_data]
+    
+    @classmethod
+    def preload_disk_snapshots(cls, logs):
+        """
+        批量读取增量日志所依赖的完整快照并合并，之后 get_disk_info 不再逐条查询快照
+        
+        Args:
+            logs: MonitorLog列表
+        """
+        pending = [
+            log for log in logs
+            if log.disk_snapshot_id and getattr(log, '_full_disk_info', None) is None
+        ]
+        if not pending:
+            return
+        
+        session = object_session(pending[0]) or db.session
+        snapshot_ids = list({log.disk_snapshot_id for log in pending})
+        snapshots = {}
+        for start in range(0, len(snapshot_ids), _IN_CHUNK_SIZE):
+            chunk = snapshot_ids[start:start + _IN_CHUNK_SIZE]
+            rows = session.query(cls.id, cls.disk_info).filter(
+                cls.id.in_(chunk), cls.disk_snapshot_id.is_(None)
+            )
+            for snapshot_id, disk_info in rows:
+                snapshots[snapshot_id] = json.loads(disk_info) if disk_info else []
+        
+        for log in pending:
+            snapshot_data = snapshots.get(log.disk_snapshot_id)
+            if snapshot_data is not None:
+                changes = json.loads(log.disk_info) if log.disk_info else []
+                log._full_disk_info = cls.merge_disk_delta(snapshot_data, changes)
+    
     def set_disk_info(self, disk_data):
         self.disk_info = json.dumps(disk_data)
+        self.disk_snapshot_id = None
+        self._full_disk_info = None
+    
+    def set_disk_delta(self, snapshot_id, changes, disk_data):
+        """
+        以增量方式保存磁盘信息
+        
+        Args:
+            snapshot_id: 完整快照日志ID（挂载点集合与本次相同）
+            changes: 相对快照有变化的磁盘条目
+            disk_data: 本次完整的磁盘列表（只保留在内存中供同一事务使用）
+        """
+        self.disk_info = json.dumps(changes)
+        self.disk_snapshot_id = snapshot_id
+        self._full_disk_info = disk_data
+        # 磁盘指标行同样只保存有变化的挂载点
+        self.set_disk_metrics(changes)
     
     def get_memory_info(self):
         if self.memory_info:
@@ -132,6 +229,22 @@ class MonitorLog(db.Model):
     
     def set_memory_info(self, memory_data):
         self.memory_info = json.dumps(memory_data)
+        self.memory_total_mb = memory_data.get('total_mb')
+        self.memory_used_mb = memory_data.get('used_mb')
+        self.memory_free_mb = memory_data.get('free_mb')
+        self.memory_available_mb = memory_data.get('available_mb')
+    
+    def set_disk_metrics(self, disk_data):
+        """
+        按磁盘列表重建磁盘指标行（server_id和monitor_time需已设置）
+        
+        Args:
+            disk_data: 与disk_info相同的磁盘列表（完整列表或增量条目）
+        """
+        self.disk_metrics = [
+            DiskMetric.from_disk_dict(self.server_id, self.monitor_time, disk)
+            for disk in disk_data if disk.get('mounted_on')
+        ]
     
     def get_system_info(self):
         if self.system_info:
@@ -158,6 +271,9 @@ class MonitorLog(db.Model):
             'monitor_time': self.monitor_time.isoformat() if self.monitor_time else None,
             'status': self.status,
             'cpu_usage': self.cpu_usage,
+            'cpu_iowait': self.cpu_iowait,
+            'cpu_steal': self.cpu_steal,
+            'cpu_per_core': self.get_cpu_per_core(),
             'memory_usage': self.memory_usage,
             'memory_info': self.get_memory_info(),
             'disk_info': self.get_disk_info(),
@@ -167,6 +283,322 @@ class MonitorLog(db.Model):
             'execution_time': self.execution_time
         }
 
+class DiskMetric(db.Model):
+    """磁盘指标表（每条监控日志每个挂载点一行）"""
+    __tablename__ = 'disk_metrics'
+    __table_args__ = (
+        db.Index('ix_disk_metrics_log_id', 'monitor_log_id'),
+        db.Index('ix_disk_metrics_time_usage', 'monitor_time', 'use_percent'),
+        db.Index('ix_disk_metrics_server_mount_time', 'server_id', 'mounted_on', 'monitor_time'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    monitor_log_id = db.Column(db.Integer, db.ForeignKey('monitor_logs.id'), nullable=False)
+    # 冗余保存服务器ID和监控时间，查询时不需要关联monitor_logs
+    server_id = db.Column(db.Integer, nullable=False)
+    monitor_time = db.Column(db.DateTime, nullable=False, comment='监控时间')
+    filesystem = db.Column(db.String(255), comment='文件系统')
+    mounted_on = db.Column(db.String(255), nullable=False, comment='挂载点')
+    use_percent = db.Column(db.Float, comment='使用率')
+    size = db.Column(db.String(20), comment='总容量（df -h格式）')
+    used = db.Column(db.String(20), comment='已用容量（df -h格式）')
+    available = db.Column(db.String(20), comment='可用容量（df -h格式）')
+    size_bytes = db.Column(db.BigInteger, comment='总容量(字节)')
+    used_bytes = db.Column(db.BigInteger, comment='已用容量(字节)')
+    available_bytes = db.Column(db.BigInteger, comment='可用容量(字节)')
+    
+    @classmethod
+    def from_disk_dict(cls, server_id, monitor_time, disk):
+        """由巡视结果中的单个磁盘条目构建"""
+        return cls(
+            server_id=server_id,
+            monitor_time=monitor_time,
+            filesystem=disk.get('filesystem'),
+            mounted_on=disk['mounted_on'],
+            use_percent=disk.get('use_percent'),
+            size=disk.get('size'),
+            used=disk.get('used'),
+            available=disk.get('available'),
+            size_bytes=disk.get('size_bytes'),
+            used_bytes=disk.get('used_bytes'),
+            available_bytes=disk.get('available_bytes')
+        )
+    
+    def to_disk_dict(self):
+        """还原为与disk_info相同结构的磁盘条目"""
+        disk = {
+            'filesystem': self.filesystem,
+            'size': self.size,
+            'used': self.used,
+            'available': self.available,
+            'use_percent': self.use_percent,
+            'mounted_on': self.mounted_on
+        }
+        if self.size_bytes is not None:
+            disk['size_bytes'] = self.size_bytes
+            disk['used_bytes'] = self.used_bytes
+            disk['available_bytes'] = self.available_bytes
+        return disk
+    
+    def to_dict(self):
+        data = self.to_disk_dict()
+        data.update({
+            'id': self.id,
+            'monitor_log_id': self.monitor_log_id,
+            'server_id': self.server_id,
+            'monitor_time': self.monitor_time.isoformat() if self.monitor_time else None
+        })
+        return data
+
+class MetricRollup(db.Model):
+    """监控指标聚合表（每台服务器每个时间桶一行，分5分钟、1小时、1天三种粒度）"""
+    __tablename__ = 'metric_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('server_id', 'resolution', 'bucket_start', name='uq_metric_rollups_bucket'),
+        db.Index('ix_metric_rollups_resolution_bucket', 'resolution', 'bucket_start'),
+    )
+    
+    # 参与聚合的指标: CPU使用率、内存使用率、各挂载点中最高的磁盘使用率
+    METRICS = ('cpu', 'memory', 'disk')
+    # P95 使用的直方图区间宽度（百分点）
+    HISTOGRAM_BIN = 1.0
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    resolution = db.Column(db.String(4), nullable=False, comment='粒度: 5m/1h/1d')
+    bucket_start = db.Column(db.DateTime, nullable=False, comment='时间桶起始时间')
+    sample_count = db.Column(db.Integer, default=0, comment='巡视次数')
+    success_count = db.Column(db.Integer, default=0, comment='成功次数')
+    warning_count = db.Column(db.Integer, default=0, comment='告警次数')
+    failed_count = db.Column(db.Integer, default=0, comment='失败次数（含超时、熔断）')
+    cpu_count = db.Column(db.Integer, default=0, comment='CPU样本数')
+    cpu_min = db.Column(db.Float, comment='CPU使用率最小值')
+    cpu_max = db.Column(db.Float, comment='CPU使用率最大值')
+    cpu_sum = db.Column(db.Float, default=0.0, comment='CPU使用率之和')
+    cpu_histogram = db.Column(db.Text, comment='CPU使用率直方图JSON')
+    memory_count = db.Column(db.Integer, default=0, comment='内存样本数')
+    memory_min = db.Column(db.Float, comment='内存使用率最小值')
+    memory_max = db.Column(db.Float, comment='内存使用率最大值')
+    memory_sum = db.Column(db.Float, default=0.0, comment='内存使用率之和')
+    memory_histogram = db.Column(db.Text, comment='内存使用率直方图JSON')
+    disk_count = db.Column(db.Integer, default=0, comment='磁盘样本数')
+    disk_min = db.Column(db.Float, comment='最高磁盘使用率的最小值')
+    disk_max = db.Column(db.Float, comment='最高磁盘使用率的最大值')
+    disk_sum = db.Column(db.Float, default=0.0, comment='最高磁盘使用率之和')
+    disk_histogram = db.Column(db.Text, comment='最高磁盘使用率直方图JSON')
+    
+    def add_sample(self, status, values):
+        """
+        累加一次巡视结果
+        
+        Args:
+            status: 巡视状态
+            values: 指标名到取值的字典，取值为None的指标不参与聚合
+        """
+        self.sample_count = (self.sample_count or 0) + 1
+        if status == 'success':
+            self.success_count = (self.success_count or 0) + 1
+        elif status == 'warning':
+            self.warning_count = (self.warning_count or 0) + 1
+        else:
+            self.failed_count = (self.failed_count or 0) + 1
+        
+        for metric in self.METRICS:
+            value = values.get(metric)
+            if value is None:
+                continue
+            value = float(value)
+            count = getattr(self, f'{metric}_count') or 0
+            low = getattr(self, f'{metric}_min')
+            high = getattr(self, f'{metric}_max')
+            setattr(self, f'{metric}_count', count + 1)
+            setattr(self, f'{metric}_min', value if low is None else min(low, value))
+            setattr(self, f'{metric}_max', value if high is None else max(high, value))
+            setattr(self, f'{metric}_sum', (getattr(self, f'{metric}_sum') or 0.0) + value)
+            
+            histogram = self.get_histogram(metric)
+            key = str(int(max(0.0, value) // self.HISTOGRAM_BIN))
+            histogram[key] = histogram.get(key, 0) + 1
+            setattr(self, f'{metric}_histogram', json.dumps(histogram))
+    
+    def remove_status(self, status):
+        """
+        撤回一次没有指标取值的巡视结果（超时日志被迟到的实际结果替换时使用）
+        
+        Args:
+            status: 被撤回结果的巡视状态
+        """
+        self.sample_count = max(0, (self.sample_count or 0) - 1)
+        if status == 'success':
+            self.success_count = max(0, (self.success_count or 0) - 1)
+        elif status == 'warning':
+            self.warning_count = max(0, (self.warning_count or 0) - 1)
+        else:
+            self.failed_count = max(0, (self.failed_count or 0) - 1)
+    
+    def get_histogram(self, metric):
+        histogram = getattr(self, f'{metric}_histogram')
+        if histogram:
+            return json.loads(histogram)
+        return {}
+    
+    @classmethod
+    def histogram_percentile(cls, histogram, percent, high=None):
+        """
+        由直方图计算百分位（取所在区间的上界，不超过最大值）
+        
+        Args:
+            histogram: 区间序号（字符串）到样本数的字典
+            percent: 百分位，如95
+            high: 样本最大值
+        """
+        total = sum(histogram.values())
+        if not total:
+            return None
+        rank = max(1, math.ceil(total * percent / 100.0))
+        seen = 0
+        for key in sorted(histogram, key=int):
+            seen += histogram[key]
+            if seen >= rank:
+                value = (int(key) + 1) * cls.HISTOGRAM_BIN
+                return round(min(value, high) if high is not None else value, 2)
+        return high
+    
+    def metric_summary(self, metric):
+        """单个指标的最小、最大、平均和P95"""
+        count = getattr(self, f'{metric}_count') or 0
+        if not count:
+            return None
+        high = getattr(self, f'{metric}_max')
+        return {
+            'min': getattr(self, f'{metric}_min'),
+            'max': high,
+            'avg': round((getattr(self, f'{metric}_sum') or 0.0) / count, 2),
+            'p95': self.histogram_percentile(self.get_histogram(metric), 95, high),
+            'count': count
+        }
+    
+    def to_dict(self):
+        data = {
+            'server_id': self.server_id,
+            'resolution': self.resolution,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'sample_count': self.sample_count,
+            'success_count': self.success_count,
+            'warning_count': self.warning_count,
+            'failed_count': self.failed_count
+        }
+        for metric in self.METRICS:
+            data[metric] = self.metric_summary(metric)
+        return data
+
+class ServerLatestStatus(db.Model):
+    """服务器最新状态表（每台服务器一行，写入监控日志时同步更新）"""
+    __tablename__ = 'server_latest_status'
+    
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), primary_key=True)
+    monitor_log_id = db.Column(db.Integer, comment='对应的监控日志ID')
+    monitor_time = db.Column(db.DateTime, comment='监控时间')
+    status = db.Column(db.String(20), comment='状态: success/failed/warning')
+    cpu_usage = db.Column(db.Float, comment='CPU使用率')
+    memory_usage = db.Column(db.Float, comment='内存使用率')
+    max_disk_usage = db.Column(db.Float, comment='磁盘最大使用率')
+    disk_info = db.Column(db.Text, comment='磁盘信息JSON')
+    alert_info = db.Column(db.Text, comment='告警信息JSON')
+    alert_count = db.Column(db.Integer, default=0, comment='告警数量')
+    error_message = db.Column(db.Text, comment='错误信息')
+    execution_time = db.Column(db.Float, comment='执行耗时(秒)')
+    avg_execution_time = db.Column(db.Float, comment='成功巡视耗时的指数移动平均(秒)')
+    consecutive_failures = db.Column(db.Integer, default=0, comment='连续失败/超时次数')
+    disk_snapshot_id = db.Column(db.Integer, comment='最近一次完整磁盘快照的日志ID')
+    disk_delta_count = db.Column(db.Integer, default=0, comment='该快照之后保存的磁盘增量次数')
+    
+    # 耗时移动平均中最新一次巡视的权重
+    EXECUTION_TIME_EWMA_ALPHA = 0.3
+    
+    def get_disk_info(self):
+        if self.disk_info:
+            return json.loads(self.disk_info)
+        return []
+    
+    def get_alert_info(self):
+        if self.alert_info:
+            return json.loads(self.alert_info)
+        return []
+    
+    def record_poll(self, log):
+        """
+        将一次新的巡视计入历史统计（只在写入新日志时调用，删除日志后的重算不调用）
+        
+        失败和超时只累计连续失败次数，不计入耗时平均，避免连接超时拉高预期耗时。
+        """
+        if log.disk_snapshot_id:
+            self.disk_delta_count = (self.disk_delta_count or 0) + 1
+        elif log.disk_info and log.disk_info != '[]':
+            self.disk_snapshot_id = log.id
+            self.disk_delta_count = 0
+        
+        if log.status in ('failed', 'timeout', 'circuit_open'):
+            self.consecutive_failures = (self.consecutive_failures or 0) + 1
+            return
+        
+        self.consecutive_failures = 0
+        if log.execution_time is None:
+            return
+        if self.avg_execution_time is None:
+            self.avg_execution_time = log.execution_time
+        else:
+            alpha = self.EXECUTION_TIME_EWMA_ALPHA
+            self.avg_execution_time = alpha * log.execution_time + (1 - alpha) * self.avg_execution_time
+    
+    def record_late_poll(self, log):
+        """
+        超时日志被迟到的实际结果替换后修正历史统计
+        
+        超时写入时已累计一次连续失败且未计入耗时平均；实际结果不是失败时撤回这次失败，
+        并把实际耗时计入平均，避免耗时长的正常主机因反复超时被当作故障主机排到最后。
+        """
+        if log.status in ('failed', 'timeout', 'circuit_open'):
+            return
+        
+        self.consecutive_failures = max(0, (self.consecutive_failures or 0) - 1)
+        if log.execution_time is None:
+            return
+        if self.avg_execution_time is None:
+            self.avg_execution_time = log.execution_time
+        else:
+            alpha = self.EXECUTION_TIME_EWMA_ALPHA
+            self.avg_execution_time = alpha * log.execution_time + (1 - alpha) * self.avg_execution_time
+    
+    def update_from_log(self, log):
+        """用监控日志覆盖当前状态"""
+        disk_info = log.get_disk_info()
+        self.monitor_log_id = log.id
+        self.monitor_time = log.monitor_time
+        self.status = log.status
+        self.cpu_usage = log.cpu_usage
+        self.memory_usage = log.memory_usage
+        self.max_disk_usage = max([disk.get('use_percent', 0.0) for disk in disk_info]) if disk_info else 0.0
+        self.disk_info = json.dumps(disk_info)
+        self.alert_info = log.alert_info
+        self.alert_count = len(log.get_alert_info())
+        self.error_message = log.error_message
+        self.execution_time = log.execution_time
+    
+    def to_dict(self):
+        return {
+            'server_id': self.server_id,
+            'monitor_log_id': self.monitor_log_id,
+            'status': self.status,
+            'cpu_usage': self.cpu_usage,
+            'memory_usage': self.memory_usage,
+            'disk_info': self.get_disk_info(),
+            'max_disk_usage': self.max_disk_usage or 0.0,
+            'alert_count': self.alert_count or 0,
+            'monitor_time': self.monitor_time.isoformat() if self.monitor_time else None,
+            'execution_time': self.execution_time
+        }
+
 class MonitorReport(db.Model):
     """监控报告表"""
     __tablename__ = 'monitor_reports'
@@ -399,4 +831,44 @@ class GlobalSettings(db.Model):
             'description': self.description,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+def upgrade_schema():
+    """
+    为已存在的表补齐新增的可空列和索引
+    
+    db.create_all() 只创建缺失的表，不会修改已有表的结构，
+    升级后新增的列需要在这里用 ALTER TABLE 补上，新增的索引用 CREATE INDEX IF NOT EXISTS 补上。
+    需要在应用上下文中调用。
+    
+    Returns:
+        新增的列名和索引名列表（table.column / table.index）
+    """
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable or column.primary_key:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f'{table.name}.{column.name}')
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            # 大表上建索引需要一些时间，只在升级后首次启动时执行一次
+            index.create(db.engine, checkfirst=True)
+            added.append(f'{table.name}.{index.name}')
+    
+    return added
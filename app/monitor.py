@@ -1,11 +1,20 @@
+import math
 import time
 import logging
 import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import sessionmaker
 from app.models import db, Server, MonitorLog, MonitorReport
 from app.ssh_manager import SSHConnectionManager
+from app.circuit_breaker import CircuitOpenError
 from app.services import ServerService, ThresholdService
+from app.result_sink import MonitorResultSink, build_monitor_log, persist_monitor_logs, apply_late_result
+from app.retention import retention_worker
+from app.response_cache import dashboard_cache
+from app.worker_context import worker_app_context
+from app.concurrency_controller import create_sweep_controller
+from app.sweep_planner import plan_sweep_order
 from cryptography.fernet import Fernet
 import base64
 import threading
@@ -18,6 +27,8 @@ class HostMonitor:
     
     # 全局共享的SSH连接管理器
     _shared_ssh_manager = None
+    # 上一轮巡视因期限未开始采集的服务器ID，下一轮最先提交
+    _skipped_server_ids = set()
     
     def __init__(self):
         # 使用全局共享的SSH连接管理器，确保连接池有效工作
@@ -32,44 +43,16 @@ class HostMonitor:
     def server_service(self):
         """延迟初始化服务器服务"""
         if self._server_service is None:
-            from flask import has_app_context, current_app
-            if has_app_context():
+            with worker_app_context():
                 self._server_service = ServerService()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    self._server_service = ServerService()
         return self._server_service
     
     @property
     def threshold_service(self):
         """延迟初始化阈值服务"""
         if self._threshold_service is None:
-            from flask import has_app_context, current_app
-            if has_app_context():
+            with worker_app_context():
                 self._threshold_service = ThresholdService()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    self._threshold_service = ThresholdService()
         return self._threshold_service
     
     def _decrypt_password(self, encrypted_password: str) -> str:
@@ -88,40 +71,13 @@ class HostMonitor:
             监控结果字典
         """
         # 确保整个监控过程都在应用上下文中执行
-        from flask import has_app_context
-        
-        def _monitor_with_context():
+        with worker_app_context():
             return self._do_monitor_single_server(server, thresholds)
-        
-        if has_app_context():
-            return _monitor_with_context()
-        else:
-            # 如果没有应用上下文，创建一个最小化的应用实例
-            from flask import Flask
-            from config import Config
-            app = Flask(__name__)
-            app.config.from_object(Config)
-            
-            # 只初始化数据库，不初始化调度器和服务监控
-            from app.models import db as database
-            database.init_app(app)
-            
-            with app.app_context():
-                return _monitor_with_context()
     
-    def _do_monitor_single_server(self, server: Server, thresholds: Dict[str, float]) -> Dict[str, Any]:
-        """
-        实际执行单个服务器监控的内部方法
-        
-        Args:
-            server: 服务器对象
-            thresholds: 阈值配置
-            
-        Returns:
-            监控结果字典
-        """
-        start_time = time.time()
-        monitor_result = {
+    @staticmethod
+    def _new_monitor_result(server: Server) -> Dict[str, Any]:
+        """创建初始状态（失败）的监控结果字典"""
+        return {
             'server_id': server.id,
             'server_name': server.name,
             'server_ip': server.host,  # 添加服务器IP信息
@@ -134,12 +90,26 @@ class HostMonitor:
             'error_message': '',
             'execution_time': 0
         }
+    
+    def _do_monitor_single_server(self, server: Server, thresholds: Dict[str, float]) -> Dict[str, Any]:
+        """
+        实际执行单个服务器监控的内部方法
+        
+        Args:
+            server: 服务器对象
+            thresholds: 阈值配置
+            
+        Returns:
+            监控结果字典
+        """
+        start_time = time.time()
+        monitor_result = self._new_monitor_result(server)
         
         try:
             logger.info(f"开始监控服务器: {server.name} ({server.host}:{server.port})")
             
             # 解密密码
-            password = self._decrypt_password(server.password) if server.password else None
+            password = self.server_service.get_server_password(server)
             logger.debug(f"服务器 {server.name} 认证方式: {'password' if password else 'private_key' if server.private_key_path else 'none'}")
             
             # 建立SSH连接并执行监控
@@ -151,61 +121,9 @@ class HostMonitor:
                 private_key_path=server.private_key_path if server.private_key_path else None
             ) as client:
                 
-                # 获取系统信息
-                system_info = self.ssh_manager.get_system_info(client)
-                monitor_result['system_info'] = system_info
-                
-                # 获取CPU使用率
-                cpu_usage = self.ssh_manager.get_cpu_usage(client)
-                if cpu_usage is not None:
-                    monitor_result['cpu_usage'] = cpu_usage
-                    if cpu_usage > thresholds['cpu_threshold']:
-                        monitor_result['alerts'].append({
-                            'type': 'cpu',
-                            'level': 'warning',
-                            'message': f'CPU使用率过高: {cpu_usage:.2f}% (阈值: {thresholds["cpu_threshold"]}%)',
-                            'value': cpu_usage,
-                            'threshold': thresholds['cpu_threshold']
-                        })
-                
-                # 获取内存使用情况
-                memory_info = self.ssh_manager.get_memory_usage(client)
-                if memory_info is not None:
-                    # 保存详细内存信息
-                    monitor_result['memory_info'] = memory_info
-                    
-                    # 为了保持向后兼容，仍然保留memory_usage字段
-                    memory_usage = memory_info['usage_percent']
-                    monitor_result['memory_usage'] = memory_usage
-                    
-                    if memory_usage > thresholds['memory_threshold']:
-                        monitor_result['alerts'].append({
-                            'type': 'memory',
-                            'level': 'warning',
-                            'message': f'内存使用率过高: {memory_usage:.2f}% (阈值: {thresholds["memory_threshold"]}%)',
-                            'value': memory_usage,
-                            'threshold': thresholds['memory_threshold']
-                        })
-                
-                # 获取磁盘使用情况
-                disk_info = self.ssh_manager.get_disk_usage(client)
-                monitor_result['disk_info'] = disk_info
-                
-                # 检查磁盘使用率告警
-                for disk in disk_info:
-                    if disk['use_percent'] > thresholds['disk_threshold']:
-                        monitor_result['alerts'].append({
-                            'type': 'disk',
-                            'level': 'warning',
-                            'message': f"磁盘 {disk['mounted_on']} 使用率过高: {disk['use_percent']:.2f}% (阈值: {thresholds['disk_threshold']}%)",
-                            'value': disk['use_percent'],
-                            'threshold': thresholds['disk_threshold'],
-                            'filesystem': disk['filesystem'],
-                            'mounted_on': disk['mounted_on'],
-                            'size': disk['size'],
-                            'used': disk['used'],
-                            'available': disk['available']
-                        })
+                # 采集指标（优先单次往返的探针脚本，失败时回退逐条命令）
+                metrics = self.ssh_manager.collect_metrics(client, host_key=f"{server.host}:{server.port}")
+                self._apply_metrics(monitor_result, metrics, thresholds)
                 
                 # 确定状态
                 if monitor_result['alerts']:
@@ -215,6 +133,12 @@ class HostMonitor:
                     monitor_result['status'] = 'success'
                     logger.info(f"服务器 {server.name} 监控完成，状态: 正常")
                 
+        except CircuitOpenError as e:
+            # 主机熔断中，本轮不尝试连接
+            logger.warning(f"跳过服务器 {server.name}: {str(e)}")
+            monitor_result['error_message'] = str(e)
+            monitor_result['status'] = 'circuit_open'
+        
         except Exception as e:
             error_msg = str(e)
             logger.error(f"监控服务器 {server.name} ({server.host}:{server.port}) 失败: {error_msg}")
@@ -226,6 +150,83 @@ class HostMonitor:
         
         return monitor_result
     
+    def _apply_metrics(self, monitor_result: Dict[str, Any], metrics: Dict[str, Any],
+                       thresholds: Dict[str, float]) -> None:
+        """
+        将采集到的指标写入监控结果并按阈值生成告警
+        
+        Args:
+            monitor_result: 监控结果字典（原地修改）
+            metrics: SSHConnectionManager.collect_metrics 的返回值
+            thresholds: 阈值配置
+        """
+        monitor_result['system_info'] = metrics['system_info']
+        monitor_result['collection_mode'] = metrics.get('collection_mode')
+        
+        # CPU使用率
+        cpu_usage = metrics['cpu_usage']
+        cpu_stats = metrics.get('cpu_stats')
+        # 开机以来的平均值不能反映当前负载（重启后首次巡视或计数回绕），只记录不做阈值判断
+        since_boot = bool(cpu_stats) and cpu_stats.get('sample_type') == 'since_boot'
+        if cpu_usage is not None:
+            monitor_result['cpu_usage'] = cpu_usage
+            if since_boot:
+                logger.debug(f"CPU使用率为开机以来的平均值，跳过阈值判断: {cpu_usage:.2f}%")
+            elif cpu_usage > thresholds['cpu_threshold']:
+                monitor_result['alerts'].append({
+                    'type': 'cpu',
+                    'level': 'warning',
+                    'message': f'CPU使用率过高: {cpu_usage:.2f}% (阈值: {thresholds["cpu_threshold"]}%)',
+                    'value': cpu_usage,
+                    'threshold': thresholds['cpu_threshold']
+                })
+        
+        # /proc/stat 采样得到的CPU细分指标
+        if cpu_stats:
+            monitor_result['cpu_iowait'] = cpu_stats['iowait']
+            monitor_result['cpu_steal'] = cpu_stats['steal']
+            monitor_result['cpu_per_core'] = cpu_stats['per_core']
+            monitor_result['cpu_sample_type'] = cpu_stats['sample_type']
+        
+        # 内存使用情况
+        memory_info = metrics['memory_info']
+        if memory_info is not None:
+            # 保存详细内存信息
+            monitor_result['memory_info'] = memory_info
+            
+            # 为了保持向后兼容，仍然保留memory_usage字段
+            memory_usage = memory_info['usage_percent']
+            monitor_result['memory_usage'] = memory_usage
+            
+            if memory_usage > thresholds['memory_threshold']:
+                monitor_result['alerts'].append({
+                    'type': 'memory',
+                    'level': 'warning',
+                    'message': f'内存使用率过高: {memory_usage:.2f}% (阈值: {thresholds["memory_threshold"]}%)',
+                    'value': memory_usage,
+                    'threshold': thresholds['memory_threshold']
+                })
+        
+        # 磁盘使用情况
+        disk_info = metrics['disk_info']
+        monitor_result['disk_info'] = disk_info
+        
+        # 检查磁盘使用率告警
+        for disk in disk_info:
+            if disk['use_percent'] > thresholds['disk_threshold']:
+                monitor_result['alerts'].append({
+                    'type': 'disk',
+                    'level': 'warning',
+                    'message': f"磁盘 {disk['mounted_on']} 使用率过高: {disk['use_percent']:.2f}% (阈值: {thresholds['disk_threshold']}%)",
+                    'value': disk['use_percent'],
+                    'threshold': thresholds['disk_threshold'],
+                    'filesystem': disk['filesystem'],
+                    'mounted_on': disk['mounted_on'],
+                    'size': disk['size'],
+                    'used': disk['used'],
+                    'available': disk['available']
+                })
+    
     def save_monitor_result(self, monitor_result: Dict[str, Any]) -> Optional[MonitorLog]:
         """
         保存监控结果到数据库
@@ -238,7 +239,6 @@ class HostMonitor:
         """
         try:
             # 如果在多线程环境中，确保有应用上下文
-            from flask import has_app_context
             from sqlalchemy.orm import sessionmaker
             from app.models import db
             
@@ -250,28 +250,12 @@ class HostMonitor:
                     Session = sessionmaker(bind=db.engine)
                     session = Session()
                     
-                    monitor_log = MonitorLog(
-                        server_id=monitor_result['server_id'],
-                        monitor_time=datetime.now(),
-                        status=monitor_result['status'],
-                        cpu_usage=monitor_result['cpu_usage'],
-                        memory_usage=monitor_result['memory_usage'],
-                        execution_time=monitor_result['execution_time'],
-                        error_message=monitor_result['error_message']
-                    )
-                    
-                    # 设置复杂数据
-                    monitor_log.set_disk_info(monitor_result['disk_info'])
-                    monitor_log.set_system_info(monitor_result['system_info'])
-                    monitor_log.set_alert_info(monitor_result['alerts'])
-                    
-                    # 设置内存详细信息
-                    if 'memory_info' in monitor_result and monitor_result['memory_info']:
-                        monitor_log.set_memory_info(monitor_result['memory_info'])
-                    
-                    session.add(monitor_log)
+                    monitor_log = build_monitor_log(monitor_result)
+                    persist_monitor_logs(session, [monitor_log])
                     session.commit()
                     
+                    dashboard_cache.invalidate()
+                    
                     # 获取保存后的对象信息
                     result = session.merge(monitor_log)
                     session.close()
@@ -287,62 +271,41 @@ class HostMonitor:
                             pass
                     raise e
             
-            if has_app_context():
-                # 已经在应用上下文中，直接保存
+            with worker_app_context():
                 return _save_to_db()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    return _save_to_db()
             
         except Exception as e:
             logger.error(f"保存监控结果失败: {str(e)}")
             return None
     
-    def monitor_all_servers(self, max_workers: int = 5) -> Dict[str, Any]:
+    def monitor_all_servers(self, max_workers: Optional[int] = None, engine: Optional[str] = None) -> Dict[str, Any]:
         """
         监控所有活跃服务器
         
         Args:
-            max_workers: 最大并发数
+            max_workers: 最大并发数（线程池引擎），为None时使用配置 MAX_CONCURRENT_MONITORS
+            engine: 采集引擎 thread/async，为None时使用配置 MONITOR_ENGINE
             
         Returns:
             监控汇总结果
         """
+        from config import Config
         start_time = time.time()
+        engine = self._resolve_engine(engine)
         
         # 确保在应用上下文中获取数据
-        from flask import has_app_context
-        
         def _get_servers_and_thresholds():
             servers = self.server_service.get_active_servers()
             thresholds = self.threshold_service.get_threshold_config()
-            return servers, thresholds
+            plan = None
+            if servers and Config.SWEEP_PRIORITY_ORDER:
+                # 按历史耗时从长到短提交，连续失败的主机放到最后
+                servers, plan = plan_sweep_order(db.session, servers, Config.SWEEP_FAILURE_STREAK,
+                                                 overdue_ids=HostMonitor._skipped_server_ids)
+            return servers, thresholds, plan, db.engine
         
-        if has_app_context():
-            servers, thresholds = _get_servers_and_thresholds()
-        else:
-            # 如果没有应用上下文，创建一个最小化的应用实例
-            from flask import Flask
-            from config import Config
-            app = Flask(__name__)
-            app.config.from_object(Config)
-            
-            # 只初始化数据库，不初始化调度器和服务监控
-            from app.models import db as database
-            database.init_app(app)
-            
-            with app.app_context():
-                servers, thresholds = _get_servers_and_thresholds()
+        with worker_app_context():
+            servers, thresholds, plan, db_engine = _get_servers_and_thresholds()
         
         if not servers:
             logger.warning("没有找到活跃的服务器")
@@ -359,59 +322,75 @@ class HostMonitor:
         success_count = 0
         failed_count = 0
         warning_count = 0
+        timeout_count = 0
+        circuit_open_count = 0
+        skipped_count = 0
+        skipped_server_ids = set()
+        # 巡视期限到达时仍在采集的主机，完成后在后台更新日志
+        stragglers = []
         
-        # 使用线程池并发监控服务器
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有监控任务
-            future_to_server = {
-                executor.submit(self.monitor_single_server, server, thresholds): server 
-                for server in servers
-            }
-            
-            # 收集结果
-            for future in concurrent.futures.as_completed(future_to_server):
-                server = future_to_server[future]
-                try:
-                    result = future.result()
-                    results.append(result)
-                    
-                    # 统计结果
-                    if result['status'] == 'success':
-                        success_count += 1
-                    elif result['status'] == 'warning':
-                        warning_count += 1
-                    else:
-                        failed_count += 1
-                    
-                    # 保存监控结果
-                    self.save_monitor_result(result)
-                    
-                    logger.info(f"服务器 {server.name} 监控完成，状态: {result['status']}")
-                    
-                except Exception as e:
-                    logger.error(f"监控服务器 {server.name} 时发生异常: {str(e)}")
-                    
-                    # 创建失败的监控结果记录
-                    failed_result = {
-                        'server_id': server.id,
-                        'server_name': server.name,
-                        'server_ip': server.host,
-                        'status': 'failed',
-                        'cpu_usage': None,
-                        'memory_usage': None,
-                        'memory_info': {},
-                        'disk_info': [],
-                        'system_info': {},
-                        'alerts': [],
-                        'error_message': str(e),
-                        'execution_time': 0
-                    }
-                    
-                    results.append(failed_result)
+        # 结果先进入缓冲，按批量在单个事务中写库
+        sink = MonitorResultSink(
+            db_engine,
+            batch_size=Config.RESULT_SINK_BATCH_SIZE,
+            flush_interval_ms=Config.RESULT_SINK_FLUSH_INTERVAL_MS
+        )
+        
+        if max_workers is None:
+            max_workers = Config.MAX_CONCURRENT_MONITORS
+        
+        controller = None
+        deadline_seconds = Config.MONITOR_TIMEOUT
+        if engine == 'async':
+            # 使用异步引擎在单个事件循环中并发采集，巡视期限和超时主机的处理与线程池引擎相同
+            deadline_seconds, _ = self._sweep_budget(len(servers), plan, Config.ASYNC_MONITOR_CONCURRENCY)
+            result_iter = self._monitor_servers_async(
+                servers, thresholds, deadline=start_time + deadline_seconds, stragglers=stragglers
+            )
+        else:
+            # 使用线程池并发监控服务器，自适应模式下由控制器决定同时进行的主机数
+            deadline_seconds, initial_concurrency = self._sweep_budget(len(servers), plan, max_workers)
+            controller = create_sweep_controller(max_workers, initial_concurrency)
+            result_iter = self._monitor_servers_threaded(
+                servers, thresholds, max_workers, controller,
+                deadline=start_time + deadline_seconds, stragglers=stragglers
+            )
+        
+        try:
+            for result in result_iter:
+                results.append(result)
+                
+                # 未开始采集的主机不写日志，也不计入失败
+                if result['status'] == 'skipped':
+                    skipped_count += 1
+                    skipped_server_ids.add(result['server_id'])
+                    continue
+                
+                # 统计结果
+                if result['status'] == 'success':
+                    success_count += 1
+                elif result['status'] == 'warning':
+                    warning_count += 1
+                else:
                     failed_count += 1
-                    
-                    # 保存失败结果
-                    self.save_monitor_result(failed_result)
+                    if result['status'] == 'timeout':
+                        timeout_count += 1
+                    elif result['status'] == 'circuit_open':
+                        circuit_open_count += 1
+                
+                # 保存监控结果
+                sink.add(result)
+        finally:
+            # 巡视结束时写入剩余结果
+            persistence_stats = sink.close()
+            dashboard_cache.invalidate()
+            HostMonitor._skipped_server_ids = skipped_server_ids
+        
+        # 超时日志已写库，之后完成的主机再用实际结果更新
+        for future, timeout_result in stragglers:
+            future.add_done_callback(
+                lambda f, timeout_result=timeout_result: self._apply_straggler_result(f, timeout_result, db_engine)
+            )
         
         execution_time = time.time() - start_time
         
@@ -420,16 +399,356 @@ class HostMonitor:
             'success_count': success_count,
             'failed_count': failed_count,
             'warning_count': warning_count,
+            'timeout_count': timeout_count,
+            'circuit_open_count': circuit_open_count,
+            'skipped_count': skipped_count,
+            'stragglers': len(stragglers),
+            'deadline': deadline_seconds,
             'results': results,
             'execution_time': execution_time,
             'thresholds': thresholds,
+            'engine': engine,
+            'concurrency': self._concurrency_summary(engine, max_workers, controller),
+            'plan': plan,
+            'persistence': persistence_stats,
             'monitor_time': datetime.now().isoformat()
         }
         
-        logger.info(f"主机巡视完成: 总数={len(servers)}, 成功={success_count}, 告警={warning_count}, 失败={failed_count}, 耗时={execution_time:.2f}s")
+        logger.info(f"主机巡视完成: 总数={len(servers)}, 成功={success_count}, 告警={warning_count}, 失败={failed_count}, 超时={timeout_count}, 熔断={circuit_open_count}, 未开始={skipped_count}, 耗时={execution_time:.2f}s")
         
         return summary
     
+    @staticmethod
+    def _sweep_budget(server_count: int, plan: Optional[Dict[str, Any]], max_workers: int):
+        """
+        按主机数量和历史耗时确定巡视期限和初始并发数
+        
+        预计总耗时（各主机历史平均耗时之和，没有历史的主机按中位数估计）按最大并发摊开后
+        超过 MONITOR_TIMEOUT 时延长期限；初始并发数至少能在 MONITOR_TIMEOUT 内完成预计总耗时。
+        
+        Returns:
+            (巡视期限秒数, 初始并发数)，初始并发数为None时使用配置
+        """
+        from config import Config
+        
+        deadline = Config.MONITOR_TIMEOUT
+        expected_total = (plan or {}).get('expected_total_time') or 0.0
+        if not Config.MONITOR_DEADLINE_AUTO or expected_total <= 0 or server_count <= 0:
+            return deadline, None
+        
+        # 预留一半余量给排队、重连和并发调整
+        estimated = expected_total / max(1, max_workers) * 1.5
+        if estimated > deadline:
+            logger.info(f"{server_count} 台主机预计巡视耗时 {estimated:.0f}s，超过 MONITOR_TIMEOUT，巡视期限延长到 {estimated:.0f}s")
+            deadline = estimated
+        
+        initial = max(Config.ADAPTIVE_INITIAL_CONCURRENCY, math.ceil(expected_total / max(1, Config.MONITOR_TIMEOUT)))
+        return deadline, min(initial, max_workers)
+    
+    @staticmethod
+    def _concurrency_summary(engine: str, max_workers: int, controller) -> Dict[str, Any]:
+        """本次巡视的并发控制摘要"""
+        if controller is not None:
+            return controller.get_summary()
+        if engine == 'async':
+            from config import Config
+            return {'mode': 'async', 'max_limit': Config.ASYNC_MONITOR_CONCURRENCY}
+        return {'mode': 'fixed', 'max_limit': max_workers}
+    
+    def _resolve_engine(self, engine: Optional[str]) -> str:
+        """确定本次巡视使用的采集引擎"""
+        if engine is None:
+            from config import Config
+            engine = getattr(Config, 'MONITOR_ENGINE', 'thread')
+        
+        engine = (engine or 'thread').lower()
+        if engine == 'async':
+            from app.async_collector import AsyncHostCollector
+            if not AsyncHostCollector.is_available():
+                logger.warning("未安装asyncssh，异步采集引擎不可用，回退到线程池引擎")
+                return 'thread'
+            return 'async'
+        return 'thread'
+    
+    def _monitor_servers_threaded(self, servers: List[Server], thresholds: Dict[str, float], max_workers: int,
+                                  controller=None, deadline: Optional[float] = None,
+                                  stragglers: Optional[list] = None):
+        """
+        使用线程池并发监控服务器，按完成顺序逐个产出监控结果
+        
+        任务按需提交：同时进行的主机数不超过当前并发上限（固定为 max_workers，
+        或由自适应控制器在每轮完成后调整）。到达巡视期限后，未完成的主机立即产出
+        timeout 结果，仍在采集的任务继续在后台运行，并登记到 stragglers；
+        尚未开始采集的主机产出 skipped 结果（不写日志、不计入失败）。
+        
+        Args:
+            servers: 服务器列表
+            thresholds: 阈值配置
+            max_workers: 最大并发数
+            controller: 自适应并发控制器，为None时使用固定并发
+            deadline: 巡视期限（时间戳），为None时等待所有主机完成
+            stragglers: 收集 (future, timeout结果) 的列表
+            
+        Yields:
+            监控结果字典
+        """
+        pending_servers = iter(servers)
+        in_flight = {}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        
+        try:
+            while True:
+                # 补足到当前并发上限
+                limit = controller.limit if controller is not None else max_workers
+                while len(in_flight) < limit:
+                    server = next(pending_servers, None)
+                    if server is None:
+                        break
+                    future = executor.submit(self.monitor_single_server, server, thresholds)
+                    in_flight[future] = (server, time.time())
+                
+                if not in_flight:
+                    break
+                
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                
+                # 收集结果
+                for future in done:
+                    server, submitted_at = in_flight.pop(future)
+                    result = self._future_result(future, server)
+                    
+                    # 熔断跳过的主机没有实际连接，不计入并发控制
+                    if controller is not None and result['status'] != 'circuit_open':
+                        controller.record(time.time() - submitted_at, result['status'] != 'failed', submitted_at)
+                    
+                    yield result
+                
+                if controller is not None:
+                    controller.maybe_adjust()
+            
+            # 巡视期限已到：仍在采集的主机记为超时，尚未开始的主机记为跳过
+            if in_flight:
+                logger.warning(f"巡视超过期限，{len(in_flight)} 台主机仍在采集，结果将在完成后更新")
+            for future, (server, submitted_at) in in_flight.items():
+                result = self._new_timeout_result(server, time.time() - submitted_at,
+                                                  "巡视超过期限仍未完成，采集结束后更新结果")
+                if stragglers is not None:
+                    stragglers.append((future, result))
+                yield result
+            
+            skipped = 0
+            for server in pending_servers:
+                skipped += 1
+                yield self._new_skipped_result(server)
+            if skipped:
+                logger.warning(f"巡视超过期限，{skipped} 台主机未开始采集，下一轮优先巡视")
+        finally:
+            # 不等待超时的任务，它们完成后由回调更新日志
+            executor.shutdown(wait=False)
+    
+    def _future_result(self, future: concurrent.futures.Future, server: Server) -> Dict[str, Any]:
+        """取出单台主机的监控结果，任务异常时生成失败结果"""
+        try:
+            result = future.result()
+            logger.info(f"服务器 {server.name} 监控完成，状态: {result['status']}")
+            
+        except Exception as e:
+            logger.error(f"监控服务器 {server.name} 时发生异常: {str(e)}")
+            
+            # 创建失败的监控结果记录
+            result = self._new_monitor_result(server)
+            result['memory_info'] = {}
+            result['error_message'] = str(e)
+        return result
+    
+    def _new_timeout_result(self, server: Server, elapsed: float, message: str) -> Dict[str, Any]:
+        """创建巡视期限内未完成的主机的 timeout 结果"""
+        result = self._new_monitor_result(server)
+        result['status'] = 'timeout'
+        result['memory_info'] = {}
+        result['execution_time'] = elapsed
+        result['error_message'] = message
+        # 固定监控时间，主机完成后据此找到这条日志
+        result['monitor_time'] = datetime.now()
+        return result
+    
+    def _new_skipped_result(self, server: Server) -> Dict[str, Any]:
+        """创建巡视期限前未开始采集的主机的 skipped 结果"""
+        result = self._new_monitor_result(server)
+        result['status'] = 'skipped'
+        result['memory_info'] = {}
+        result['execution_time'] = 0
+        result['error_message'] = "巡视超过期限，本轮未开始采集"
+        result['monitor_time'] = datetime.now()
+        return result
+    
+    def _apply_straggler_result(self, future: concurrent.futures.Future, timeout_result: Dict[str, Any], db_engine):
+        """
+        超时主机在后台完成后，用实际结果更新之前写入的 timeout 日志
+        
+        Args:
+            future: 该主机的监控任务
+            timeout_result: 巡视时产出的 timeout 结果
+            db_engine: 数据库引擎
+        """
+        server_name = timeout_result['server_name']
+        try:
+            result = future.result()
+        except Exception as e:
+            result = dict(timeout_result, status='failed', error_message=str(e))
+        
+        session = sessionmaker(bind=db_engine)()
+        try:
+            updated = apply_late_result(session, timeout_result['server_id'], timeout_result['monitor_time'], result)
+            session.commit()
+            if updated:
+                dashboard_cache.invalidate()
+                logger.info(f"服务器 {server_name} 在巡视期限后完成，状态: {result['status']}，已更新监控日志")
+            else:
+                logger.warning(f"服务器 {server_name} 在巡视期限后完成，但未找到对应的超时日志")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"更新服务器 {server_name} 的超时日志失败: {str(e)}")
+        finally:
+            session.close()
+    
+    def _monitor_servers_async(self, servers: List[Server], thresholds: Dict[str, float],
+                               deadline: Optional[float] = None, stragglers: Optional[list] = None):
+        """
+        使用异步引擎采集所有服务器，按完成顺序逐个产出监控结果
+        
+        主机在后台事件循环中并发采集，熔断中的主机不提交。到达巡视期限后，仍在采集的主机
+        产出 timeout 结果并登记到 stragglers，尚未开始采集的主机取消并产出 skipped 结果，
+        与线程池引擎相同。
+        
+        Args:
+            servers: 服务器列表
+            thresholds: 阈值配置
+            deadline: 巡视期限（时间戳），为None时等待所有主机完成
+            stragglers: 收集 (future, timeout结果) 的列表
+            
+        Yields:
+            监控结果字典
+        """
+        from config import Config
+        from app.async_collector import AsyncHostCollector
+        
+        # 在应用上下文中准备连接参数（含解密后的密码），事件循环中不访问数据库
+        with worker_app_context():
+            targets = [{
+                'server_id': server.id,
+                'host': server.host,
+                'port': server.port,
+                'username': server.username,
+                'password': self.server_service.get_server_password(server),
+                'private_key_path': server.private_key_path if server.private_key_path else None
+            } for server in servers]
+        
+        collector = AsyncHostCollector(
+            max_concurrency=Config.ASYNC_MONITOR_CONCURRENCY,
+            host_timeout=Config.ASYNC_MONITOR_HOST_TIMEOUT,
+            connect_timeout=self.ssh_manager.connect_timeout
+        )
+        circuit_breaker = self.ssh_manager.circuit_breaker
+        in_flight = {}
+        collector.start()
+        
+        try:
+            for server, target in zip(servers, targets):
+                try:
+                    circuit_breaker.before_attempt(f"{server.host}:{server.port}")
+                except CircuitOpenError as e:
+                    # 主机熔断中，本轮不尝试连接
+                    logger.warning(f"跳过服务器 {server.name}: {str(e)}")
+                    result = self._new_monitor_result(server)
+                    result['status'] = 'circuit_open'
+                    result['error_message'] = str(e)
+                    yield result
+                    continue
+                
+                collect_future = collector.submit(target)
+                future = self._async_result_future(collect_future, server, thresholds)
+                in_flight[future] = (server, collect_future, time.time())
+            
+            while in_flight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    server, _, _ = in_flight.pop(future)
+                    yield self._future_result(future, server)
+            
+            # 巡视期限已到：仍在采集的主机记为超时，尚未开始的主机取消并记为跳过
+            skipped = 0
+            for future, (server, collect_future, submitted_at) in in_flight.items():
+                if not collector.has_started(server.id) and collect_future.cancel():
+                    circuit_breaker.release_probe(f"{server.host}:{server.port}")
+                    skipped += 1
+                    yield self._new_skipped_result(server)
+                    continue
+                
+                result = self._new_timeout_result(server, time.time() - submitted_at,
+                                                  "巡视超过期限仍未完成，采集结束后更新结果")
+                if stragglers is not None:
+                    stragglers.append((future, result))
+                yield result
+            
+            if len(in_flight) > skipped:
+                logger.warning(f"巡视超过期限，{len(in_flight) - skipped} 台主机仍在采集，结果将在完成后更新")
+            if skipped:
+                logger.warning(f"巡视超过期限，{skipped} 台主机未开始采集，下一轮优先巡视")
+        finally:
+            # 不等待超时的主机，事件循环在它们完成后停止
+            collector.close()
+    
+    def _async_result_future(self, collect_future: concurrent.futures.Future, server: Server,
+                             thresholds: Dict[str, float]) -> concurrent.futures.Future:
+        """
+        把异步采集结果转换为监控结果（在事件循环线程中完成，并记录熔断状态）
+        
+        Args:
+            collect_future: AsyncHostCollector.submit 返回的Future
+            server: 服务器对象
+            thresholds: 阈值配置
+            
+        Returns:
+            监控结果的Future，采集被取消时同样被取消
+        """
+        result_future = concurrent.futures.Future()
+        host_key = f"{server.host}:{server.port}"
+        
+        def _on_done(future):
+            if future.cancelled():
+                result_future.cancel()
+                return
+            try:
+                item = future.result()
+                monitor_result = self._new_monitor_result(server)
+                monitor_result['execution_time'] = item['execution_time']
+                if item['success']:
+                    self.ssh_manager.circuit_breaker.record_success(host_key)
+                    self._apply_metrics(monitor_result, item['metrics'], thresholds)
+                    monitor_result['status'] = 'warning' if monitor_result['alerts'] else 'success'
+                else:
+                    self.ssh_manager.circuit_breaker.record_failure(host_key, item['error'])
+                    monitor_result['error_message'] = item['error_message']
+                result_future.set_result(monitor_result)
+            except Exception as e:
+                result_future.set_exception(e)
+        
+        collect_future.add_done_callback(_on_done)
+        return result_future
+    
     def get_monitor_history(self, server_id: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
         """
         获取监控历史记录
@@ -442,8 +761,6 @@ class HostMonitor:
             监控历史列表
         """
         try:
-            from flask import has_app_context
-            
             def _get_history():
                 query = MonitorLog.query
                 
@@ -451,90 +768,53 @@ class HostMonitor:
                     query = query.filter_by(server_id=server_id)
                 
                 logs = query.order_by(MonitorLog.monitor_time.desc()).limit(limit).all()
+                MonitorLog.preload_disk_snapshots(logs)
                 
                 return [log.to_dict() for log in logs]
             
-            if has_app_context():
+            with worker_app_context():
                 return _get_history()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    return _get_history()
             
         except Exception as e:
             logger.error(f"获取监控历史失败: {str(e)}")
             return []
     
-    def get_latest_server_status(self) -> Dict[int, Dict[str, Any]]:
+    def get_latest_server_status(self, include_alerts: bool = False) -> Dict[int, Dict[str, Any]]:
         """
         获取所有服务器的最新状态
         
+        Args:
+            include_alerts: 是否附带最新一次巡视的告警详情（alert_info）
+            
         Returns:
             服务器ID为键的状态字典
         """
         try:
-            from flask import has_app_context
-            
             def _get_status():
-                # 获取每个服务器的最新监控记录
-                from sqlalchemy import func
-                
-                subquery = db.session.query(
-                    MonitorLog.server_id,
-                    func.max(MonitorLog.monitor_time).label('latest_time')
-                ).group_by(MonitorLog.server_id).subquery()
+                # 从最新状态表读取，每台服务器一行
+                from app.models import ServerLatestStatus
+                from app.latest_status import rebuild_latest_status
                 
-                latest_logs = db.session.query(MonitorLog).join(
-                    subquery,
-                    (MonitorLog.server_id == subquery.c.server_id) &
-                    (MonitorLog.monitor_time == subquery.c.latest_time)
-                ).all()
+                latest_rows = ServerLatestStatus.query.all()
+                if not latest_rows and db.session.query(MonitorLog.id).first() is not None:
+                    # 升级后首次使用，从历史日志重建
+                    rebuild_latest_status(db.session)
+                    db.session.commit()
+                    latest_rows = ServerLatestStatus.query.all()
                 
                 status_dict = {}
-                for log in latest_logs:
-                    disk_info = log.get_disk_info()
-                    # 计算磁盘最大使用率
-                    max_disk_usage = 0.0
-                    if disk_info:
-                        max_disk_usage = max([disk.get('use_percent', 0.0) for disk in disk_info])
-                    
-                    status_dict[log.server_id] = {
-                        'status': log.status,
-                        'cpu_usage': log.cpu_usage,
-                        'memory_usage': log.memory_usage,
-                        'disk_info': disk_info,
-                        'max_disk_usage': max_disk_usage,  # 添加磁盘最大使用率
-                        'alert_count': len(log.get_alert_info()),
-                        'monitor_time': log.monitor_time.isoformat() if log.monitor_time else None,
-                        'execution_time': log.execution_time
-                    }
+                for row in latest_rows:
+                    status = row.to_dict()
+                    status.pop('server_id')
+                    status.pop('monitor_log_id')
+                    if include_alerts:
+                        status['alert_info'] = row.get_alert_info()
+                    status_dict[row.server_id] = status
                 
                 return status_dict
             
-            if has_app_context():
+            with worker_app_context():
                 return _get_status()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    return _get_status()
             
         except Exception as e:
             logger.error(f"获取最新服务器状态失败: {str(e)}")
@@ -542,7 +822,7 @@ class HostMonitor:
     
     def cleanup_old_logs(self, days_to_keep: int = 30) -> int:
         """
-        清理旧的监控日志
+        清理旧的监控日志（按主键范围分批删除，不长时间占用写锁）
         
         Args:
             days_to_keep: 保留天数
@@ -551,41 +831,11 @@ class HostMonitor:
             删除的记录数
         """
         try:
-            from flask import has_app_context
-            from datetime import timedelta
-            
-            def _cleanup():
-                cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-                
-                old_logs = MonitorLog.query.filter(MonitorLog.monitor_time < cutoff_date)
-                count = old_logs.count()
-                
-                old_logs.delete()
-                db.session.commit()
-                
-                logger.info(f"清理了 {count} 条旧监控日志")
-                return count
-            
-            if has_app_context():
-                return _cleanup()
-            else:
-                # 如果没有应用上下文，创建一个最小化的应用实例
-                from flask import Flask
-                from config import Config
-                app = Flask(__name__)
-                app.config.from_object(Config)
-                
-                # 只初始化数据库，不初始化调度器和服务监控
-                from app.models import db as database
-                database.init_app(app)
-                
-                with app.app_context():
-                    return _cleanup()
+            stats = retention_worker.purge_expired(days_to_keep)
+            count = stats['tables'].get('monitor_logs', {}).get('rows', 0)
+            logger.info(f"清理了 {count} 条旧监控日志")
+            return count
             
         except Exception as e:
-            try:
-                db.session.rollback()
-            except:
-                pass
             logger.error(f"清理旧监控日志失败: {str(e)}")
             return 0
\ No newline at end of file
@@ -263,6 +263,9 @@ class NotificationService:
             if total_servers > 0:
                 content += f"\n服务器总数: {total_servers}"
                 content += f"\n正常: {success_count}, 告警: {warning_count}, 异常: {failed_count}"
+                skipped_count = monitor_result.get('skipped_count', 0)
+                if skipped_count > 0:
+                    content += f"\n超过巡视期限未采集: {skipped_count}"
             
             # 添加告警详情
             alert_details = []
@@ -272,7 +275,7 @@ class NotificationService:
                 server_name = result.get('server_name', '未知')
                 server_ip = result.get('server_ip', '未知IP')
                 
-                if result.get('status') == 'failed':
+                if result.get('status') in ('failed', 'timeout', 'circuit_open'):
                     error_msg = result.get('error_message', '连接失败')
                     # 使用简化的错误信息
                     simplified_error = self._simplify_error_message(error_msg)
@@ -255,6 +255,18 @@ class ReportGenerator:
             background-color: #dc3545;
         }
         
+        .status-timeout {
+            background-color: #fd7e14;
+        }
+        
+        .status-circuit_open {
+            background-color: #6c757d;
+        }
+        
+        .status-skipped {
+            background-color: #adb5bd;
+        }
+        
         .server-details {
             display: block;
         }
@@ -1012,6 +1024,9 @@ class ReportGenerator:
                         <th>告警次数</th>
                         <th>失败次数</th>
                         <th>成功率</th>
+                        <th>CPU 平均/P95</th>
+                        <th>内存 平均/P95</th>
+                        <th>磁盘 P95/最高</th>
                     </tr>
                 </thead>
                 <tbody>
@@ -1023,6 +1038,9 @@ class ReportGenerator:
                         <td>{{ stat.warning_count }}</td>
                         <td>{{ stat.failed_count }}</td>
                         <td>{{ "%.1f"|format(stat.success_rate) }}%</td>
+                        <td>{% if stat.cpu %}{{ "%.1f"|format(stat.cpu.avg) }}% / {{ "%.1f"|format(stat.cpu.p95) }}%{% else %}-{% endif %}</td>
+                        <td>{% if stat.memory %}{{ "%.1f"|format(stat.memory.avg) }}% / {{ "%.1f"|format(stat.memory.p95) }}%{% else %}-{% endif %}</td>
+                        <td>{% if stat.disk %}{{ "%.1f"|format(stat.disk.p95) }}% / {{ "%.1f"|format(stat.disk.max) }}%{% else %}-{% endif %}</td>
                     </tr>
                     {% endfor %}
                 </tbody>
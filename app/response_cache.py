@@ -0,0 +1,69 @@
+"""
+接口响应缓存模块
+为刷新频繁、计算较重的接口（如仪表板）提供短时缓存，巡视完成时失效
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class TTLCache:
+    """带过期时间的简单内存缓存"""
+
+    def __init__(self, ttl: float):
+        """
+        Args:
+            ttl: 缓存有效期（秒），小于等于0时不缓存
+        """
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # 失效计数，防止失效前开始计算的结果在失效后写回缓存
+        self._generation = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        获取缓存值，不存在或已过期时调用 compute 计算并缓存
+
+        Args:
+            key: 缓存键
+            compute: 计算函数
+            cacheable: 判断计算结果是否可以缓存的函数（例如出错的结果不缓存）
+
+        Returns:
+            缓存值或新计算的值
+        """
+        if self.ttl <= 0:
+            return compute()
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            generation = self._generation
+
+        value = compute()
+
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.time() + self.ttl, value)
+        return value
+
+    def invalidate(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+def _dashboard_cache_ttl() -> float:
+    from config import Config
+    return float(getattr(Config, 'DASHBOARD_CACHE_TTL', 10))
+
+
+# 仪表板数据缓存，主机巡视、服务监控完成或日志删除时失效
+dashboard_cache = TTLCache(_dashboard_cache_ttl())
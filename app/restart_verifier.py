@@ -0,0 +1,98 @@
+"""
+延迟任务队列模块
+用于服务自动重启后的延迟复检：重启命令发出后不在巡视线程中等待，
+到期后由后台线程批量交给处理函数复检
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredTaskQueue:
+    """按到期时间执行的延迟任务队列（单个后台线程）"""
+
+    def __init__(self, handler: Callable[[List[Any]], None], name: str = 'deferred-task-queue'):
+        """
+        Args:
+            handler: 处理函数，接收同一时刻到期的一批任务
+            name: 后台线程名称
+        """
+        self._handler = handler
+        self._name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self._stats = {
+            'submitted': 0,
+            'processed': 0,
+            'failed_batches': 0
+        }
+
+    def submit(self, payload: Any, delay: float) -> None:
+        """
+        提交一个延迟任务
+
+        Args:
+            payload: 任务数据
+            delay: 延迟时间（秒）
+        """
+        with self._condition:
+            heapq.heappush(self._heap, (time.time() + delay, next(self._sequence), payload))
+            self._stats['submitted'] += 1
+            self._ensure_worker()
+            self._condition.notify()
+
+    def _ensure_worker(self):
+        """按需启动后台线程（需持有锁）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """后台线程：等待最早的任务到期，取出所有已到期任务交给处理函数"""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+
+                now = time.time()
+                batch = []
+                while self._heap and self._heap[0][0] <= now:
+                    batch.append(heapq.heappop(self._heap)[2])
+
+            try:
+                self._handler(batch)
+            except Exception as e:
+                self._stats['failed_batches'] += 1
+                logger.error(f"延迟任务处理失败 ({self._name}): {str(e)}")
+            finally:
+                self._stats['processed'] += len(batch)
+
+    def stop(self):
+        """停止后台线程，未到期的任务被丢弃"""
+        with self._condition:
+            self._stopped = True
+            self._heap.clear()
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._heap)
+        return stats
@@ -0,0 +1,268 @@
+"""
+巡视结果写入模块
+缓冲巡视结果，按批量大小或时间间隔在单个事务中批量写入数据库
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import sessionmaker
+from app.models import MonitorLog, ServerLatestStatus
+from app.latest_status import upsert_latest_status, refresh_latest_status
+from app.disk_storage import encode_disk_deltas
+from app.rollups import update_rollups, replace_late_sample, log_sample
+
+logger = logging.getLogger(__name__)
+
+
+def build_monitor_log(monitor_result: Dict[str, Any]) -> MonitorLog:
+    """
+    根据巡视结果字典构建MonitorLog对象（不写库）
+
+    Args:
+        monitor_result: 监控结果字典
+
+    Returns:
+        MonitorLog对象
+    """
+    monitor_log = MonitorLog(
+        server_id=monitor_result['server_id'],
+        monitor_time=monitor_result.get('monitor_time') or datetime.now(),
+        status=monitor_result['status'],
+        cpu_usage=monitor_result['cpu_usage'],
+        cpu_iowait=monitor_result.get('cpu_iowait'),
+        cpu_steal=monitor_result.get('cpu_steal'),
+        memory_usage=monitor_result['memory_usage'],
+        execution_time=monitor_result['execution_time'],
+        error_message=monitor_result['error_message']
+    )
+
+    if monitor_result.get('cpu_per_core'):
+        monitor_log.set_cpu_per_core(monitor_result['cpu_per_core'])
+
+    # 设置复杂数据
+    monitor_log.set_disk_info(monitor_result['disk_info'])
+    monitor_log.set_disk_metrics(monitor_result['disk_info'])
+    monitor_log.set_system_info(monitor_result['system_info'])
+    monitor_log.set_alert_info(monitor_result['alerts'])
+
+    # 设置内存详细信息
+    if 'memory_info' in monitor_result and monitor_result['memory_info']:
+        monitor_log.set_memory_info(monitor_result['memory_info'])
+
+    return monitor_log
+
+
+def persist_monitor_logs(session, monitor_logs: List[MonitorLog]) -> None:
+    """
+    在当前事务中写入一批MonitorLog并更新服务器最新状态（由调用方提交）
+
+    Args:
+        session: 数据库会话
+        monitor_logs: MonitorLog列表
+    """
+    encode_disk_deltas(session, monitor_logs)
+    session.add_all(monitor_logs)
+    session.flush()
+    upsert_latest_status(session, monitor_logs)
+    update_rollups(session, monitor_logs)
+
+
+def apply_late_result(session, server_id: int, monitor_time: datetime, monitor_result: Dict[str, Any]) -> bool:
+    """
+    用巡视期限之后才完成的采集结果更新已写入的超时日志（由调用方提交）
+
+    Args:
+        session: 数据库会话
+        server_id: 服务器ID
+        monitor_time: 超时日志的监控时间
+        monitor_result: 实际采集结果
+
+    Returns:
+        是否找到并更新了超时日志
+    """
+    monitor_log = session.query(MonitorLog).filter_by(
+        server_id=server_id, monitor_time=monitor_time, status='timeout'
+    ).first()
+    if monitor_log is None:
+        return False
+
+    timeout_sample = log_sample(monitor_log)
+    
+    # 保留原日志的ID和监控时间，其余字段以实际结果为准
+    fresh_log = build_monitor_log(monitor_result)
+    for column in MonitorLog.__table__.columns:
+        if column.key not in ('id', 'server_id', 'monitor_time'):
+            setattr(monitor_log, column.key, getattr(fresh_log, column.key))
+    monitor_log.set_disk_metrics(fresh_log.get_disk_info())
+
+    session.flush()
+    latest_status = session.get(ServerLatestStatus, server_id)
+    if latest_status is not None:
+        latest_status.record_late_poll(monitor_log)
+    refresh_latest_status(session, [server_id])
+    # 超时日志已按失败计入聚合，按与实际结果的差值修正所在的时间桶
+    replace_late_sample(session, timeout_sample, log_sample(monitor_log))
+    return True
+
+
+class MonitorResultSink:
+    """巡视结果批量写入器（write-behind）"""
+
+    def __init__(self, engine, batch_size: int = 100, flush_interval_ms: int = 1000):
+        """
+        Args:
+            engine: 数据库引擎（db.engine），在应用上下文中获取后传入，刷新线程不依赖应用上下文
+            batch_size: 缓冲达到该数量时立即刷新
+            flush_interval_ms: 缓冲中最早的结果等待超过该时间（毫秒）后刷新
+        """
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+        self._Session = sessionmaker(bind=engine)
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_since: Optional[float] = None
+        self._buffer_lock = threading.Lock()
+        # 保证同一时刻只有一个刷新在写库
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self._stats = {
+            'flush_count': 0,
+            'rows_written': 0,
+            'rows_failed': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+        self._flusher = threading.Thread(target=self._flush_loop, name='monitor-result-sink', daemon=True)
+        self._flusher.start()
+
+    def add(self, monitor_result: Dict[str, Any]) -> None:
+        """
+        加入一条巡视结果，缓冲满时在调用线程中刷新
+
+        Args:
+            monitor_result: 监控结果字典
+        """
+        if self._closed.is_set():
+            raise RuntimeError("结果写入器已关闭")
+
+        result = dict(monitor_result)
+        result.setdefault('monitor_time', datetime.now())
+
+        with self._buffer_lock:
+            if not self._buffer:
+                self._buffer_since = time.time()
+            self._buffer.append(result)
+            full = len(self._buffer) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        将缓冲中的结果在一个事务中写入数据库
+
+        Returns:
+            成功写入的行数
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch = self._buffer
+                self._buffer = []
+                self._buffer_since = None
+
+            if not batch:
+                return 0
+
+            start_time = time.time()
+            written = self._write_batch(batch)
+            elapsed_ms = (time.time() - start_time) * 1000
+
+            stats = self._stats
+            stats['flush_count'] += 1
+            stats['rows_written'] += written
+            stats['rows_failed'] += len(batch) - written
+            stats['last_batch_size'] = len(batch)
+            stats['max_batch_size'] = max(stats['max_batch_size'], len(batch))
+            stats['last_flush_ms'] = elapsed_ms
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+            stats['total_flush_ms'] += elapsed_ms
+
+            logger.debug(f"巡视结果批量写入: 行数={written}/{len(batch)}, 耗时={elapsed_ms:.1f}ms")
+            return written
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """写入一批结果，整批失败时逐条重试，避免个别坏数据拖累整批"""
+        session = self._Session()
+        try:
+            persist_monitor_logs(session, [build_monitor_log(result) for result in batch])
+            session.commit()
+            return len(batch)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"巡视结果批量写入失败，改为逐条写入: {str(e)}")
+        finally:
+            session.close()
+
+        written = 0
+        for result in batch:
+            session = self._Session()
+            try:
+                persist_monitor_logs(session, [build_monitor_log(result)])
+                session.commit()
+                written += 1
+            except Exception as e:
+                session.rollback()
+                logger.error(f"保存监控结果失败 (服务器ID: {result.get('server_id')}): {str(e)}")
+            finally:
+                session.close()
+        return written
+
+    def _flush_loop(self):
+        """后台刷新线程：缓冲等待超过刷新间隔时写库"""
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._buffer_lock:
+                due = self._buffer_since is not None and time.time() - self._buffer_since >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"巡视结果定时写入失败: {str(e)}")
+
+    def close(self) -> Dict[str, Any]:
+        """
+        停止后台线程并写入剩余结果
+
+        Returns:
+            写入统计信息
+        """
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        return self.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取写入统计信息
+
+        Returns:
+            包含刷新次数、写入行数、批量大小和刷新耗时（毫秒）的字典
+        """
+        stats = dict(self._stats)
+        total_flush_ms = stats.pop('total_flush_ms')
+        flush_count = stats['flush_count']
+        total_rows = stats['rows_written'] + stats['rows_failed']
+        stats['avg_batch_size'] = round(total_rows / flush_count, 2) if flush_count else 0
+        stats['avg_flush_ms'] = round(total_flush_ms / flush_count, 2) if flush_count else 0.0
+        stats['last_flush_ms'] = round(stats['last_flush_ms'], 2)
+        stats['max_flush_ms'] = round(stats['max_flush_ms'], 2)
+        stats['batch_size_limit'] = self.batch_size
+        stats['flush_interval_ms'] = int(self.flush_interval * 1000)
+        return stats
@@ -0,0 +1,355 @@
+"""
+日志保留清理模块
+按主键范围分批删除过期的主机监控日志（连同磁盘指标行）和服务监控日志，每批一个短事务，
+批与批之间让出写锁，清理期间巡视结果仍可正常写入；一键删除全部日志也在后台按同样方式执行。
+每次运行记录删除行数、每秒删除行数和等待写锁的时间。
+
+增量保存的磁盘信息所依赖的快照日志被清理前，先把仍保留的增量日志改写为完整列表；
+最新状态中的快照指针失效后下一次巡视会重新保存完整快照。
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased
+
+from app.disk_storage import rebase_disk_logs
+from app.models import db, DiskMetric, MonitorLog, ServerLatestStatus, ServiceMonitorLog
+from app.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+# 等待写锁超时后同一批的最大重试次数
+_LOCK_RETRIES = 5
+
+
+class RetentionWorker:
+    """分批清理监控日志的后台工作线程"""
+
+    def __init__(self, batch_size: Optional[int] = None, pause_ms: Optional[int] = None):
+        """
+        Args:
+            batch_size: 每批删除的行数，默认取配置 RETENTION_BATCH_SIZE
+            pause_ms: 两批之间的间隔（毫秒），默认取配置 RETENTION_BATCH_PAUSE_MS
+        """
+        from config import Config
+
+        self.batch_size = max(1, int(batch_size or getattr(Config, 'RETENTION_BATCH_SIZE', 1000)))
+        if pause_ms is None:
+            pause_ms = getattr(Config, 'RETENTION_BATCH_PAUSE_MS', 50)
+        self.pause = max(0, int(pause_ms)) / 1000.0
+
+        # 同一时刻只执行一个清理任务
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[Dict[str, Any]] = None
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------
+    # 任务入口
+    # ------------------------------------------------------------------
+
+    def purge_expired(self, monitor_days: Optional[int], service_days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        删除过期日志（在调用线程中执行）
+
+        Args:
+            monitor_days: 主机监控日志保留天数，为None或小于等于0时不清理
+            service_days: 服务监控日志保留天数，为None或小于等于0时不清理
+
+        Returns:
+            本次运行的统计信息
+        """
+        now = datetime.now()
+        monitor_cutoff = now - timedelta(days=monitor_days) if monitor_days and monitor_days > 0 else None
+        service_cutoff = now - timedelta(days=service_days) if service_days and service_days > 0 else None
+
+        def _job(stats):
+            if monitor_cutoff is not None:
+                self._purge_monitor_logs(stats, monitor_cutoff)
+            if service_cutoff is not None:
+                self._purge_table(stats, ServiceMonitorLog.__table__, ServiceMonitorLog.__table__.c.monitor_time,
+                                  service_cutoff)
+
+        return self._run('retention', _job)
+
+    def delete_all_monitor_logs(self) -> Dict[str, Any]:
+        """删除开始时已存在的全部主机监控日志（在调用线程中执行）"""
+        return self._run('delete_all', lambda stats: self._purge_monitor_logs(stats, None))
+
+    def submit(self, job: str, **kwargs) -> bool:
+        """
+        在后台线程中执行清理任务
+
+        Args:
+            job: 'retention'（参数同 purge_expired）或 'delete_all'
+
+        Returns:
+            是否已提交（已有任务在执行时返回False）
+        """
+        if self._run_lock.locked():
+            return False
+
+        target = self.delete_all_monitor_logs if job == 'delete_all' else self.purge_expired
+        threading.Thread(target=self._safe_call, args=(target,), kwargs=kwargs,
+                         name=f'retention-{job}', daemon=True).start()
+        return True
+
+    def start(self, interval_hours: float, monitor_days: int, service_days: int):
+        """
+        启动定期清理线程
+
+        Args:
+            interval_hours: 清理间隔（小时）
+            monitor_days: 主机监控日志保留天数
+            service_days: 服务监控日志保留天数
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        interval = max(0.1, float(interval_hours)) * 3600
+
+        def _loop():
+            # 启动后先等待一段时间，避开应用启动时的集中写入
+            while not self._stop.wait(min(interval, 300)):
+                self._safe_call(self.purge_expired, monitor_days=monitor_days, service_days=service_days)
+                if self._stop.wait(max(0.0, interval - 300)):
+                    break
+
+        self._thread = threading.Thread(target=_loop, name='retention-worker', daemon=True)
+        self._thread.start()
+        logger.info(f"日志定期清理已启动: 每 {interval_hours} 小时，主机日志保留 {monitor_days} 天，服务日志保留 {service_days} 天")
+
+    def stop(self):
+        """停止定期清理线程，正在执行的任务在当前批次结束后退出"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取清理任务状态
+
+        Returns:
+            包含正在执行的任务和上一次运行统计的字典
+        """
+        return {
+            'running': self._current is not None,
+            'current': dict(self._current) if self._current else None,
+            'last_run': self._last_run,
+            'batch_size': self.batch_size,
+            'batch_pause_ms': int(self.pause * 1000)
+        }
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def _safe_call(self, target, **kwargs):
+        try:
+            target(**kwargs)
+        except Exception as e:
+            logger.error(f"日志清理任务失败: {str(e)}")
+
+    def _run(self, job: str, body) -> Dict[str, Any]:
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("已有日志清理任务在执行")
+
+        stats = {
+            'job': job,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'tables': {},
+            'rows_deleted': 0,
+            'batches': 0,
+            'disk_deltas_rebased': 0,
+            'lock_wait_ms': 0.0,
+            'max_lock_wait_ms': 0.0,
+            'lock_timeouts': 0,
+            'elapsed_seconds': 0.0,
+            'rows_per_second': 0.0,
+            'error': None
+        }
+        self._current = stats
+        start_time = time.time()
+        try:
+            with worker_app_context():
+                body(stats)
+        except Exception as e:
+            stats['error'] = str(e)
+            raise
+        finally:
+            elapsed = time.time() - start_time
+            stats['finished_at'] = datetime.now().isoformat()
+            stats['elapsed_seconds'] = round(elapsed, 2)
+            stats['rows_per_second'] = round(stats['rows_deleted'] / elapsed, 1) if elapsed > 0 else 0.0
+            stats['lock_wait_ms'] = round(stats['lock_wait_ms'], 1)
+            stats['max_lock_wait_ms'] = round(stats['max_lock_wait_ms'], 1)
+            self._current = None
+            self._last_run = stats
+            self._run_lock.release()
+
+            logger.info(
+                f"日志清理完成({job}): 删除 {stats['rows_deleted']} 行，{stats['batches']} 批，"
+                f"耗时 {stats['elapsed_seconds']}s，{stats['rows_per_second']} 行/秒，"
+                f"等待写锁 {stats['lock_wait_ms']}ms（最长 {stats['max_lock_wait_ms']}ms）"
+            )
+        return stats
+
+    def _purge_monitor_logs(self, stats: Dict[str, Any], cutoff: Optional[datetime]):
+        """删除主机监控日志及其磁盘指标行，完成后清理失效的最新状态和过期的聚合数据"""
+        from app.response_cache import dashboard_cache
+        from app.rollups import purge_expired_rollups
+
+        if cutoff is not None:
+            stats['disk_deltas_rebased'] += self._rebase_disk_deltas(cutoff)
+        
+        monitor_logs = MonitorLog.__table__
+        max_id = self._purge_table(stats, monitor_logs, monitor_logs.c.monitor_time, cutoff,
+                                   children=((DiskMetric.__table__, DiskMetric.__table__.c.monitor_log_id),))
+
+        latest_status = ServerLatestStatus.__table__
+        with self._write_transaction(stats) as conn:
+            if cutoff is not None:
+                # 最新日志也已过期的服务器，同步移除其最新状态
+                conn.execute(delete(latest_status).where(latest_status.c.monitor_time < cutoff))
+            elif max_id is not None:
+                # 删除全部时只移除指向已删除日志的最新状态，清理期间新写入的保留
+                conn.execute(delete(latest_status).where(latest_status.c.monitor_log_id <= max_id))
+
+        if cutoff is not None:
+            # 指标聚合数据按各粒度自己的保留天数清理
+            purge_expired_rollups(db.session)
+            db.session.commit()
+        dashboard_cache.invalidate()
+
+    def _rebase_disk_deltas(self, cutoff: datetime) -> int:
+        """
+        把快照即将被清理、自身仍保留的增量日志改写为完整磁盘列表（连同磁盘指标行）
+
+        每台服务器最多 DISK_FULL_SNAPSHOT_INTERVAL 条，一个事务内完成。
+
+        Returns:
+            改写的日志数
+        """
+        snapshot = aliased(MonitorLog)
+        logs = db.session.query(MonitorLog).join(
+            snapshot, MonitorLog.disk_snapshot_id == snapshot.id
+        ).filter(
+            snapshot.monitor_time < cutoff,
+            MonitorLog.monitor_time >= cutoff
+        ).all()
+        if not logs:
+            return 0
+
+        rebase_disk_logs(logs)
+        db.session.commit()
+        logger.info(f"快照日志即将过期，{len(logs)} 条增量磁盘信息已改写为完整列表")
+        return len(logs)
+
+    def _purge_table(self, stats: Dict[str, Any], table, time_column, cutoff: Optional[datetime],
+                     children=()) -> Optional[int]:
+        """
+        按主键从小到大分批删除
+
+        Args:
+            stats: 运行统计
+            table: 要删除的表
+            time_column: 时间列，与cutoff比较
+            cutoff: 早于该时间的行被删除，为None时删除开始时已存在的全部行
+            children: (子表, 指向本表主键的列) 序列，先于本表删除
+
+        Returns:
+            本次处理的最大主键，没有可删除的行时为None
+        """
+        table_stats = stats['tables'].setdefault(table.name, {'rows': 0, 'batches': 0})
+        for child, _ in children:
+            stats['tables'].setdefault(child.name, {'rows': 0, 'batches': 0})
+
+        with db.engine.connect() as conn:
+            upper_id = conn.execute(select(func.max(table.c.id))).scalar()
+        if upper_id is None:
+            return None
+
+        last_id = 0
+        while not self._stop.is_set():
+            # 只读查询确定下一批的主键范围，不持有写锁
+            id_query = select(table.c.id).where(table.c.id > last_id, table.c.id <= upper_id)
+            if cutoff is not None:
+                id_query = id_query.where(time_column < cutoff)
+            with db.engine.connect() as conn:
+                ids = conn.execute(id_query.order_by(table.c.id).limit(self.batch_size)).scalars().all()
+            if not ids:
+                break
+
+            conditions = [table.c.id >= ids[0], table.c.id <= ids[-1]]
+            if cutoff is not None:
+                conditions.append(time_column < cutoff)
+
+            for attempt in range(_LOCK_RETRIES):
+                try:
+                    child_rows = {}
+                    with self._write_transaction(stats) as conn:
+                        for child, foreign_key in children:
+                            child_rows[child.name] = conn.execute(
+                                delete(child).where(foreign_key.in_(select(table.c.id).where(*conditions)))
+                            ).rowcount
+                        deleted = conn.execute(delete(table).where(*conditions)).rowcount
+                    break
+                except OperationalError as e:
+                    if 'locked' not in str(e) or attempt == _LOCK_RETRIES - 1:
+                        raise
+                    stats['lock_timeouts'] += 1
+                    logger.warning(f"日志清理等待写锁超时，稍后重试: {table.name} id {ids[0]}-{ids[-1]}")
+                    time.sleep(self.pause or 0.1)
+
+            for name, rows in child_rows.items():
+                stats['tables'][name]['rows'] += rows
+                stats['tables'][name]['batches'] += 1
+                stats['rows_deleted'] += rows
+            table_stats['rows'] += deleted
+            table_stats['batches'] += 1
+            stats['rows_deleted'] += deleted
+            stats['batches'] += 1
+            last_id = ids[-1]
+
+            # 让出写锁，等待中的写入可以在批次之间完成
+            if self.pause:
+                time.sleep(self.pause)
+
+        return last_id or None
+
+    @contextmanager
+    def _write_transaction(self, stats: Dict[str, Any]):
+        """
+        开启一个写事务并记录等待写锁的时间
+
+        SQLite 用 BEGIN IMMEDIATE 在事务开始时获取写锁，获取耗时即为锁等待时间；
+        其他数据库在语句执行时按行加锁，这里只统计开始事务的耗时。
+        """
+        with db.engine.connect() as conn:
+            wait_start = time.time()
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+            else:
+                conn.begin()
+            wait_ms = (time.time() - wait_start) * 1000
+            stats['lock_wait_ms'] += wait_ms
+            stats['max_lock_wait_ms'] = max(stats['max_lock_wait_ms'], wait_ms)
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+
+# 进程内共享的清理工作线程
+retention_worker = RetentionWorker()
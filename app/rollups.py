@@ -0,0 +1,488 @@
+"""
+监控指标聚合模块
+写入监控日志时按5分钟、1小时、1天三种粒度增量累加每台服务器的CPU、内存和最高磁盘使用率
+（最小、最大、平均和基于直方图的P95）以及巡视次数，各粒度按各自的保留天数清理；
+历史查询和汇总报告从满足时间范围的最粗粒度读取，不再扫描原始监控日志
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.models import DiskMetric, MetricRollup, MonitorLog, Server
+
+logger = logging.getLogger(__name__)
+
+# 从细到粗的聚合粒度
+ROLLUP_RESOLUTIONS = (
+    ('5m', timedelta(minutes=5)),
+    ('1h', timedelta(hours=1)),
+    ('1d', timedelta(days=1)),
+)
+_RESOLUTION_WIDTHS = dict(ROLLUP_RESOLUTIONS)
+
+# 各粒度保留天数对应的配置项和默认值
+_RETENTION_SETTINGS = {
+    '5m': ('ROLLUP_RETENTION_5M_DAYS', 7),
+    '1h': ('ROLLUP_RETENTION_1H_DAYS', 90),
+    '1d': ('ROLLUP_RETENTION_1D_DAYS', 730),
+}
+
+# IN 查询每批的参数数量，避免超过SQLite的变量上限
+_IN_CHUNK_SIZE = 500
+
+# 过期聚合数据的清理间隔（秒），在写入路径上顺带执行
+_PURGE_INTERVAL = 3600
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+# (server_id, monitor_time, status, 指标取值)
+Sample = Tuple[int, datetime, str, Dict[str, Optional[float]]]
+
+
+def bucket_start(resolution: str, moment: datetime) -> datetime:
+    """时间所在的时间桶起始时间"""
+    if resolution == '5m':
+        return moment.replace(minute=moment.minute - moment.minute % 5, second=0, microsecond=0)
+    if resolution == '1h':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_retention_days(resolution: str) -> int:
+    """粒度的保留天数，0表示不清理"""
+    from config import Config
+
+    name, default = _RETENTION_SETTINGS[resolution]
+    return int(getattr(Config, name, default))
+
+
+def _is_enabled() -> bool:
+    from config import Config
+
+    return getattr(Config, 'ROLLUP_ENABLED', True)
+
+
+def log_sample(log: MonitorLog) -> Sample:
+    """由尚在会话中的监控日志取样"""
+    # 写入时增量日志的完整磁盘列表保留在内存中，不需要查询快照
+    disk_values = [disk.get('use_percent') for disk in log.get_disk_info() if disk.get('use_percent') is not None]
+    return log.server_id, log.monitor_time, log.status, {
+        'cpu': log.cpu_usage,
+        'memory': log.memory_usage,
+        'disk': max(disk_values) if disk_values else None
+    }
+
+
+def _accumulate(session, samples: Iterable[Sample], rows: Dict[tuple, MetricRollup],
+                resolutions: Iterable[str] = tuple(_RESOLUTION_WIDTHS)) -> int:
+    """
+    把样本累加到各粒度的时间桶
+
+    Args:
+        session: 数据库会话
+        samples: 样本序列
+        rows: 已加载的聚合行 (server_id, resolution, bucket_start) -> MetricRollup，
+              缺少的时间桶新建后加入其中
+        resolutions: 累加的粒度
+
+    Returns:
+        累加的样本数
+    """
+    count = 0
+    for server_id, monitor_time, status, values in samples:
+        if monitor_time is None:
+            continue
+        for resolution in resolutions:
+            key = (server_id, resolution, bucket_start(resolution, monitor_time))
+            row = rows.get(key)
+            if row is None:
+                row = MetricRollup(server_id=server_id, resolution=resolution, bucket_start=key[2])
+                session.add(row)
+                rows[key] = row
+            row.add_sample(status, values)
+        count += 1
+    return count
+
+
+def update_rollups(session, monitor_logs: List[MonitorLog]) -> int:
+    """
+    把新写入的监控日志累加到聚合表（需在写入日志的同一事务中调用，由调用方提交）
+
+    日志已先写入，SQLite此时持有写锁，读取并更新时间桶不会与其他写入交错。
+
+    Args:
+        session: 数据库会话
+        monitor_logs: 本批写入的MonitorLog列表
+
+    Returns:
+        累加的样本数
+    """
+    if not monitor_logs or not _is_enabled():
+        return 0
+
+    samples = [log_sample(log) for log in monitor_logs if log.monitor_time is not None]
+
+    # 批量加载本批涉及的时间桶
+    existing = {}
+    server_ids = list({sample[0] for sample in samples})
+    for resolution, _ in ROLLUP_RESOLUTIONS:
+        buckets = list({bucket_start(resolution, sample[1]) for sample in samples})
+        for start in range(0, len(server_ids), _IN_CHUNK_SIZE):
+            chunk = server_ids[start:start + _IN_CHUNK_SIZE]
+            rows = session.query(MetricRollup).filter(
+                MetricRollup.resolution == resolution,
+                MetricRollup.server_id.in_(chunk),
+                MetricRollup.bucket_start.in_(buckets)
+            )
+            for row in rows:
+                existing[(row.server_id, row.resolution, row.bucket_start)] = row
+
+    count = _accumulate(session, samples, existing)
+    _purge_if_due(session)
+    return count
+
+
+def _snapshot_disk_max(session, server_ids: Optional[List[int]], start: datetime, end: datetime) -> Dict[int, Dict[str, Any]]:
+    """时间范围内增量日志所依赖的完整快照：快照日志ID -> {挂载点: 使用率}"""
+    query = session.query(MonitorLog.disk_snapshot_id).filter(
+        MonitorLog.monitor_time >= start,
+        MonitorLog.monitor_time < end,
+        MonitorLog.disk_snapshot_id.isnot(None)
+    )
+    if server_ids is not None:
+        query = query.filter(MonitorLog.server_id.in_(server_ids))
+    snapshot_ids = [snapshot_id for (snapshot_id,) in query.distinct()]
+
+    snapshots = {}
+    for index in range(0, len(snapshot_ids), _IN_CHUNK_SIZE):
+        chunk = snapshot_ids[index:index + _IN_CHUNK_SIZE]
+        rows = session.query(MonitorLog.id, MonitorLog.disk_info).filter(MonitorLog.id.in_(chunk))
+        for snapshot_id, disk_info in rows:
+            snapshots[snapshot_id] = {
+                item.get('mounted_on'): item.get('use_percent') for item in json.loads(disk_info or '[]')
+            }
+    return snapshots
+
+
+def _raw_samples(session, server_ids: Optional[List[int]], start: datetime, end: datetime):
+    """按时间顺序读取原始监控日志样本（磁盘取指标行中的最高使用率，增量日志与其完整快照合并）"""
+    snapshots = _snapshot_disk_max(session, server_ids, start, end)
+
+    disk_max = session.query(
+        DiskMetric.monitor_log_id.label('log_id'),
+        func.max(DiskMetric.use_percent).label('disk_max')
+    ).filter(
+        DiskMetric.monitor_time >= start,
+        DiskMetric.monitor_time < end
+    ).group_by(DiskMetric.monitor_log_id).subquery()
+
+    query = session.query(
+        MonitorLog.server_id,
+        MonitorLog.monitor_time,
+        MonitorLog.status,
+        MonitorLog.cpu_usage,
+        MonitorLog.memory_usage,
+        disk_max.c.disk_max,
+        MonitorLog.disk_info,
+        MonitorLog.disk_snapshot_id
+    ).outerjoin(disk_max, disk_max.c.log_id == MonitorLog.id).filter(
+        MonitorLog.monitor_time >= start,
+        MonitorLog.monitor_time < end
+    )
+    if server_ids is not None:
+        query = query.filter(MonitorLog.server_id.in_(server_ids))
+
+    for server_id, monitor_time, status, cpu, memory, disk, disk_info, snapshot_id in query.yield_per(1000):
+        if snapshot_id:
+            # 增量日志的指标行只有变化的挂载点，其余挂载点取快照中的值
+            usage = dict(snapshots.get(snapshot_id, {}))
+            usage.update({item.get('mounted_on'): item.get('use_percent') for item in json.loads(disk_info or '[]')})
+            values = [value for value in usage.values() if value is not None]
+            disk = max(values) if values else None
+        elif disk is None and disk_info:
+            # 没有磁盘指标行的早期日志，从完整的JSON列表中取
+            values = [item.get('use_percent') for item in json.loads(disk_info) if item.get('use_percent') is not None]
+            disk = max(values) if values else None
+        yield server_id, monitor_time, status, {'cpu': cpu, 'memory': memory, 'disk': disk}
+
+
+def rebuild_rollups(session, server_ids: Optional[List[int]] = None,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """
+    用原始监控日志重新计算覆盖时间范围的时间桶（由调用方提交）
+
+    用于升级后为已有日志补建聚合数据，以及无法按差值修正的迟到结果。
+    start为空时从最早的原始日志开始，更早的时间桶（原始日志已被清理）保持不变。
+
+    Args:
+        session: 数据库会话
+        server_ids: 服务器ID列表，为None时处理全部服务器
+        start: 起始时间，为None时从最早的监控日志开始
+        end: 结束时间，为None时到当前时间
+
+    Returns:
+        重新计算的时间桶数
+    """
+    if not _is_enabled():
+        return 0
+
+    if start is None:
+        start = session.query(func.min(MonitorLog.monitor_time)).scalar()
+        if start is None:
+            return 0
+    end = end or datetime.now()
+
+    chunks = [server_ids[index:index + _IN_CHUNK_SIZE] for index in range(0, len(server_ids), _IN_CHUNK_SIZE)] \
+        if server_ids is not None else [None]
+
+    rebuilt = 0
+    for chunk in chunks:
+        for resolution, width in ROLLUP_RESOLUTIONS:
+            range_start = bucket_start(resolution, start)
+            range_end = bucket_start(resolution, end) + width
+
+            stale = session.query(MetricRollup).filter(
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start >= range_start,
+                MetricRollup.bucket_start < range_end
+            )
+            if chunk is not None:
+                stale = stale.filter(MetricRollup.server_id.in_(chunk))
+            stale.delete(synchronize_session=False)
+
+            rows = {}
+            _accumulate(session, _raw_samples(session, chunk, range_start, range_end), rows, (resolution,))
+            rebuilt += len(rows)
+
+    session.flush()
+    return rebuilt
+
+
+def replace_late_sample(session, old_sample: Sample, new_sample: Sample) -> bool:
+    """
+    超时日志被迟到的实际结果替换后，按两者的差值修正所在的时间桶（需在更新日志之后、同一事务中调用）
+
+    超时日志没有指标取值，撤回它的状态计数后累加实际样本即可，不需要重读整个时间桶的原始日志；
+    旧样本带有指标取值时（最小值、最大值无法撤回）改为按原始日志重算。
+
+    Args:
+        session: 数据库会话
+        old_sample: 被替换日志的样本
+        new_sample: 实际结果的样本
+
+    Returns:
+        是否按差值修正（False表示未启用或已按原始日志重算）
+    """
+    if not _is_enabled():
+        return False
+
+    server_id, monitor_time, old_status, old_values = old_sample
+    if monitor_time is None:
+        return False
+    if any(value is not None for value in old_values.values()):
+        rebuild_rollups(session, [server_id], monitor_time, monitor_time)
+        return False
+
+    rows = {}
+    for resolution, _ in ROLLUP_RESOLUTIONS:
+        start = bucket_start(resolution, monitor_time)
+        row = session.query(MetricRollup).filter_by(
+            server_id=server_id, resolution=resolution, bucket_start=start
+        ).first()
+        if row is not None:
+            row.remove_status(old_status)
+            rows[(server_id, resolution, start)] = row
+
+    # 时间桶已被清理时只累加实际样本
+    _accumulate(session, [new_sample], rows)
+    return True
+
+
+def purge_expired_rollups(session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    按各粒度的保留天数删除过期的时间桶（由调用方提交）
+
+    Returns:
+        各粒度删除的行数
+    """
+    now = now or datetime.now()
+    deleted = {}
+    for resolution, _ in ROLLUP_RESOLUTIONS:
+        days = get_retention_days(resolution)
+        if days <= 0:
+            deleted[resolution] = 0
+            continue
+        deleted[resolution] = session.query(MetricRollup).filter(
+            MetricRollup.resolution == resolution,
+            MetricRollup.bucket_start < now - timedelta(days=days)
+        ).delete(synchronize_session=False)
+    return deleted
+
+
+def _purge_if_due(session):
+    """写入路径上每隔一段时间顺带清理一次过期数据"""
+    global _last_purge
+
+    with _purge_lock:
+        if time.time() - _last_purge < _PURGE_INTERVAL:
+            return
+        _last_purge = time.time()
+
+    deleted = purge_expired_rollups(session)
+    if any(deleted.values()):
+        logger.info(f"清理过期的监控指标聚合数据: {deleted}")
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: Optional[int] = None,
+                      now: Optional[datetime] = None) -> str:
+    """
+    为历史查询选择粒度: 保留期覆盖起始时间、且每台服务器的点数不超过上限的最细粒度，
+    都不满足时使用最粗粒度
+
+    Args:
+        start: 起始时间
+        end: 结束时间
+        max_points: 点数上限，默认取配置 ROLLUP_MAX_POINTS
+        now: 当前时间
+    """
+    from config import Config
+
+    max_points = max_points or int(getattr(Config, 'ROLLUP_MAX_POINTS', 500))
+    now = now or datetime.now()
+    span = max(end - start, timedelta(0))
+    for resolution, width in ROLLUP_RESOLUTIONS:
+        days = get_retention_days(resolution)
+        if days > 0 and start < now - timedelta(days=days):
+            continue
+        if span / width <= max_points:
+            return resolution
+    return ROLLUP_RESOLUTIONS[-1][0]
+
+
+def choose_summary_resolution(start: datetime, end: datetime, now: Optional[datetime] = None) -> str:
+    """
+    为汇总统计选择粒度: 起止时间都落在时间桶边界上、且保留期覆盖起始时间的最粗粒度，
+    保证累加的时间桶不超出统计范围
+    """
+    now = now or datetime.now()
+    for resolution, _ in reversed(ROLLUP_RESOLUTIONS):
+        days = get_retention_days(resolution)
+        if days > 0 and start < now - timedelta(days=days):
+            continue
+        if bucket_start(resolution, start) == start and bucket_start(resolution, end) == end:
+            return resolution
+    return ROLLUP_RESOLUTIONS[0][0]
+
+
+def query_metric_history(session, server_id: int, start: datetime, end: datetime,
+                         resolution: Optional[str] = None) -> Dict[str, Any]:
+    """
+    查询单台服务器的指标历史
+
+    Args:
+        session: 数据库会话
+        server_id: 服务器ID
+        start: 起始时间
+        end: 结束时间
+        resolution: 指定粒度，为空时自动选择
+
+    Returns:
+        包含所用粒度和各时间桶统计的字典
+    """
+    if resolution not in _RESOLUTION_WIDTHS:
+        resolution = choose_resolution(start, end)
+
+    rows = session.query(MetricRollup).filter(
+        MetricRollup.server_id == server_id,
+        MetricRollup.resolution == resolution,
+        MetricRollup.bucket_start >= bucket_start(resolution, start),
+        MetricRollup.bucket_start < end
+    ).order_by(MetricRollup.bucket_start)
+
+    return {
+        'server_id': server_id,
+        'resolution': resolution,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'points': [row.to_dict() for row in rows]
+    }
+
+
+def summarize_servers(session, start: datetime, end: datetime) -> Dict[str, Any]:
+    """
+    按服务器汇总时间范围内的巡视次数和指标（供汇总报告使用）
+
+    Args:
+        session: 数据库会话
+        start: 起始时间
+        end: 结束时间（不含）
+
+    Returns:
+        包含所用粒度和各服务器统计列表的字典
+    """
+    resolution = choose_summary_resolution(start, end)
+    rows = session.query(MetricRollup).filter(
+        MetricRollup.resolution == resolution,
+        MetricRollup.bucket_start >= start,
+        MetricRollup.bucket_start < end
+    )
+
+    totals: Dict[int, MetricRollup] = {}
+    for row in rows.yield_per(1000):
+        total = totals.get(row.server_id)
+        if total is None:
+            total = totals[row.server_id] = MetricRollup(server_id=row.server_id, resolution=resolution)
+        _merge_rollup(total, row)
+
+    server_ids = list(totals.keys())
+    names = {}
+    for start_index in range(0, len(server_ids), _IN_CHUNK_SIZE):
+        chunk = server_ids[start_index:start_index + _IN_CHUNK_SIZE]
+        names.update(session.query(Server.id, Server.name).filter(Server.id.in_(chunk)).all())
+
+    server_stats = []
+    for server_id, total in sorted(totals.items(), key=lambda item: names.get(item[0]) or ''):
+        total_checks = total.sample_count or 0
+        stat = {
+            'server_id': server_id,
+            'server_name': names.get(server_id, f'#{server_id}'),
+            'total_checks': total_checks,
+            'success_count': total.success_count or 0,
+            'warning_count': total.warning_count or 0,
+            'failed_count': total.failed_count or 0,
+            'success_rate': ((total.success_count or 0) + (total.warning_count or 0)) * 100.0 / total_checks
+            if total_checks else 0
+        }
+        for metric in MetricRollup.METRICS:
+            stat[metric] = total.metric_summary(metric)
+        server_stats.append(stat)
+
+    return {'resolution': resolution, 'server_stats': server_stats}
+
+
+def _merge_rollup(total: MetricRollup, row: MetricRollup):
+    """把一个时间桶合并到内存中的汇总对象（不写库）"""
+    for field in ('sample_count', 'success_count', 'warning_count', 'failed_count'):
+        setattr(total, field, (getattr(total, field) or 0) + (getattr(row, field) or 0))
+
+    for metric in MetricRollup.METRICS:
+        count = getattr(row, f'{metric}_count') or 0
+        if not count:
+            continue
+        low, high = getattr(total, f'{metric}_min'), getattr(total, f'{metric}_max')
+        row_low, row_high = getattr(row, f'{metric}_min'), getattr(row, f'{metric}_max')
+        setattr(total, f'{metric}_count', (getattr(total, f'{metric}_count') or 0) + count)
+        setattr(total, f'{metric}_min', row_low if low is None else min(low, row_low))
+        setattr(total, f'{metric}_max', row_high if high is None else max(high, row_high))
+        setattr(total, f'{metric}_sum', (getattr(total, f'{metric}_sum') or 0.0) + (getattr(row, f'{metric}_sum') or 0.0))
+
+        histogram = total.get_histogram(metric)
+        for key, value in row.get_histogram(metric).items():
+            histogram[key] = histogram.get(key, 0) + value
+        setattr(total, f'{metric}_histogram', json.dumps(histogram))
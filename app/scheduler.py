@@ -21,23 +21,10 @@ def execute_monitor_task_static(task_id: int, database_url: str, report_dir: str
     try:
         # 更新任务最后执行时间
         from app.models import db, ScheduleTask, MonitorReport
-        from flask import current_app
+        from app.worker_context import worker_app_context
         
-        # 使用当前应用上下文，避免重新创建应用实例
-        if current_app:
-            app = current_app
-        else:
-            # 如果没有当前应用上下文，创建一个最小化的应用实例
-            from flask import Flask
-            from config import Config
-            app = Flask(__name__)
-            app.config.from_object(Config)
-            
-            # 只初始化数据库，不初始化调度器和服务监控
-            from app.models import db as database
-            database.init_app(app)
-            
-        with app.app_context():
+        # 调度线程没有应用上下文，复用已注册的应用实例，避免重新创建应用
+        with worker_app_context():
             # 创建新的服务实例（在应用上下文中）
             from app.monitor import HostMonitor
             from app.report_generator import ReportGenerator
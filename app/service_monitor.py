@@ -7,17 +7,59 @@ import logging
 import re
 import threading
 import time
+import concurrent.futures
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy import func
+from sqlalchemy import func, case, select
 from app.models import db, Server, ServiceConfig, ServiceMonitorLog, GlobalSettings
 from app.ssh_manager import SSHConnectionManager
 from app.services import ServerService
 from app.notification_service import NotificationService
 from app.ssh_pool_health_checker import SSHPoolHealthChecker
+from app.response_cache import dashboard_cache
+from app.restart_verifier import DeferredTaskQueue
 
 logger = logging.getLogger(__name__)
 
+
+def _grep_basic_regex_to_python(pattern: str) -> str:
+    """
+    将grep基本正则（BRE）转换为Python正则
+    
+    BRE中 + ? | { } ( ) 是普通字符，加反斜杠后才是元字符，与Python正则相反；方括号内的内容原样保留。
+    """
+    specials = '+?|{}()'
+    converted = []
+    in_bracket = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if in_bracket:
+            converted.append(char)
+            if char == ']':
+                in_bracket = False
+        elif char == '[':
+            in_bracket = True
+            converted.append(char)
+            # 紧跟在 [ 或 [^ 之后的 ] 是普通字符
+            if pattern[i + 1:i + 2] == '^':
+                converted.append('^')
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                converted.append('\\]')
+                i += 1
+        elif char == '\\' and i + 1 < len(pattern):
+            following = pattern[i + 1]
+            converted.append(following if following in specials else char + following)
+            i += 1
+        elif char in specials:
+            converted.append('\\' + char)
+        else:
+            converted.append(char)
+        i += 1
+    return ''.join(converted)
+
+
 class ServiceMonitorService:
     """服务监控服务类"""
     
@@ -64,6 +106,8 @@ class ServiceMonitorService:
         self._is_monitoring = False
         self._current_interval = 10  # 当前监控间隔
         self._restart_requested = False  # 重启请求标志
+        # 自动重启后的延迟复检队列，巡视线程不等待重启结果
+        self._restart_verifier = DeferredTaskQueue(self._verify_restarted_services, name='service-restart-verifier')
         self.app = app
         self._initialized = True
         
@@ -208,6 +252,65 @@ class ServiceMonitorService:
             logger.error(f"删除服务配置失败: {str(e)}")
             return False, f"删除服务配置失败: {str(e)}"
     
+    @staticmethod
+    def _latest_service_logs_subquery(service_ids):
+        """
+        构建“每个服务最新一条监控日志”的子查询
+        
+        Args:
+            service_ids: 服务配置ID列表或返回服务配置ID的select语句
+            
+        Returns:
+            包含 service_config_id、max_time 列的子查询
+        """
+        return (
+            db.session.query(
+                ServiceMonitorLog.service_config_id,
+                func.max(ServiceMonitorLog.monitor_time).label('max_time')
+            )
+            .filter(ServiceMonitorLog.service_config_id.in_(service_ids))
+            .group_by(ServiceMonitorLog.service_config_id)
+            .subquery()
+        )
+    
+    def _get_latest_service_logs(self, service_ids) -> Dict[int, ServiceMonitorLog]:
+        """
+        批量获取服务的最新监控日志
+        
+        Args:
+            service_ids: 服务配置ID列表或返回服务配置ID的select语句
+            
+        Returns:
+            服务配置ID为键的最新监控日志字典
+        """
+        latest_times = self._latest_service_logs_subquery(service_ids)
+        latest_logs = (
+            db.session.query(ServiceMonitorLog)
+            .join(
+                latest_times,
+                (ServiceMonitorLog.service_config_id == latest_times.c.service_config_id) &
+                (ServiceMonitorLog.monitor_time == latest_times.c.max_time)
+            )
+            .all()
+        )
+        return {log.service_config_id: log for log in latest_logs}
+    
+    @staticmethod
+    def _service_to_dict_with_latest(service: ServiceConfig, latest_log: Optional[ServiceMonitorLog]) -> Dict[str, Any]:
+        """服务配置字典附加最新监控状态"""
+        service_dict = service.to_dict()
+
+        if latest_log:
+            service_dict['latest_status'] = latest_log.status
+            service_dict['latest_process_count'] = latest_log.process_count
+            service_dict['latest_monitor_time'] = latest_log.monitor_time.isoformat()
+        else:
+            service_dict['latest_status'] = 'unknown'
+            service_dict['latest_process_count'] = 0
+            service_dict['latest_monitor_time'] = None
+
+        return service_dict
+    
     def get_services_by_server(self, server_id: int) -> List[Dict[str, Any]]:
         """
         获取指定服务器的服务配置列表
@@ -223,50 +326,71 @@ class ServiceMonitorService:
             if not services:
                 return []
 
-            service_ids = [service.id for service in services]
-            latest_times = (
-                db.session.query(
-                    ServiceMonitorLog.service_config_id,
-                    func.max(ServiceMonitorLog.monitor_time).label('max_time')
-                )
-                .filter(ServiceMonitorLog.service_config_id.in_(service_ids))
-                .group_by(ServiceMonitorLog.service_config_id)
-                .subquery()
-            )
-
-            latest_logs = (
-                db.session.query(ServiceMonitorLog)
-                .join(
-                    latest_times,
-                    (ServiceMonitorLog.service_config_id == latest_times.c.service_config_id) &
-                    (ServiceMonitorLog.monitor_time == latest_times.c.max_time)
-                )
-                .all()
-            )
-            latest_by_service_id = {log.service_config_id: log for log in latest_logs}
-
-            result = []
-            for service in services:
-                service_dict = service.to_dict()
-                latest_log = latest_by_service_id.get(service.id)
+            latest_by_service_id = self._get_latest_service_logs([service.id for service in services])
 
-                if latest_log:
-                    service_dict['latest_status'] = latest_log.status
-                    service_dict['latest_process_count'] = latest_log.process_count
-                    service_dict['latest_monitor_time'] = latest_log.monitor_time.isoformat()
-                else:
-                    service_dict['latest_status'] = 'unknown'
-                    service_dict['latest_process_count'] = 0
-                    service_dict['latest_monitor_time'] = None
-
-                result.append(service_dict)
-
-            return result
+            return [
+                self._service_to_dict_with_latest(service, latest_by_service_id.get(service.id))
+                for service in services
+            ]
 
         except Exception as e:
             logger.error(f"获取服务配置列表失败: {str(e)}")
             return []
     
+    def get_service_stats_by_server(self, server_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        批量获取服务器的服务统计（查询次数固定，与服务器和服务数量无关）
+        
+        Args:
+            server_ids: 服务器ID列表
+            
+        Returns:
+            服务器ID为键的统计字典，包含 total_services、monitoring_services、status_counts（监控中服务的最新状态计数）
+        """
+        stats = {
+            server_id: {'total_services': 0, 'monitoring_services': 0, 'status_counts': {}}
+            for server_id in server_ids
+        }
+        if not server_ids:
+            return stats
+
+        # 服务总数与监控中的服务数
+        service_counts = (
+            db.session.query(
+                ServiceConfig.server_id,
+                func.count(ServiceConfig.id),
+                func.sum(case((ServiceConfig.is_monitoring == True, 1), else_=0))
+            )
+            .filter(ServiceConfig.server_id.in_(server_ids))
+            .group_by(ServiceConfig.server_id)
+            .all()
+        )
+        for server_id, total, monitoring in service_counts:
+            stats[server_id]['total_services'] = total
+            stats[server_id]['monitoring_services'] = int(monitoring or 0)
+
+        # 监控中服务的最新状态分布
+        monitoring_ids = select(ServiceConfig.id).where(
+            ServiceConfig.server_id.in_(server_ids),
+            ServiceConfig.is_monitoring == True
+        )
+        latest_times = self._latest_service_logs_subquery(monitoring_ids)
+        status_counts = (
+            db.session.query(ServiceConfig.server_id, ServiceMonitorLog.status, func.count())
+            .join(
+                latest_times,
+                (ServiceMonitorLog.service_config_id == latest_times.c.service_config_id) &
+                (ServiceMonitorLog.monitor_time == latest_times.c.max_time)
+            )
+            .join(ServiceConfig, ServiceConfig.id == ServiceMonitorLog.service_config_id)
+            .group_by(ServiceConfig.server_id, ServiceMonitorLog.status)
+            .all()
+        )
+        for server_id, status, count in status_counts:
+            stats[server_id]['status_counts'][status] = count
+
+        return stats
+    
     def get_all_servers_with_services(self) -> List[Dict[str, Any]]:
         """
         获取所有服务器及其服务统计信息
@@ -276,12 +400,28 @@ class ServiceMonitorService:
         """
         try:
             servers = Server.query.filter_by(status='active').all()
+            if not servers:
+                return []
+
+            # 一次取出所有活跃服务器的服务配置及其最新日志
+            active_server_ids = select(Server.id).where(Server.status == 'active')
+            services = ServiceConfig.query.filter(ServiceConfig.server_id.in_(active_server_ids)).all()
+            latest_by_service_id = self._get_latest_service_logs(
+                select(ServiceConfig.id).where(ServiceConfig.server_id.in_(active_server_ids))
+            )
+
+            services_by_server = {}
+            for service in services:
+                services_by_server.setdefault(service.server_id, []).append(
+                    self._service_to_dict_with_latest(service, latest_by_service_id.get(service.id))
+                )
+
             result = []
 
             for server in servers:
                 server_dict = server.to_dict()
 
-                services_data = self.get_services_by_server(server.id)
+                services_data = services_by_server.get(server.id, [])
 
                 total_services = len(services_data)
                 monitoring_services = len([s for s in services_data if s.get('is_monitoring')])
@@ -338,7 +478,7 @@ class ServiceMonitorService:
                 return {'success': False, 'message': '服务器不存在'}
             
             # 建立SSH连接
-            password = self.server_service._decrypt_password(server.password) if server.password else None
+            password = self.server_service.get_server_password(server)
             
             with self.ssh_manager.get_connection(
                 host=server.host,
@@ -399,7 +539,7 @@ class ServiceMonitorService:
             results = []
             
             # 建立SSH连接
-            password = self.server_service._decrypt_password(server.password) if server.password else None
+            password = self.server_service.get_server_password(server)
             
             with self.ssh_manager.get_connection(
                 host=server.host,
@@ -409,8 +549,13 @@ class ServiceMonitorService:
                 private_key_path=server.private_key_path if server.private_key_path else None
             ) as client:
                 
+                # 快照模式：整台服务器只取一次进程表，各服务在本地匹配
+                process_lines = None
+                if self._use_process_snapshot():
+                    process_lines = self._fetch_process_table(client)
+                
                 for service in services:
-                    service_result = self._monitor_single_service(client, service)
+                    service_result = self._monitor_single_service(client, service, process_lines)
                     results.append(service_result)
                     
                     # 保存监控结果
@@ -448,13 +593,15 @@ class ServiceMonitorService:
             
             return {'success': False, 'message': f'监控失败: {str(e)}', 'results': results}
     
-    def _monitor_single_service(self, ssh_client, service_config: ServiceConfig) -> Dict[str, Any]:
+    def _monitor_single_service(self, ssh_client, service_config: ServiceConfig,
+                                process_lines: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         监控单个服务
         
         Args:
             ssh_client: SSH客户端
             service_config: 服务配置
+            process_lines: 进程表快照（ps aux 输出行），为None时单独执行ps命令
             
         Returns:
             监控结果
@@ -471,6 +618,12 @@ class ServiceMonitorService:
         }
         
         try:
+            if process_lines is not None:
+                processes = self._parse_process_lines(self._match_process_lines(process_lines, service_config.process_name))
+                logger.debug(f"进程表快照匹配 {service_config.process_name}: 找到 {len(processes)} 个进程")
+                self._apply_process_status(ssh_client, service_config, result, processes)
+                return result
+            
             # 使用ps命令查找进程，显式使用/bin/sh来避免shell兼容性问题
             cmd = f"/bin/sh -c \"ps aux | grep '{service_config.process_name}' | grep -v grep\""
             logger.info(f"执行命令: {cmd}")
@@ -553,61 +706,9 @@ class ServiceMonitorService:
                         else:
                             logger.warning(f"行格式不正确，字段数量不足: {len(parts)}")
             
-            result['process_count'] = len(processes)
-            result['process_info'] = processes
-            
             logger.info(f"最终统计: 找到 {len(processes)} 个进程")
             
-            if len(processes) > 0:
-                result['status'] = 'running'
-                # 根据实际配置显示自启动状态
-                if service_config.auto_restart:
-                    result['auto_restart_status'] = '已开启'
-                else:
-                    result['auto_restart_status'] = '未开启'
-                logger.info(f"服务 {service_config.service_name} 状态: 运行中")
-            else:
-                result['status'] = 'stopped'
-                logger.warning(f"服务 {service_config.service_name} 状态: 已停止 - 未找到匹配的进程")
-                
-                # 检查是否需要自动重启
-                if service_config.auto_restart and service_config.start_command:
-                    logger.info(f"服务 {service_config.service_name} 开启了自动重启，尝试执行启动命令")
-                    restart_result = self._execute_restart_command(ssh_client, service_config)
-                    result['restart_attempted'] = True
-                    result['restart_success'] = restart_result['success']
-                    result['restart_message'] = restart_result['message']
-                    
-                    if restart_result['success']:
-                        # 等待3秒后重新检测
-                        logger.info(f"启动命令执行成功，等待3秒后重新检测服务状态")
-                        time.sleep(3)
-                        
-                        # 重新检测服务状态
-                        recheck_result = self._check_service_status(ssh_client, service_config)
-                        if recheck_result['success'] and recheck_result['process_count'] > 0:
-                            result['status'] = 'running'
-                            result['process_count'] = recheck_result['process_count']
-                            result['process_info'] = recheck_result['process_info']
-                            result['auto_restart_status'] = '自启动成功'
-                            logger.info(f"服务 {service_config.service_name} 重启成功，当前状态: 运行中")
-                        else:
-                            result['auto_restart_status'] = '自启动失败'
-                            logger.warning(f"服务 {service_config.service_name} 重启后仍未运行")
-                    else:
-                        # 重启命令执行失败（包括超时）
-                        result['auto_restart_status'] = '自启动失败'
-                        logger.warning(f"服务 {service_config.service_name} 重启命令执行失败: {restart_result['message']}")
-                else:
-                    result['restart_attempted'] = False
-                    if not service_config.auto_restart:
-                        result['auto_restart_status'] = '未开启'
-                        logger.info(f"服务 {service_config.service_name} 未开启自动重启")
-                    elif not service_config.start_command:
-                        result['auto_restart_status'] = '未开启'
-                        logger.warning(f"服务 {service_config.service_name} 开启了自动重启但未配置启动命令")
-            
-            logger.debug(f"监控服务 {service_config.service_name}: {result['status']}, 进程数: {len(processes)}")
+            self._apply_process_status(ssh_client, service_config, result, processes)
             
         except Exception as e:
             result['status'] = 'error'
@@ -616,6 +717,134 @@ class ServiceMonitorService:
         
         return result
     
+    def _apply_process_status(self, ssh_client, service_config: ServiceConfig,
+                              result: Dict[str, Any], processes: List[Dict[str, Any]]) -> None:
+        """
+        根据匹配到的进程确定服务状态，服务停止且开启自动重启时执行重启
+        
+        Args:
+            ssh_client: SSH客户端
+            service_config: 服务配置
+            result: 监控结果（原地修改）
+            processes: 匹配到的进程信息列表
+        """
+        result['process_count'] = len(processes)
+        result['process_info'] = processes
+        
+        if len(processes) > 0:
+            result['status'] = 'running'
+            # 根据实际配置显示自启动状态
+            if service_config.auto_restart:
+                result['auto_restart_status'] = '已开启'
+            else:
+                result['auto_restart_status'] = '未开启'
+            logger.info(f"服务 {service_config.service_name} 状态: 运行中")
+        else:
+            result['status'] = 'stopped'
+            logger.warning(f"服务 {service_config.service_name} 状态: 已停止 - 未找到匹配的进程")
+            
+            # 检查是否需要自动重启
+            if service_config.auto_restart and service_config.start_command:
+                logger.info(f"服务 {service_config.service_name} 开启了自动重启，尝试执行启动命令")
+                restart_result = self._execute_restart_command(ssh_client, service_config)
+                result['restart_attempted'] = True
+                result['restart_success'] = restart_result['success']
+                result['restart_message'] = restart_result['message']
+                
+                if restart_result['success']:
+                    # 不在巡视线程中等待，保存结果后交给延迟复检队列，复检完成后更新监控日志
+                    result['auto_restart_status'] = '自启动验证中'
+                    result['restart_verification'] = 'pending'
+                    logger.info(f"启动命令执行成功，服务 {service_config.service_name} 将在稍后复检")
+                else:
+                    # 重启命令执行失败（包括超时）
+                    result['auto_restart_status'] = '自启动失败'
+                    logger.warning(f"服务 {service_config.service_name} 重启命令执行失败: {restart_result['message']}")
+            else:
+                result['restart_attempted'] = False
+                if not service_config.auto_restart:
+                    result['auto_restart_status'] = '未开启'
+                    logger.info(f"服务 {service_config.service_name} 未开启自动重启")
+                elif not service_config.start_command:
+                    result['auto_restart_status'] = '未开启'
+                    logger.warning(f"服务 {service_config.service_name} 开启了自动重启但未配置启动命令")
+        
+        logger.debug(f"监控服务 {service_config.service_name}: {result['status']}, 进程数: {len(processes)}")
+    
+    @staticmethod
+    def _use_process_snapshot() -> bool:
+        """是否使用进程表快照模式（每台服务器只执行一次ps）"""
+        from config import Config
+        return getattr(Config, 'SERVICE_MONITOR_MODE', 'snapshot').lower() == 'snapshot'
+    
+    def _fetch_process_table(self, ssh_client) -> Optional[List[str]]:
+        """
+        获取服务器的进程表快照
+        
+        Args:
+            ssh_client: SSH客户端
+            
+        Returns:
+            ps aux 的输出行（不含表头）；获取失败时返回None，调用方回退到逐个服务执行ps
+        """
+        try:
+            cmd_result = self.ssh_manager.execute_command(ssh_client, '/bin/sh -c "ps aux"')
+            output = cmd_result['stdout'].strip()
+            if not cmd_result['success'] or not output:
+                logger.warning(f"获取进程表失败，回退到逐个服务检测: {cmd_result['stderr'] or cmd_result['exit_code']}")
+                return None
+            
+            lines = output.split('\n')
+            logger.info(f"获取进程表成功，进程数: {len(lines) - 1}，耗时: {cmd_result['execution_time']:.2f}秒")
+            return lines[1:]
+        except Exception as e:
+            logger.warning(f"获取进程表异常，回退到逐个服务检测: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _match_process_lines(process_lines: List[str], process_name: str) -> List[str]:
+        """
+        在进程表快照中匹配进程，等价于 ps aux | grep '<process_name>' | grep -v grep
+        
+        Args:
+            process_lines: ps aux 输出行
+            process_name: 进程名称（grep基本正则）
+            
+        Returns:
+            匹配的输出行
+        """
+        try:
+            pattern = re.compile(_grep_basic_regex_to_python(process_name))
+            matches = pattern.search
+        except re.error:
+            matches = lambda line: process_name in line
+        
+        return [line for line in process_lines if 'grep' not in line and matches(line)]
+    
+    @staticmethod
+    def _parse_process_lines(lines: List[str]) -> List[Dict[str, Any]]:
+        """
+        解析ps aux输出行
+        
+        Args:
+            lines: ps aux 输出行
+            
+        Returns:
+            进程信息列表（pid、cpu、memory、command）
+        """
+        processes = []
+        for line in lines:
+            if line.strip():
+                parts = line.split(None, 10)
+                if len(parts) >= 11:
+                    processes.append({
+                        'pid': parts[1],
+                        'cpu': parts[2],
+                        'memory': parts[3],
+                        'command': parts[10]
+                    })
+        return processes
+    
     def _execute_restart_command(self, ssh_client, service_config: ServiceConfig) -> Dict[str, Any]:
         """
         执行服务重启命令
@@ -689,21 +918,7 @@ class ServiceMonitorService:
                 }
             
             output = cmd_result['stdout'].strip()
-            processes = []
-            
-            if output:
-                lines = output.split('\n')
-                for line in lines:
-                    if line.strip():
-                        parts = line.split(None, 10)
-                        if len(parts) >= 11:
-                            process_info = {
-                                'pid': parts[1],
-                                'cpu': parts[2],
-                                'memory': parts[3],
-                                'command': parts[10]
-                            }
-                            processes.append(process_info)
+            processes = self._parse_process_lines(output.split('\n')) if output else []
             
             return {
                 'success': True,
@@ -759,6 +974,9 @@ class ServiceMonitorService:
             
             db.session.commit()
             
+            if result.get('restart_verification') == 'pending':
+                self._schedule_restart_verification(monitor_log.id, result['service_id'])
+            
             return monitor_log
             
         except Exception as e:
@@ -766,6 +984,144 @@ class ServiceMonitorService:
             logger.error(f"保存服务监控结果失败: {str(e)}")
             return None
     
+    def _schedule_restart_verification(self, log_id: int, service_id: int):
+        """
+        将自动重启的服务加入延迟复检队列
+        
+        Args:
+            log_id: 本次巡视的服务监控日志ID，复检后更新该记录
+            service_id: 服务配置ID
+        """
+        from flask import current_app, has_app_context
+        from config import Config
+        
+        app = current_app._get_current_object() if has_app_context() else self.app
+        if app is None:
+            logger.warning(f"没有Flask应用上下文，无法复检服务 {service_id} 的重启结果")
+            return
+        
+        delay = float(getattr(Config, 'SERVICE_RESTART_VERIFY_DELAY', 3))
+        self._restart_verifier.submit({'log_id': log_id, 'service_id': service_id, 'app': app}, delay)
+    
+    def _verify_restarted_services(self, tasks: List[Dict[str, Any]]):
+        """
+        复检自动重启的服务（延迟复检队列的处理函数），同一服务器只建立一次连接、取一次进程表
+        
+        Args:
+            tasks: 到期的复检任务列表，每项包含 log_id、service_id、app
+        """
+        tasks_by_app = {}
+        for task in tasks:
+            tasks_by_app.setdefault(task['app'], []).append(task)
+        
+        for app, app_tasks in tasks_by_app.items():
+            with app.app_context():
+                restart_success_alerts = []
+                restart_failed_alerts = []
+                
+                services = {
+                    service.id: service for service in
+                    ServiceConfig.query.filter(ServiceConfig.id.in_([task['service_id'] for task in app_tasks])).all()
+                }
+                tasks_by_server = {}
+                for task in app_tasks:
+                    service = services.get(task['service_id'])
+                    if service is None:
+                        continue
+                    tasks_by_server.setdefault(service.server_id, []).append((task, service))
+                
+                for server_id, server_tasks in tasks_by_server.items():
+                    server = server_tasks[0][1].server
+                    outcomes = self._recheck_server_services(server, [service for _, service in server_tasks])
+                    
+                    for (task, service), (running, processes, error_message) in zip(server_tasks, outcomes):
+                        self._update_restart_verification_log(task['log_id'], service, running, processes, error_message)
+                        alert = {
+                            'server_name': server.name,
+                            'server_ip': server.host,
+                            'service_name': service.service_name,
+                            'error_message': error_message
+                        }
+                        if running:
+                            logger.info(f"服务 {service.service_name} 重启成功，当前状态: 运行中")
+                            alert.update({'status': 'restart_success', 'auto_restart_status': '自启动成功'})
+                            restart_success_alerts.append(alert)
+                        else:
+                            logger.warning(f"服务 {service.service_name} 重启后仍未运行")
+                            alert.update({'status': 'stopped', 'auto_restart_status': '自启动失败'})
+                            restart_failed_alerts.append(alert)
+                
+                total = len(restart_success_alerts) + len(restart_failed_alerts)
+                if total:
+                    self._send_service_alerts(
+                        restart_failed_alerts, total, len(restart_success_alerts),
+                        len(restart_failed_alerts), restart_success_alerts
+                    )
+                    dashboard_cache.invalidate()
+    
+    def _recheck_server_services(self, server: Server, services: List[ServiceConfig]) -> List[Tuple[bool, List[Dict[str, Any]], str]]:
+        """
+        重新检测一台服务器上的若干服务
+        
+        Returns:
+            与 services 顺序一致的 (是否运行, 进程信息, 错误信息) 列表
+        """
+        try:
+            password = self.server_service.get_server_password(server)
+            with self.ssh_manager.get_connection(
+                host=server.host,
+                port=server.port,
+                username=server.username,
+                password=password,
+                private_key_path=server.private_key_path if server.private_key_path else None
+            ) as client:
+                process_lines = self._fetch_process_table(client) if self._use_process_snapshot() else None
+                
+                outcomes = []
+                for service in services:
+                    if process_lines is not None:
+                        processes = self._parse_process_lines(self._match_process_lines(process_lines, service.process_name))
+                        outcomes.append((len(processes) > 0, processes, ''))
+                    else:
+                        recheck_result = self._check_service_status(client, service)
+                        outcomes.append((
+                            recheck_result['success'] and recheck_result['process_count'] > 0,
+                            recheck_result['process_info'],
+                            recheck_result.get('message', '')
+                        ))
+                return outcomes
+        except Exception as e:
+            logger.error(f"复检服务器 {server.name} 的重启服务失败: {str(e)}")
+            return [(False, [], f'重启复检失败: {str(e)}') for _ in services]
+    
+    def _update_restart_verification_log(self, log_id: int, service: ServiceConfig, running: bool,
+                                         processes: List[Dict[str, Any]], error_message: str):
+        """用复检结果更新原监控日志，该日志仍是服务最新记录时同步更新服务的异常时间"""
+        try:
+            monitor_log = db.session.get(ServiceMonitorLog, log_id)
+            if monitor_log is None:
+                return
+            
+            if running:
+                monitor_log.status = 'running'
+                monitor_log.process_count = len(processes)
+                monitor_log.set_process_info(processes)
+                monitor_log.error_message = ''
+            elif error_message:
+                monitor_log.error_message = error_message
+            
+            newer_log = db.session.query(ServiceMonitorLog.id).filter(
+                ServiceMonitorLog.service_config_id == service.id,
+                ServiceMonitorLog.monitor_time > monitor_log.monitor_time
+            ).first()
+            if running and newer_log is None:
+                service.first_error_time = None
+            
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"更新服务 {service.service_name} 的重启复检结果失败: {str(e)}")
+    
     def monitor_all_services(self) -> Dict[str, Any]:
         """
         监控所有活跃服务器的服务
@@ -774,6 +1130,7 @@ class ServiceMonitorService:
             监控汇总结果
         """
         try:
+            start_time = time.time()
             servers = Server.query.filter_by(status='active').all()
             
             total_services = 0
@@ -783,8 +1140,7 @@ class ServiceMonitorService:
             service_alerts = []
             restart_success_alerts = []  # 收集重启成功的服务
             
-            for server in servers:
-                server_result = self.monitor_server_services(server.id)
+            for server, server_result in self._monitor_servers_concurrently(servers):
                 server_results.append(server_result)
                 
                 if server_result['success']:
@@ -805,6 +1161,9 @@ class ServiceMonitorService:
                                 })
                         else:
                             error_services += 1
+                            # 已发出重启命令的服务由延迟复检队列通知最终结果
+                            if service_result.get('restart_verification') == 'pending':
+                                continue
                             # 收集异常服务信息用于通知
                             service_alerts.append({
                                 'server_name': service_result['server_name'],
@@ -837,15 +1196,37 @@ class ServiceMonitorService:
             if service_alerts or restart_success_alerts:
                 self._send_service_alerts(service_alerts, total_services, normal_services, error_services, restart_success_alerts)
             
+            # 按耗时排序的服务器列表，便于定位慢主机
+            server_timings = sorted(
+                [
+                    {
+                        'server_id': result['server_id'],
+                        'server_name': result['server_name'],
+                        'execution_time': result['execution_time'],
+                        'timed_out': result.get('timed_out', False)
+                    }
+                    for result in server_results
+                ],
+                key=lambda item: item['execution_time'],
+                reverse=True
+            )
+            
+            execution_time = time.time() - start_time
             summary = {
                 'total_services': total_services,
                 'normal_services': normal_services,
                 'error_services': error_services,
                 'server_results': server_results,
+                'server_timings': server_timings,
+                'execution_time': execution_time,
                 'monitor_time': datetime.now().isoformat()
             }
             
-            logger.info(f"服务监控完成: 总数={total_services}, 正常={normal_services}, 异常={error_services}")
+            logger.info(f"服务监控完成: 总数={total_services}, 正常={normal_services}, 异常={error_services}, 耗时={execution_time:.2f}s")
+            if server_timings:
+                slowest = ', '.join(f"{item['server_name']}={item['execution_time']:.2f}s" for item in server_timings[:5])
+                logger.info(f"服务监控耗时最长的服务器: {slowest}")
+            dashboard_cache.invalidate()
             
             return summary
             
@@ -853,6 +1234,79 @@ class ServiceMonitorService:
             logger.error(f"监控所有服务失败: {str(e)}")
             return {'error': str(e)}
     
+    def _monitor_servers_concurrently(self, servers: List[Server]):
+        """
+        在有界线程池中并发监控各服务器的服务，单台服务器超过期限时不再等待
+        
+        需要在应用上下文中调用，工作线程各自进入同一应用的上下文。
+        
+        Args:
+            servers: 服务器列表
+            
+        Yields:
+            (服务器, 监控结果) 元组，按完成顺序产出；监控结果附带 server_id、server_name、execution_time
+        """
+        from flask import current_app
+        from config import Config
+        
+        if not servers:
+            return
+        
+        app = current_app._get_current_object()
+        max_workers = max(1, min(int(getattr(Config, 'SERVICE_MONITOR_MAX_WORKERS', 10)), len(servers)))
+        server_timeout = float(getattr(Config, 'SERVICE_MONITOR_SERVER_TIMEOUT', 120))
+        
+        # 记录每台服务器实际开始执行的时间，排队等待的时间不计入期限
+        started_at = {}
+        
+        def _run(server_id: int) -> Dict[str, Any]:
+            started_at[server_id] = time.time()
+            with app.app_context():
+                return self.monitor_server_services(server_id)
+        
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='service-monitor')
+        try:
+            future_to_server = {executor.submit(_run, server.id): server for server in servers}
+            pending = set(future_to_server)
+            
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=1, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                now = time.time()
+                
+                for future in done:
+                    server = future_to_server[future]
+                    try:
+                        server_result = future.result()
+                    except Exception as e:
+                        logger.error(f"监控服务器 {server.name} 的服务时发生异常: {str(e)}")
+                        server_result = {'success': False, 'message': f'监控失败: {str(e)}', 'results': []}
+                    server_result.update({
+                        'server_id': server.id,
+                        'server_name': server.name,
+                        'execution_time': now - started_at.get(server.id, now)
+                    })
+                    yield server, server_result
+                
+                # 超过期限的服务器不再等待，结果按失败统计（后台线程完成后仍会写入自己的监控日志）
+                for future in list(pending):
+                    server = future_to_server[future]
+                    if server.id in started_at and now - started_at[server.id] > server_timeout:
+                        pending.discard(future)
+                        logger.error(f"监控服务器 {server.name} 的服务超时（{server_timeout}秒），不再等待")
+                        yield server, {
+                            'success': False,
+                            'message': f'服务器服务监控超时（{server_timeout:.0f}秒）',
+                            'results': [],
+                            'timed_out': True,
+                            'server_id': server.id,
+                            'server_name': server.name,
+                            'execution_time': now - started_at[server.id]
+                        }
+        finally:
+            executor.shutdown(wait=False)
+    
     def _send_service_alerts(self, alerts: List[Dict], total: int, normal: int, error: int, restart_success_alerts: List[Dict] = None):
         """
         发送服务监控告警通知
@@ -1258,7 +1712,8 @@ class ServiceMonitorService:
         return {
             'is_running': self._is_monitoring,
             'interval_minutes': self.get_service_monitor_interval(),
-            'thread_alive': self._monitor_thread.is_alive() if self._monitor_thread else False
+            'thread_alive': self._monitor_thread.is_alive() if self._monitor_thread else False,
+            'restart_verification': self._restart_verifier.get_stats()
         }
     
     def get_ssh_pool_stats(self) -> Dict[str, Any]:
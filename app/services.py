@@ -1,7 +1,7 @@
 from typing import List, Dict, Any, Optional, Tuple
 from app.models import db, Server, Threshold, ScheduleTask, MonitorLog
 from app.ssh_manager import SSHConnectionManager
-from cryptography.fernet import Fernet
+from app.credential_provider import credential_provider
 import base64
 import logging
 
@@ -17,16 +17,18 @@ class ServerService:
             HostMonitor._shared_ssh_manager = SSHConnectionManager()
             logger.info("创建全局SSH连接管理器，连接池已启用")
         self.ssh_manager = HostMonitor._shared_ssh_manager
-        # 从配置文件获取加密密钥
-        self.cipher_key = self._get_cipher_key()
+        # 从配置文件获取加密密钥（进程内只解析一次）
+        self.cipher_key = credential_provider.get_cipher_key(self._get_cipher_key)
     
-    def _get_cipher_key(self) -> bytes:
-        """从配置获取加密密钥"""
+    def _get_cipher_key(self) -> Optional[bytes]:
+        """从配置获取加密密钥，没有有效密钥时返回None"""
         try:
-            from flask import current_app
-            # 尝试从Flask配置获取密钥
-            if current_app:
-                encryption_key = current_app.config.get('ENCRYPTION_KEY')
+            from flask import current_app, has_app_context
+            from app.worker_context import get_app
+            # 尝试从Flask配置获取密钥（没有应用上下文时使用已注册的应用）
+            app = current_app._get_current_object() if has_app_context() else get_app()
+            if app:
+                encryption_key = app.config.get('ENCRYPTION_KEY')
                 if encryption_key:
                     # Fernet密钥必须是base64编码的44字符字符串
                     import base64
@@ -39,10 +41,10 @@ class ServerService:
                             return encryption_key.encode()
                         else:
                             logger.warning(f"ENCRYPTION_KEY解码后长度不正确: {len(decoded_key)}字节，应为32字节")
-                            return Fernet.generate_key()
+                            return None
                     except Exception as e:
                         logger.warning(f"ENCRYPTION_KEY不是有效的base64编码: {str(e)}")
-                        return Fernet.generate_key()
+                        return None
         except:
             pass
         
@@ -61,16 +63,16 @@ class ServerService:
             except Exception as e:
                 logger.warning(f"环境变量ENCRYPTION_KEY不是有效的base64编码: {str(e)}")
         
-        # 最后备用方案：生成新密钥
-        logger.warning("未找到有效的加密密钥，生成新密钥")
-        return Fernet.generate_key()
+        # 最后备用方案：由调用方生成临时密钥（不缓存，配置修正后重新解析）
+        logger.warning("未找到有效的加密密钥，使用临时密钥")
+        return None
     
     def _encrypt_password(self, password: str) -> str:
         """加密密码"""
         if not password:
             return ""
         try:
-            f = Fernet(self.cipher_key)
+            f = credential_provider.get_fernet(self.cipher_key)
             encrypted = f.encrypt(password.encode())
             return base64.b64encode(encrypted).decode()
         except Exception as e:
@@ -82,14 +84,33 @@ class ServerService:
         if not encrypted_password:
             return ""
         try:
-            f = Fernet(self.cipher_key)
-            encrypted_data = base64.b64decode(encrypted_password.encode())
-            decrypted = f.decrypt(encrypted_data)
-            return decrypted.decode()
+            return credential_provider.decrypt(self.cipher_key, encrypted_password)
         except Exception as e:
             logger.error(f"密码解密失败: {str(e)}")
             return encrypted_password
     
+    def get_server_password(self, server: Server) -> Optional[str]:
+        """
+        获取服务器的明文密码（使用凭据缓存）
+        
+        Args:
+            server: 服务器对象
+            
+        Returns:
+            明文密码，未设置密码时返回None
+        """
+        if not server.password:
+            return None
+        try:
+            # 解密失败时抛出异常，不把密文当作密码缓存
+            return credential_provider.get_password(
+                server.id, server.updated_at, server.password,
+                lambda encrypted_password: credential_provider.decrypt(self.cipher_key, encrypted_password)
+            )
+        except Exception as e:
+            logger.error(f"密码解密失败: {str(e)}")
+            return server.password
+    
     def create_server(self, server_data: Dict[str, Any]) -> Tuple[bool, str, Optional[Server]]:
         """
         创建服务器
@@ -264,6 +285,7 @@ class ServerService:
                 server.status = server_data['status']
             
             db.session.commit()
+            credential_provider.invalidate(server_id)
             
             logger.info(f"服务器更新成功: {server.name}")
             return True, "服务器更新成功", server
@@ -303,6 +325,7 @@ class ServerService:
             # 删除服务器（监控日志会通过级联删除自动处理）
             db.session.delete(server)
             db.session.commit()
+            credential_provider.invalidate(server_id)
             
             logger.info(f"服务器删除成功: {server_name}")
             return True, "服务器删除成功"
@@ -367,6 +390,8 @@ class ServerService:
                 db.session.delete(server)
             
             db.session.commit()
+            for server_info in deleted_servers:
+                credential_provider.invalidate(server_info['id'])
             
             result = {
                 'deleted_count': deleted_count,
@@ -0,0 +1,155 @@
+"""
+SQLite 连接配置模块
+巡视线程、服务监控循环、调度器线程池和请求线程共用同一个SQLite文件，默认的回滚日志模式下
+读写互斥，并发写入时容易出现 "database is locked"。这里在每个新建的连接上执行统一的 PRAGMA：
+WAL 模式（读写不互斥）、synchronous=NORMAL、busy_timeout（等待写锁而不是立即报错）、
+页缓存和 mmap 大小。安装后对进程内所有引擎生效，包括调度器作业存储自己创建的引擎。
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF')
+_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# 已安装的全局PRAGMA列表，为None表示未安装
+_pragmas: Optional[List[Tuple[str, Any]]] = None
+_install_lock = threading.Lock()
+_listener_registered = False
+_journal_mode_warned = False
+
+
+def _setting(config, name: str, default):
+    if isinstance(config, Mapping):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+def build_sqlite_pragmas(config) -> List[Tuple[str, Any]]:
+    """
+    根据配置生成连接时执行的 PRAGMA 列表
+
+    Args:
+        config: Config类或app.config
+
+    Returns:
+        (名称, 取值) 列表，非法的取值被替换为默认值
+    """
+    journal_mode = str(_setting(config, 'SQLITE_JOURNAL_MODE', 'WAL') or 'WAL').upper()
+    if journal_mode not in _JOURNAL_MODES:
+        logger.warning(f"无效的 SQLITE_JOURNAL_MODE: {journal_mode}，使用 WAL")
+        journal_mode = 'WAL'
+
+    synchronous = str(_setting(config, 'SQLITE_SYNCHRONOUS', 'NORMAL') or 'NORMAL').upper()
+    if synchronous not in _SYNCHRONOUS_MODES:
+        logger.warning(f"无效的 SQLITE_SYNCHRONOUS: {synchronous}，使用 NORMAL")
+        synchronous = 'NORMAL'
+
+    busy_timeout = max(0, int(_setting(config, 'SQLITE_BUSY_TIMEOUT_MS', 30000)))
+    cache_size_mb = max(0, int(_setting(config, 'SQLITE_CACHE_SIZE_MB', 64)))
+    mmap_size_mb = max(0, int(_setting(config, 'SQLITE_MMAP_SIZE_MB', 256)))
+
+    return [
+        # busy_timeout 放在最前，后续切换日志模式时也会等待其他连接释放锁
+        ('busy_timeout', busy_timeout),
+        ('journal_mode', journal_mode),
+        ('synchronous', synchronous),
+        # 负数表示以KiB为单位
+        ('cache_size', -cache_size_mb * 1024),
+        ('mmap_size', mmap_size_mb * 1024 * 1024),
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: List[Tuple[str, Any]]) -> None:
+    """
+    在一个 sqlite3 连接上执行 PRAGMA
+
+    Args:
+        dbapi_connection: DBAPI连接，非SQLite连接时忽略
+        pragmas: build_sqlite_pragmas 的返回值
+    """
+    global _journal_mode_warned
+
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+            if name == 'journal_mode':
+                actual = (cursor.fetchone() or [''])[0]
+                # 内存数据库或不支持WAL的文件系统会保持原来的模式
+                if str(actual).upper() != value and not _journal_mode_warned:
+                    _journal_mode_warned = True
+                    logger.warning(f"SQLite 日志模式设置为 {value} 未生效，当前为 {actual}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine: Engine, pragmas: List[Tuple[str, Any]]) -> None:
+    """
+    只为指定引擎的新连接执行 PRAGMA（基准测试等需要对比不同配置时使用）
+
+    Args:
+        engine: SQLAlchemy引擎
+        pragmas: build_sqlite_pragmas 的返回值
+    """
+    event.listen(engine, 'connect', lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection, pragmas))
+
+
+def _on_connect(dbapi_connection, connection_record):
+    pragmas = _pragmas
+    if pragmas is not None:
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def install_sqlite_profile(config) -> bool:
+    """
+    为进程内所有引擎的新建SQLite连接安装 PRAGMA 配置（需在创建连接之前调用，可重复调用）
+
+    Args:
+        config: Config类或app.config
+
+    Returns:
+        是否已启用
+    """
+    global _pragmas, _listener_registered
+
+    with _install_lock:
+        if not _setting(config, 'SQLITE_PROFILE_ENABLED', True):
+            _pragmas = None
+            return False
+
+        _pragmas = build_sqlite_pragmas(config)
+        if not _listener_registered:
+            event.listen(Engine, 'connect', _on_connect)
+            _listener_registered = True
+        return True
+
+
+def get_sqlite_profile(engine: Engine) -> Dict[str, Any]:
+    """
+    读取引擎当前连接上实际生效的 PRAGMA
+
+    Args:
+        engine: SQLAlchemy引擎
+
+    Returns:
+        PRAGMA名称到取值的字典，非SQLite引擎返回空字典
+    """
+    if engine.dialect.name != 'sqlite':
+        return {}
+
+    profile = {}
+    with engine.connect() as conn:
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+            profile[name] = conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+    return profile
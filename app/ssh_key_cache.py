@@ -0,0 +1,127 @@
+"""
+SSH私钥缓存模块
+解析后的私钥按文件路径缓存，文件修改时间或大小变化时重新加载，
+避免每次建立连接都重新读取和解析私钥文件（RSA私钥的解析开销较大）
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# 旧版本 paramiko 没有 PKey.from_path 时依次尝试的私钥类型
+_KEY_CLASSES = tuple(
+    key_class for key_class in (
+        getattr(paramiko, 'RSAKey', None),
+        getattr(paramiko, 'ECDSAKey', None),
+        getattr(paramiko, 'Ed25519Key', None),
+    ) if key_class is not None
+)
+
+
+def _parse_private_key(path: str) -> paramiko.PKey:
+    """
+    解析私钥文件，自动识别 RSA、ECDSA、Ed25519 类型
+
+    Args:
+        path: 私钥文件路径
+
+    Returns:
+        paramiko 私钥对象
+    """
+    if hasattr(paramiko.PKey, 'from_path'):
+        return paramiko.PKey.from_path(path)
+
+    last_error = None
+    for key_class in _KEY_CLASSES:
+        try:
+            return key_class.from_private_key_file(path)
+        except paramiko.SSHException as e:
+            last_error = e
+    raise paramiko.SSHException(f"不支持的私钥类型: {last_error}")
+
+
+class PrivateKeyCache:
+    """按路径缓存已解析的私钥，以文件修改时间和大小判断是否失效"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, int, paramiko.PKey]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'reloads': 0,
+            'errors': 0
+        }
+
+    def load(self, path: str) -> paramiko.PKey:
+        """
+        获取私钥，缓存有效时直接返回
+
+        Args:
+            path: 私钥文件路径
+
+        Returns:
+            paramiko 私钥对象
+
+        Raises:
+            Exception: 私钥文件不存在或无法解析
+        """
+        real_path = os.path.realpath(os.path.expanduser(path))
+        try:
+            stat = os.stat(real_path)
+        except OSError as e:
+            with self._lock:
+                self._entries.pop(real_path, None)
+                self._stats['errors'] += 1
+            raise Exception(f"无法加载私钥文件: {str(e)}")
+
+        with self._lock:
+            entry = self._entries.get(real_path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._stats['hits'] += 1
+                return entry[2]
+
+        # 解析在锁外进行，不阻塞其他私钥的读取
+        try:
+            key = _parse_private_key(real_path)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise Exception(f"无法加载私钥文件: {str(e)}")
+
+        with self._lock:
+            self._stats['misses'] += 1
+            if entry is not None:
+                self._stats['reloads'] += 1
+                logger.info(f"私钥文件已变更，重新加载: {path}")
+            self._entries[real_path] = (stat.st_mtime_ns, stat.st_size, key)
+        return key
+
+    def invalidate(self, path: str = None):
+        """
+        清除缓存
+
+        Args:
+            path: 私钥文件路径，为空时清除全部
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.realpath(os.path.expanduser(path)), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_keys'] = len(self._entries)
+        return stats
+
+
+# 全局私钥缓存
+private_key_cache = PrivateKeyCache()
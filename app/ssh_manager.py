@@ -1,4 +1,5 @@
 import paramiko
+import re
 import socket
 import logging
 import time
@@ -10,6 +11,9 @@ from datetime import datetime, timedelta
 
 # 导入配置管理器
 from app.ssh_pool_config import ssh_pool_config_manager, SSHPoolConfig
+from app.cpu_sampler import cpu_sampler, ProcStatCPUSampler, PROC_STAT_COMMAND
+from app.ssh_key_cache import private_key_cache
+from app.circuit_breaker import HostCircuitBreaker, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
@@ -47,16 +51,36 @@ class PooledSSHConnection:
         self.is_healthy = True
         self.use_count = 0
         self.is_in_use = False
+        # 当前借出的数量，通道复用模式下同一连接可以同时被多个借用方使用
+        self.borrow_count = 0
     
     def mark_used(self):
         """标记连接被使用"""
         self.last_used_time = datetime.now()
         self.use_count += 1
-        self.is_in_use = True
+        self.reserve()
     
     def mark_returned(self):
         """标记连接被归还"""
-        self.is_in_use = False
+        self.release()
+    
+    def reserve(self):
+        """占用连接（不更新使用时间，健康检查也通过它占用）"""
+        self.borrow_count += 1
+        self.is_in_use = True
+    
+    def release(self):
+        """释放一次占用"""
+        self.borrow_count = max(0, self.borrow_count - 1)
+        self.is_in_use = self.borrow_count > 0
+    
+    def is_transport_active(self) -> bool:
+        """底层 Transport 是否仍然存活（不产生网络往返）"""
+        try:
+            transport = self.client.get_transport() if self.client else None
+            return transport is not None and transport.is_active()
+        except Exception:
+            return False
     
     def is_expired(self) -> bool:
         """检查连接是否过期"""
@@ -95,13 +119,129 @@ class PooledSSHConnection:
         except Exception as e:
             logger.warning(f"关闭连接时出错: {str(e)}")
 
+class SSHPoolExhaustedError(Exception):
+    """服务器连接数已达上限且等待超时"""
+    pass
+
+# 借用等待时间直方图的分桶上限（毫秒）
+BORROW_WAIT_BUCKETS_MS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 30000)
+
+class BorrowWaitHistogram:
+    """借用连接等待时间直方图（调用方负责加锁）"""
+    
+    def __init__(self):
+        self.counts = [0] * (len(BORROW_WAIT_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.timeouts = 0
+    
+    def record(self, wait_ms: float):
+        for index, upper in enumerate(BORROW_WAIT_BUCKETS_MS):
+            if wait_ms <= upper:
+                break
+        else:
+            index = len(BORROW_WAIT_BUCKETS_MS)
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += wait_ms
+        self.max_ms = max(self.max_ms, wait_ms)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f'<={upper}ms': count for upper, count in zip(BORROW_WAIT_BUCKETS_MS, self.counts)}
+        buckets[f'>{BORROW_WAIT_BUCKETS_MS[-1]}ms'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 2),
+            'timeouts': self.timeouts,
+            'buckets': buckets
+        }
+
+class HostConnectionPool:
+    """单个主机（连接信息）的连接集合，拥有独立的锁和条件变量"""
+    
+    def __init__(self, conn_info: ConnectionInfo):
+        self.conn_info = conn_info
+        self.connections: List[PooledSSHConnection] = []
+        # 只保护本主机连接列表和借用状态，不在持锁期间进行任何网络操作
+        self.lock = threading.Lock()
+        # 连接归还、移除或建连结束时通知等待的借用方
+        self.available = threading.Condition(self.lock)
+        # 正在建立中的连接数，与已有连接一起计入上限
+        self.creating = 0
+        self.waiting = 0
+        self.wait_histogram = BorrowWaitHistogram()
+    
+    def size(self) -> int:
+        """已占用的连接名额（需持有锁）"""
+        return len(self.connections) + self.creating
+    
+    def __len__(self):
+        return len(self.connections)
+    
+    def __iter__(self):
+        return iter(list(self.connections))
+    
+    def reserve_idle(self) -> Optional[PooledSSHConnection]:
+        """取出一个空闲的健康连接并标记为使用中（需持有锁）"""
+        for conn in self.connections:
+            if not conn.is_in_use and conn.is_healthy:
+                conn.mark_used()
+                return conn
+        return None
+    
+    def reserve_shared(self, max_channels: int) -> Tuple[Optional[PooledSSHConnection], List[PooledSSHConnection]]:
+        """
+        通道复用模式：在借出数量最少且仍有通道余量的存活连接上再借出一次（需持有锁）
+        
+        Returns:
+            (借出的连接或None, 已失效并从集合中移除的连接列表，由调用方在锁外关闭)
+        """
+        dead_connections = [conn for conn in self.connections if not conn.is_transport_active()]
+        for conn in dead_connections:
+            self.connections.remove(conn)
+        
+        candidates = [
+            conn for conn in self.connections
+            if conn.is_healthy and conn.borrow_count < max_channels
+        ]
+        if not candidates:
+            return None, dead_connections
+        
+        conn = min(candidates, key=lambda x: x.borrow_count)
+        conn.mark_used()
+        return conn, dead_connections
+    
+    def discard(self, pooled_conn: PooledSSHConnection) -> bool:
+        """从集合中移除连接（需持有锁），返回是否确实移除"""
+        if pooled_conn in self.connections:
+            self.connections.remove(pooled_conn)
+            return True
+        return False
+
 class SSHConnectionPool:
-    """SSH连接池"""
+    """SSH连接池
+    
+    每个主机一把锁，全局锁只保护主机字典本身；TCP握手、认证和借用时的健康检查都在锁外进行，
+    不同主机之间的建连和验证互不阻塞。
     
-    def __init__(self, config: Optional[SSHPoolConfig] = None):
+    启用 multiplex_channels 时，同一个已认证的连接（Transport）可以同时借给多个借用方，
+    每个借用方的 exec_command 在该 Transport 上打开独立的通道；只有现有连接的通道都占满时才新建连接，
+    Transport 断开后会在下次借用时被丢弃并重新建立。
+    """
+    
+    def __init__(self, config: Optional[SSHPoolConfig] = None, on_connect=None):
+        """
+        Args:
+            config: 连接池配置
+            on_connect: 新连接握手、认证成功后的回调，参数为 ConnectionInfo
+        """
         self.config = config or ssh_pool_config_manager.get_config()
-        self.pools: Dict[ConnectionInfo, List[PooledSSHConnection]] = {}
+        self.on_connect = on_connect
+        self.pools: Dict[ConnectionInfo, HostConnectionPool] = {}
         self.lock = threading.RLock()
+        self._stats_lock = threading.Lock()
         self.cleanup_thread = None
         self.health_check_thread = None
         self.monitoring_thread = None
@@ -116,7 +256,9 @@ class SSHConnectionPool:
             'total_health_checks': 0,
             'failed_health_checks': 0,
             'pool_hits': 0,
-            'pool_misses': 0
+            'pool_misses': 0,
+            'shared_borrows': 0,
+            'transports_recovered': 0
         }
         
         self._start_background_threads()
@@ -137,44 +279,114 @@ class SSHConnectionPool:
             self.monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
             self.monitoring_thread.start()
     
-    def get_connection(self, conn_info: ConnectionInfo) -> PooledSSHConnection:
-        """从连接池获取连接"""
+    def _incr_stat(self, key: str, amount: int = 1):
+        """累加统计计数"""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def _get_host_pool(self, conn_info: ConnectionInfo) -> HostConnectionPool:
+        """获取（必要时创建）主机的连接集合"""
         with self.lock:
-            logger.info(f"连接池查找: {conn_info.host}:{conn_info.port}")
-            logger.info(f"当前连接池键值: {list(self.pools.keys())}")
-            logger.info(f"查找的连接信息: {conn_info}")
-            
-            # 尝试从池中获取可用连接
-            if conn_info in self.pools:
-                pool = self.pools[conn_info]
-                logger.info(f"连接池中找到 {conn_info.host}:{conn_info.port} 的连接池，共 {len(pool)} 个连接")
-                for conn in pool[:]:  # 创建副本以避免修改时的问题
-                    if not conn.is_in_use and conn.is_healthy:
-                        # 验证连接（如果启用）
-                        if self.config.validate_connection_on_borrow:
-                            if not conn.perform_health_check():
-                                pool.remove(conn)
-                                conn.close()
-                                self.stats['failed_health_checks'] += 1
-                                logger.debug(f"连接健康检查失败，移除连接: {conn_info.host}:{conn_info.port}")
-                                continue
-                        
-                        conn.mark_used()
-                        self.stats['total_connections_borrowed'] += 1
-                        self.stats['pool_hits'] += 1
-                        logger.info(f"复用连接池中的连接: {conn_info.host}:{conn_info.port}")
-                        return conn
-                logger.info(f"连接池中没有可用连接: {conn_info.host}:{conn_info.port}")
-            else:
-                logger.info(f"连接池中没有找到 {conn_info.host}:{conn_info.port} 的连接池")
+            host_pool = self.pools.get(conn_info)
+            if host_pool is None:
+                host_pool = HostConnectionPool(conn_info)
+                self.pools[conn_info] = host_pool
+            return host_pool
+    
+    def get_connection(self, conn_info: ConnectionInfo) -> PooledSSHConnection:
+        """
+        从连接池获取连接
+        
+        服务器的连接数（含建立中的连接）达到 max_connections_per_server 时，
+        在条件变量上等待其他借用方归还，超过 borrow_timeout 抛出 SSHPoolExhaustedError。
+        """
+        host_pool = self._get_host_pool(conn_info)
+        
+        while True:
+            conn = self._reserve_or_claim_slot(host_pool)
+            
+            if conn is None:
+                # 获得了建连名额，握手在锁外进行
+                self._incr_stat('pool_misses')
+                logger.info(f"创建新的SSH连接: {conn_info.host}:{conn_info.port}")
+                return self._create_new_connection(conn_info, host_pool)
+            
+            if self.config.multiplex_channels and conn.borrow_count > 1:
+                # 与其他借用方共享的连接，Transport 存活即可，不再额外执行验证命令
+                self._incr_stat('total_connections_borrowed')
+                self._incr_stat('pool_hits')
+                self._incr_stat('shared_borrows')
+                logger.debug(f"复用SSH连接的通道: {conn_info.host}:{conn_info.port}")
+                return conn
+            
+            # 验证连接（如果启用）
+            if self.config.validate_connection_on_borrow and not conn.perform_health_check():
+                self._retire_connection(conn)
+                self._incr_stat('failed_health_checks')
+                logger.debug(f"连接健康检查失败，移除连接: {conn_info.host}:{conn_info.port}")
+                continue
             
-            # 池中没有可用连接，创建新连接
-            self.stats['pool_misses'] += 1
-            logger.info(f"创建新的SSH连接: {conn_info.host}:{conn_info.port}")
-            return self._create_new_connection(conn_info)
+            self._incr_stat('total_connections_borrowed')
+            self._incr_stat('pool_hits')
+            logger.debug(f"复用连接池中的连接: {conn_info.host}:{conn_info.port}")
+            return conn
     
-    def _create_new_connection(self, conn_info: ConnectionInfo) -> PooledSSHConnection:
-        """创建新的SSH连接"""
+    def _reserve_or_claim_slot(self, host_pool: HostConnectionPool) -> Optional[PooledSSHConnection]:
+        """
+        借出空闲连接，或占用一个建连名额；两者都不可用时等待
+        
+        Returns:
+            借出的连接；返回None表示已占用建连名额，调用方需要建立新连接
+        """
+        conn_info = host_pool.conn_info
+        start_time = time.time()
+        deadline = start_time + self.config.borrow_timeout
+        
+        multiplex = self.config.multiplex_channels
+        dead_connections = []
+        
+        try:
+            with host_pool.available:
+                try:
+                    while True:
+                        if multiplex:
+                            conn, dead = host_pool.reserve_shared(self.config.max_channels_per_transport)
+                            dead_connections.extend(dead)
+                        else:
+                            conn = host_pool.reserve_idle()
+                        if conn is not None:
+                            return conn
+                        
+                        # 通道复用模式下已有连接正在建立时等待它完成，避免同一主机并发握手
+                        if host_pool.size() < self.config.max_connections_per_server and not (multiplex and host_pool.creating):
+                            host_pool.creating += 1
+                            return None
+                        
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            host_pool.wait_histogram.timeouts += 1
+                            raise SSHPoolExhaustedError(
+                                f"服务器 {conn_info.host}:{conn_info.port} 连接数已达上限"
+                                f"（{self.config.max_connections_per_server}），等待 {self.config.borrow_timeout} 秒仍无可用连接"
+                            )
+                        
+                        host_pool.waiting += 1
+                        try:
+                            host_pool.available.wait(remaining)
+                        finally:
+                            host_pool.waiting -= 1
+                finally:
+                    host_pool.wait_histogram.record((time.time() - start_time) * 1000)
+        finally:
+            # Transport 已断开的连接在锁外关闭，借用方会重新建连
+            if dead_connections:
+                self._incr_stat('transports_recovered', len(dead_connections))
+                logger.info(f"SSH连接已断开，重新建立连接: {conn_info.host}:{conn_info.port}")
+                for conn in dead_connections:
+                    self._close_connection(conn)
+    
+    def _create_new_connection(self, conn_info: ConnectionInfo, host_pool: HostConnectionPool) -> PooledSSHConnection:
+        """创建新的SSH连接（调用方已占用 host_pool 的建连名额）"""
         try:
             client = paramiko.SSHClient()
             client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -188,80 +400,113 @@ class SSHConnectionPool:
             }
             
             if conn_info.private_key_path:
-                try:
-                    private_key = paramiko.RSAKey.from_private_key_file(conn_info.private_key_path)
-                    auth_kwargs['pkey'] = private_key
-                except Exception:
-                    try:
-                        private_key = paramiko.Ed25519Key.from_private_key_file(conn_info.private_key_path)
-                        auth_kwargs['pkey'] = private_key
-                    except Exception as e:
-                        raise Exception(f"无法加载私钥文件: {str(e)}")
+                auth_kwargs['pkey'] = private_key_cache.load(conn_info.private_key_path)
             elif conn_info.password:
                 auth_kwargs['password'] = conn_info.password
             else:
                 raise Exception("必须提供密码或私钥文件")
             
             client.connect(**auth_kwargs)
+            if self.on_connect is not None:
+                self.on_connect(conn_info)
             
             pooled_conn = PooledSSHConnection(client, conn_info, self.config)
             pooled_conn.mark_used()
             
-            # 添加到连接池
-            if conn_info not in self.pools:
-                self.pools[conn_info] = []
-            self.pools[conn_info].append(pooled_conn)
+            # 添加到连接池，释放建连名额
+            with host_pool.available:
+                host_pool.creating -= 1
+                host_pool.connections.append(pooled_conn)
+                if self.config.multiplex_channels:
+                    # 等待中的借用方可以共享这个新连接
+                    host_pool.available.notify_all()
             
-            self.stats['total_connections_created'] += 1
-            self.stats['total_connections_borrowed'] += 1
+            self._incr_stat('total_connections_created')
+            self._incr_stat('total_connections_borrowed')
             
             logger.debug(f"创建新SSH连接: {conn_info.host}:{conn_info.port}")
             return pooled_conn
             
         except Exception as e:
+            # 建连失败，归还名额并唤醒一个等待者
+            with host_pool.available:
+                host_pool.creating -= 1
+                host_pool.available.notify()
             logger.error(f"创建SSH连接失败 - {conn_info.host}:{conn_info.port}: {str(e)}")
             raise
     
     def return_connection(self, pooled_conn: PooledSSHConnection):
         """归还连接到连接池"""
-        with self.lock:
-            try:
-                # 验证连接（如果启用）
-                if self.config.validate_connection_on_return:
-                    if not pooled_conn.perform_health_check():
-                        logger.debug(f"连接归还时健康检查失败，移除连接: {pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
-                        self._remove_connection(pooled_conn)
-                        return
-                
+        try:
+            # 验证连接（如果启用），在锁外进行
+            if self.config.validate_connection_on_return:
+                if not pooled_conn.perform_health_check():
+                    logger.debug(f"连接归还时健康检查失败，移除连接: {pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
+                    self._retire_connection(pooled_conn)
+                    return
+            
+            # 连接总数在借用时已受上限约束，归还时只需唤醒等待者
+            host_pool = self._get_host_pool(pooled_conn.conn_info)
+            with host_pool.available:
                 pooled_conn.mark_returned()
-                self.stats['total_connections_returned'] += 1
-                logger.info(f"连接已归还到连接池: {pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
-                
-                # 检查连接池大小限制
-                pool = self.pools.get(pooled_conn.conn_info, [])
-                active_connections = [conn for conn in pool if not conn.is_in_use]
-                
-                if len(active_connections) >= self.config.max_connections_per_server:
-                    # 连接池已满，关闭最旧的连接
-                    oldest_conn = min(active_connections, key=lambda x: x.last_used_time)
-                    logger.debug(f"连接池已满，关闭最旧的连接: {pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
-                    self._remove_connection(oldest_conn)
-                
-            except Exception as e:
-                logger.error(f"归还连接时出错: {str(e)}")
-                self._remove_connection(pooled_conn)
+                # 已判定不健康的共享连接，最后一个借用方归还后关闭
+                retired = not pooled_conn.is_healthy and pooled_conn.borrow_count == 0 and host_pool.discard(pooled_conn)
+                host_pool.available.notify()
+            if retired:
+                self._close_connection(pooled_conn)
+            
+            self._incr_stat('total_connections_returned')
+            logger.debug(f"连接已归还到连接池: {pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
+            
+        except Exception as e:
+            logger.error(f"归还连接时出错: {str(e)}")
+            self._remove_connection(pooled_conn)
     
     def _remove_connection(self, pooled_conn: PooledSSHConnection):
-        """从连接池中移除连接"""
+        """从连接池中移除连接并关闭"""
         try:
-            pool = self.pools.get(pooled_conn.conn_info, [])
-            if pooled_conn in pool:
-                pool.remove(pooled_conn)
-            pooled_conn.close()
-            self.stats['total_connections_closed'] += 1
+            host_pool = self.pools.get(pooled_conn.conn_info)
+            if host_pool is not None:
+                with host_pool.available:
+                    host_pool.discard(pooled_conn)
+                    # 释放了一个名额
+                    host_pool.available.notify()
+            self._close_connection(pooled_conn)
         except Exception as e:
             logger.error(f"移除连接时出错: {str(e)}")
     
+    def _retire_connection(self, pooled_conn: PooledSSHConnection):
+        """
+        释放调用方的一次占用并淘汰健康检查失败的连接
+        
+        通道复用模式下检查期间可能已有其他借用方共享了这个连接：此时只标记为不健康
+        （不再借出），由最后一个借用方归还时关闭，不中断其他借用方的通道。
+        """
+        host_pool = self.pools.get(pooled_conn.conn_info)
+        if host_pool is None:
+            self._close_connection(pooled_conn)
+            return
+        
+        with host_pool.available:
+            pooled_conn.is_healthy = False
+            pooled_conn.release()
+            close_now = pooled_conn.borrow_count == 0
+            if close_now:
+                host_pool.discard(pooled_conn)
+                # 释放了一个名额
+                host_pool.available.notify()
+        
+        if close_now:
+            self._close_connection(pooled_conn)
+        else:
+            logger.debug(f"连接健康检查失败，等待 {pooled_conn.borrow_count} 个共享借用方归还后关闭: "
+                         f"{pooled_conn.conn_info.host}:{pooled_conn.conn_info.port}")
+    
+    def _close_connection(self, pooled_conn: PooledSSHConnection):
+        """关闭已从集合中移除的连接"""
+        pooled_conn.close()
+        self._incr_stat('total_connections_closed')
+    
     def _cleanup_expired_connections(self):
         """清理过期连接的后台线程"""
         while self.is_running:
@@ -269,18 +514,30 @@ class SSHConnectionPool:
                 time.sleep(self.config.cleanup_interval)
                 
                 with self.lock:
-                    for conn_info, pool in list(self.pools.items()):
+                    host_pools = list(self.pools.items())
+                
+                for conn_info, host_pool in host_pools:
+                    with host_pool.lock:
                         expired_connections = [
-                            conn for conn in pool 
+                            conn for conn in host_pool.connections
                             if not conn.is_in_use and conn.is_expired()
                         ]
-                        
                         for conn in expired_connections:
-                            self._remove_connection(conn)
-                        
-                        # 如果池为空，删除池
-                        if not pool:
-                            del self.pools[conn_info]
+                            host_pool.discard(conn)
+                        if expired_connections:
+                            host_pool.available.notify(len(expired_connections))
+                        is_empty = not host_pool.connections and not host_pool.creating and not host_pool.waiting
+                    
+                    for conn in expired_connections:
+                        self._close_connection(conn)
+                    
+                    # 如果池为空，删除池（借用方此后会重新创建）
+                    if is_empty:
+                        with self.lock:
+                            with host_pool.lock:
+                                still_empty = not host_pool.connections and not host_pool.creating and not host_pool.waiting
+                            if self.pools.get(conn_info) is host_pool and still_empty:
+                                del self.pools[conn_info]
                 
             except Exception as e:
                 logger.error(f"清理过期连接时出错: {str(e)}")
@@ -292,13 +549,27 @@ class SSHConnectionPool:
                 time.sleep(self.config.health_check_interval)
                 
                 with self.lock:
-                    for pool in self.pools.values():
-                        for conn in pool[:]:  # 创建副本
-                            if not conn.is_in_use and conn.needs_health_check():
-                                self.stats['total_health_checks'] += 1
-                                if not conn.perform_health_check():
-                                    self.stats['failed_health_checks'] += 1
-                                    self._remove_connection(conn)
+                    host_pools = list(self.pools.values())
+                
+                for host_pool in host_pools:
+                    # 先占用需要检查的空闲连接，检查期间不会被借出
+                    with host_pool.lock:
+                        candidates = [
+                            conn for conn in host_pool.connections
+                            if not conn.is_in_use and conn.needs_health_check()
+                        ]
+                        for conn in candidates:
+                            conn.reserve()
+                    
+                    for conn in candidates:
+                        self._incr_stat('total_health_checks')
+                        if conn.perform_health_check():
+                            with host_pool.available:
+                                conn.release()
+                                host_pool.available.notify()
+                        else:
+                            self._incr_stat('failed_health_checks')
+                            self._retire_connection(conn)
                 
             except Exception as e:
                 logger.error(f"健康检查时出错: {str(e)}")
@@ -317,35 +588,65 @@ class SSHConnectionPool:
     def get_pool_stats(self) -> Dict[str, Any]:
         """获取连接池统计信息"""
         with self.lock:
-            total_connections = sum(len(pool) for pool in self.pools.values())
-            idle_connections = sum(
-                len([conn for conn in pool if not conn.is_in_use]) 
-                for pool in self.pools.values()
-            )
-            active_connections = sum(
-                len([conn for conn in pool if conn.is_in_use]) 
-                for pool in self.pools.values()
-            )
-            
-            return {
-                'total_pools': len(self.pools),
-                'total_connections': total_connections,
-                'active_connections': active_connections,
-                'idle_connections': idle_connections,
-                'statistics': self.stats.copy(),
-                'config': self.config.to_dict()
-            }
+            host_pools = list(self.pools.values())
+        
+        total_connections = 0
+        active_connections = 0
+        open_channels = 0
+        waiting_borrowers = 0
+        wait_histogram = BorrowWaitHistogram()
+        host_waits = {}
+        for host_pool in host_pools:
+            with host_pool.lock:
+                total_connections += len(host_pool.connections)
+                active_connections += len([conn for conn in host_pool.connections if conn.is_in_use])
+                open_channels += sum(conn.borrow_count for conn in host_pool.connections)
+                waiting_borrowers += host_pool.waiting
+                
+                histogram = host_pool.wait_histogram
+                wait_histogram.counts = [a + b for a, b in zip(wait_histogram.counts, histogram.counts)]
+                wait_histogram.count += histogram.count
+                wait_histogram.total_ms += histogram.total_ms
+                wait_histogram.max_ms = max(wait_histogram.max_ms, histogram.max_ms)
+                wait_histogram.timeouts += histogram.timeouts
+                
+                # 只列出出现过明显等待（超过最小分桶）的主机
+                if histogram.count > histogram.counts[0]:
+                    host_key = f"{host_pool.conn_info.host}:{host_pool.conn_info.port}"
+                    host_waits[host_key] = histogram.to_dict()
+        
+        with self._stats_lock:
+            statistics = self.stats.copy()
+        
+        return {
+            'total_pools': len(host_pools),
+            'total_connections': total_connections,
+            'active_connections': active_connections,
+            'idle_connections': total_connections - active_connections,
+            'borrowed_channels': open_channels,
+            'waiting_borrowers': waiting_borrowers,
+            'borrow_wait': wait_histogram.to_dict(),
+            'borrow_wait_by_host': host_waits,
+            'private_key_cache': private_key_cache.get_stats(),
+            'statistics': statistics,
+            'config': self.config.to_dict()
+        }
     
     def close_all(self):
         """关闭所有连接"""
         self.is_running = False
         
         with self.lock:
-            for pool in self.pools.values():
-                for conn in pool:
-                    conn.close()
+            host_pools = list(self.pools.values())
             self.pools.clear()
         
+        for host_pool in host_pools:
+            with host_pool.lock:
+                connections = list(host_pool.connections)
+                host_pool.connections.clear()
+            for conn in connections:
+                conn.close()
+        
         logger.info("SSH连接池已关闭所有连接")
 
 class SSHConnectionManager:
@@ -365,6 +666,7 @@ class SSHConnectionManager:
             # 使用配置文件中的值作为默认值
             pool_config = SSHPoolConfig(
                 max_connections_per_server=max_connections_per_server if max_connections_per_server is not None else config.max_connections_per_server,
+                borrow_timeout=config.borrow_timeout,
                 max_idle_time=max_idle_time if max_idle_time is not None else config.max_idle_time,
                 cleanup_interval=config.cleanup_interval,
                 connect_timeout=self.connect_timeout,
@@ -378,12 +680,35 @@ class SSHConnectionManager:
                 enable_pool_monitoring=config.enable_pool_monitoring,
                 pool_stats_log_interval=config.pool_stats_log_interval,
                 validate_connection_on_borrow=config.validate_connection_on_borrow,
-                validate_connection_on_return=config.validate_connection_on_return
+                validate_connection_on_return=config.validate_connection_on_return,
+                metric_probe_enabled=config.metric_probe_enabled,
+                multiplex_channels=config.multiplex_channels,
+                max_channels_per_transport=config.max_channels_per_transport,
+                circuit_breaker_enabled=config.circuit_breaker_enabled,
+                circuit_failure_threshold=config.circuit_failure_threshold,
+                circuit_open_timeout=config.circuit_open_timeout,
+                circuit_max_open_timeout=config.circuit_max_open_timeout
             )
-            self.connection_pool = SSHConnectionPool(config=pool_config)
+            self.connection_pool = SSHConnectionPool(config=pool_config, on_connect=self._on_pool_connect)
             logger.info(f"SSH连接池已初始化，max_idle_time={pool_config.max_idle_time}秒")
         else:
             self.connection_pool = None
+        
+        # 连续连接失败的主机熔断，巡视和服务监控共用
+        self.circuit_breaker = HostCircuitBreaker(
+            failure_threshold=config.circuit_failure_threshold,
+            open_timeout=config.circuit_open_timeout,
+            max_open_timeout=config.circuit_max_open_timeout,
+            enabled=config.circuit_breaker_enabled
+        )
+        
+        # 探针脚本执行完成但输出不完整的主机 -> 重新尝试探针的时间戳，期间直接走逐条命令采集
+        self._probe_unsupported_hosts = {}
+        self._probe_lock = threading.Lock()
+    
+    def _on_pool_connect(self, conn_info: 'ConnectionInfo'):
+        """连接池新建连接握手成功，解除该主机的熔断"""
+        self.circuit_breaker.record_success(f"{conn_info.host}:{conn_info.port}")
     
     def test_connection(self, host: str, port: int, username: str, 
                        password: Optional[str] = None, private_key_path: Optional[str] = None) -> Tuple[bool, str]:
@@ -418,14 +743,9 @@ class SSHConnectionManager:
                 
                 if private_key_path:
                     try:
-                        private_key = paramiko.RSAKey.from_private_key_file(private_key_path)
-                        auth_kwargs['pkey'] = private_key
+                        auth_kwargs['pkey'] = private_key_cache.load(private_key_path)
                     except Exception as e:
-                        try:
-                            private_key = paramiko.Ed25519Key.from_private_key_file(private_key_path)
-                            auth_kwargs['pkey'] = private_key
-                        except Exception:
-                            return False, f"无法加载私钥文件: {str(e)}"
+                        return False, str(e)
                 elif password:
                     auth_kwargs['password'] = password
                 else:
@@ -441,6 +761,8 @@ class SSHConnectionManager:
                 client.close()
                 
                 if result == "connection test":
+                    # 手动测试连通后解除该主机的熔断
+                    self.circuit_breaker.record_success(f"{host}:{port}")
                     return True, "连接成功"
                 else:
                     return False, "连接测试失败"
@@ -490,7 +812,13 @@ class SSHConnectionManager:
             
         Yields:
             paramiko.SSHClient: SSH客户端连接
+            
+        Raises:
+            CircuitOpenError: 主机连续连接失败处于熔断状态，未尝试连接
         """
+        host_key = f"{host}:{port}"
+        self.circuit_breaker.before_attempt(host_key)
+        
         if self.use_pool and self.connection_pool:
             # 使用连接池
             conn_info = ConnectionInfo(
@@ -501,13 +829,18 @@ class SSHConnectionManager:
                 private_key_path=private_key_path
             )
             
-            pooled_conn = None
+            # 只有新建连接握手成功才解除熔断（见 _on_pool_connect）；复用已有连接时只让出探测名额
             try:
                 pooled_conn = self.connection_pool.get_connection(conn_info)
+            except Exception as e:
+                self.circuit_breaker.record_failure(host_key, e)
+                raise
+            self.circuit_breaker.release_probe(host_key)
+            
+            try:
                 yield pooled_conn.client
             finally:
-                if pooled_conn:
-                    self.connection_pool.return_connection(pooled_conn)
+                self.connection_pool.return_connection(pooled_conn)
         else:
             # 传统方式，直接创建连接
             client = None
@@ -528,21 +861,14 @@ class SSHConnectionManager:
                     }
                     
                     if private_key_path:
-                        try:
-                            private_key = paramiko.RSAKey.from_private_key_file(private_key_path)
-                            auth_kwargs['pkey'] = private_key
-                        except Exception:
-                            try:
-                                private_key = paramiko.Ed25519Key.from_private_key_file(private_key_path)
-                                auth_kwargs['pkey'] = private_key
-                            except Exception as e:
-                                raise Exception(f"无法加载私钥文件: {str(e)}")
+                        auth_kwargs['pkey'] = private_key_cache.load(private_key_path)
                     elif password:
                         auth_kwargs['password'] = password
                     else:
                         raise Exception("必须提供密码或私钥文件")
                     
                     client.connect(**auth_kwargs)
+                    self.circuit_breaker.record_success(host_key)
                     yield client
                     return  # 连接成功，退出重试循环
                     
@@ -568,6 +894,9 @@ class SSHConnectionManager:
                         continue
                     else:
                         logger.error(f"SSH连接失败 - {host}:{port} (尝试 {attempt + 1}/{max_retries + 1}): {error_str}")
+                        if not (client and client.get_transport() and client.get_transport().is_active()):
+                            # 只有建连失败计入熔断，连接后调用方抛出的异常不计入
+                            self.circuit_breaker.record_failure(host_key, e)
                         
                         # 提供更详细的错误信息
                         if isinstance(e, paramiko.AuthenticationException):
@@ -618,11 +947,14 @@ class SSHConnectionManager:
     
     def get_pool_stats(self) -> Dict[str, Any]:
         """
-        获取连接池统计信息
+        获取连接池统计信息（含主机熔断状态）
         """
         if self.use_pool and self.connection_pool:
-            return self.connection_pool.get_pool_stats()
-        return {'message': '连接池未启用'}
+            stats = self.connection_pool.get_pool_stats()
+        else:
+            stats = {'message': '连接池未启用'}
+        stats['circuit_breakers'] = self.circuit_breaker.get_stats()
+        return stats
     
     def close_pool(self):
         """
@@ -631,7 +963,8 @@ class SSHConnectionManager:
         if self.use_pool and self.connection_pool:
             self.connection_pool.close_all()
 
-    def execute_command(self, client: paramiko.SSHClient, command: str, timeout: Optional[int] = None) -> Dict[str, Any]:
+    def execute_command(self, client: paramiko.SSHClient, command: str, timeout: Optional[int] = None,
+                        stdin_data: Optional[str] = None) -> Dict[str, Any]:
         """
         执行SSH命令，支持重试机制
         
@@ -639,6 +972,7 @@ class SSHConnectionManager:
             client: SSH客户端
             command: 要执行的命令
             timeout: 超时时间
+            stdin_data: 写入命令标准输入的内容（写完后关闭输入流）
             
         Returns:
             包含命令执行结果的字典
@@ -659,6 +993,11 @@ class SSHConnectionManager:
                 start_time = time.time()
                 stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
                 
+                if stdin_data is not None:
+                    stdin.write(stdin_data)
+                    stdin.flush()
+                    stdin.channel.shutdown_write()
+                
                 # 读取输出
                 stdout_data = stdout.read().decode('utf-8', errors='ignore')
                 stderr_data = stderr.read().decode('utf-8', errors='ignore')
@@ -705,6 +1044,11 @@ class SSHConnectionManager:
                     isinstance(e, paramiko.SSHException)
                 )
                 
+                # 连接已断开时在同一个客户端上重试只会再次失败，直接返回
+                transport = client.get_transport()
+                if transport is None or not transport.is_active():
+                    is_retryable_error = False
+                
                 if attempt < max_retries and is_retryable_error:
                     logger.warning(f"命令执行失败 (尝试 {attempt + 1}/{max_retries + 1}): {error_str}，{retry_delay}秒后重试")
                     time.sleep(retry_delay)
@@ -738,19 +1082,9 @@ class SSHConnectionManager:
         Returns:
             系统信息字典
         """
-        commands = {
-            'hostname': 'hostname',
-            'uptime': 'uptime',
-            'os_info': 'cat /etc/os-release 2>/dev/null || uname -a',
-            'kernel': 'uname -r',
-            'architecture': 'uname -m',
-            'load_average': 'cat /proc/loadavg',
-            'users': 'who | wc -l'
-        }
-        
         system_info = {}
         
-        for key, command in commands.items():
+        for key, command in SYSTEM_INFO_COMMANDS.items():
             try:
                 result = self.execute_command(client, command, timeout=10)
                 if result['success']:
@@ -774,23 +1108,50 @@ class SSHConnectionManager:
         """
         try:
             # 使用top命令获取CPU使用率
-            command = "top -bn1 | grep 'Cpu(s)' | awk '{print $2}' | cut -d'%' -f1"
-            result = self.execute_command(client, command, timeout=10)
+            result = self.execute_command(client, TOP_CPU_COMMAND, timeout=10)
             
             if result['success'] and result['stdout'].strip():
                 cpu_usage = float(result['stdout'].strip())
                 return cpu_usage
             
             # 备用方法：使用vmstat
+            return self._get_cpu_usage_vmstat(client)
+            
+        except Exception as e:
+            logger.error(f"获取CPU使用率失败: {str(e)}")
+        
+        return None
+    
+    def get_cpu_stats(self, client: paramiko.SSHClient, host_key: str) -> Optional[Dict[str, Any]]:
+        """
+        通过 /proc/stat 获取CPU使用情况（与上一次巡视的计数求差，远端无需等待）
+        
+        Args:
+            client: SSH客户端
+            host_key: 主机标识（host:port），用于缓存上一次的计数
+            
+        Returns:
+            包含 usage、iowait、steal、per_core、sample_type 的字典；主机不支持 /proc/stat 时返回None
+        """
+        try:
+            result = self.execute_command(client, PROC_STAT_COMMAND, timeout=10)
+            if result['success'] and result['stdout'].strip():
+                return cpu_sampler.sample(host_key, result['stdout'])
+        except Exception as e:
+            logger.error(f"读取/proc/stat失败: {str(e)}")
+        
+        return None
+    
+    def _get_cpu_usage_vmstat(self, client: paramiko.SSHClient) -> Optional[float]:
+        """使用vmstat获取CPU使用率（需要在远端采样1秒）"""
+        try:
             command = "vmstat 1 2 | tail -1 | awk '{print 100-$15}'"
             result = self.execute_command(client, command, timeout=15)
             
             if result['success'] and result['stdout'].strip():
-                cpu_usage = float(result['stdout'].strip())
-                return cpu_usage
-            
+                return float(result['stdout'].strip())
         except Exception as e:
-            logger.error(f"获取CPU使用率失败: {str(e)}")
+            logger.error(f"使用vmstat获取CPU使用率失败: {str(e)}")
         
         return None
     
@@ -806,31 +1167,12 @@ class SSHConnectionManager:
         """
         try:
             # 使用free命令获取详细内存信息
-            command = "free -m | grep Mem | awk '{print $2,$3,$4,$7}'"
-            result = self.execute_command(client, command, timeout=10)
+            result = self.execute_command(client, FREE_MEMORY_COMMAND, timeout=10)
             
-            if result['success'] and result['stdout'].strip():
-                parts = result['stdout'].strip().split()
-                if len(parts) >= 4:
-                    total_mb = int(parts[0])
-                    used_mb = int(parts[1])
-                    free_mb = int(parts[2])
-                    available_mb = int(parts[3])
-                    
-                    # 计算使用率（使用已用内存除以总内存）
-                    usage_percent = (used_mb / total_mb) * 100.0
-                    
-                    return {
-                        'usage_percent': round(usage_percent, 2),
-                        'total_mb': total_mb,
-                        'used_mb': used_mb,
-                        'free_mb': free_mb,
-                        'available_mb': available_mb,
-                        'total_gb': round(total_mb / 1024, 2),
-                        'used_gb': round(used_mb / 1024, 2),
-                        'free_gb': round(free_mb / 1024, 2),
-                        'available_gb': round(available_mb / 1024, 2)
-                    }
+            if result['success']:
+                memory_info = self._parse_memory_output(result['stdout'])
+                if memory_info is not None:
+                    return memory_info
             
             # 备用方法：只获取使用率
             command = "free | grep Mem | awk '{printf \"%.2f\", $3/$2 * 100.0}'"
@@ -855,6 +1197,39 @@ class SSHConnectionManager:
         
         return None
     
+    @staticmethod
+    def _parse_memory_output(output: str) -> Optional[Dict]:
+        """解析 free -m 的 Mem 行（总量、已用、空闲、可用）"""
+        parts = output.strip().split()
+        if len(parts) < 4:
+            return None
+        
+        try:
+            total_mb = int(parts[0])
+            used_mb = int(parts[1])
+            free_mb = int(parts[2])
+            available_mb = int(parts[3])
+        except ValueError:
+            return None
+        
+        if total_mb <= 0:
+            return None
+        
+        # 计算使用率（使用已用内存除以总内存）
+        usage_percent = (used_mb / total_mb) * 100.0
+        
+        return {
+            'usage_percent': round(usage_percent, 2),
+            'total_mb': total_mb,
+            'used_mb': used_mb,
+            'free_mb': free_mb,
+            'available_mb': available_mb,
+            'total_gb': round(total_mb / 1024, 2),
+            'used_gb': round(used_mb / 1024, 2),
+            'free_gb': round(free_mb / 1024, 2),
+            'available_gb': round(available_mb / 1024, 2)
+        }
+    
     def get_disk_usage(self, client: paramiko.SSHClient) -> list:
         """
         获取磁盘使用情况
@@ -868,39 +1243,374 @@ class SSHConnectionManager:
         disk_info = []
         
         try:
-            # 使用df -hP获取磁盘使用情况，避免设备名过长导致换行
-            command = "df -hP"
-            result = self.execute_command(client, command, timeout=10)
+            # df -P 避免设备名过长导致换行，按字节输出，过滤在远端完成
+            result = self.execute_command(client, DF_DISK_COMMAND, timeout=10)
             
             if result['success']:
-                lines = result['stdout'].strip().split('\n')
-                
-                for line in lines:
-                    if line.strip():
-                        parts = line.split()
-                        if len(parts) >= 6:
-                            filesystem = parts[0]
-                            size = parts[1]
-                            used = parts[2]
-                            available = parts[3]
-                            use_percent = parts[4].rstrip('%')
-                            mounted_on = parts[5]
-                            
-                            try:
-                                use_percent_float = float(use_percent)
-                            except ValueError:
-                                use_percent_float = 0.0
-                            
-                            disk_info.append({
-                                'filesystem': filesystem,
-                                'size': size,
-                                'used': used,
-                                'available': available,
-                                'use_percent': use_percent_float,
-                                'mounted_on': mounted_on
-                            })
+                disk_info = self._parse_disk_output(result['stdout'])
             
         except Exception as e:
             logger.error(f"获取磁盘使用情况失败: {str(e)}")
         
         return disk_info
+    
+    @staticmethod
+    def _parse_disk_output(output: str) -> list:
+        """
+        解析 df -P 输出
+        
+        表头为 "1-blocks"/"1024-blocks" 时按块大小换算出字节数（size_bytes 等），
+        size/used/available 仍保留 df -h 风格的可读字符串；旧的 df -hP 输出没有字节字段。
+        同一挂载点出现多次时只保留第一条。
+        """
+        disk_info = []
+        block_size = None
+        seen_mounts = set()
+        
+        for line in output.strip().split('\n'):
+            parts = line.split()
+            if len(parts) < 6:
+                continue
+            
+            try:
+                use_percent = float(parts[4].rstrip('%'))
+            except ValueError:
+                # 表头行，从中读取块大小
+                match = re.match(r'(\d+)-blocks', parts[1])
+                if match:
+                    block_size = int(match.group(1))
+                continue
+            
+            mounted_on = ' '.join(parts[5:])
+            if mounted_on in seen_mounts:
+                continue
+            seen_mounts.add(mounted_on)
+            
+            disk = {
+                'filesystem': parts[0],
+                'size': parts[1],
+                'used': parts[2],
+                'available': parts[3],
+                'use_percent': use_percent,
+                # 挂载点中可能含有空格
+                'mounted_on': mounted_on
+            }
+            
+            if block_size is not None:
+                try:
+                    size_bytes, used_bytes, available_bytes = (int(value) * block_size for value in parts[1:4])
+                except ValueError:
+                    pass
+                else:
+                    disk.update({
+                        'size': format_bytes(size_bytes),
+                        'used': format_bytes(used_bytes),
+                        'available': format_bytes(available_bytes),
+                        'size_bytes': size_bytes,
+                        'used_bytes': used_bytes,
+                        'available_bytes': available_bytes
+                    })
+            
+            disk_info.append(disk)
+        
+        return disk_info
+    
+    def collect_metrics(self, client: paramiko.SSHClient, host_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        采集主机巡视所需的全部指标
+        
+        优先在一个SSH通道内执行探针脚本，一次往返拿到全部指标；
+        探针不可用（被禁用、执行失败或输出不完整）时回退到逐条命令采集。
+        
+        Args:
+            client: SSH客户端
+            host_key: 主机标识（host:port），用于记录不支持探针的主机
+            
+        Returns:
+            包含 system_info、cpu_usage、cpu_stats、memory_info、disk_info、collection_mode 的字典
+        """
+        config = ssh_pool_config_manager.get_config()
+        probe_allowed = config.metric_probe_enabled
+        if probe_allowed and host_key:
+            with self._probe_lock:
+                retry_at = self._probe_unsupported_hosts.get(host_key)
+                if retry_at is not None and time.time() >= retry_at:
+                    del self._probe_unsupported_hosts[host_key]
+                    retry_at = None
+                probe_allowed = retry_at is None
+        
+        if probe_allowed:
+            metrics = self.collect_metrics_probe(client, host_key)
+            if metrics is not None:
+                return metrics
+        
+        cpu_stats = self.get_cpu_stats(client, host_key) if host_key else None
+        
+        return {
+            'system_info': self.get_system_info(client),
+            'cpu_usage': cpu_stats['usage'] if cpu_stats else self.get_cpu_usage(client),
+            'cpu_stats': cpu_stats,
+            'memory_info': self.get_memory_usage(client),
+            'disk_info': self.get_disk_usage(client),
+            'collection_mode': 'command'
+        }
+    
+    def collect_metrics_probe(self, client: paramiko.SSHClient, host_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        通过单个通道执行探针脚本采集全部指标
+        
+        脚本经标准输入交给 /bin/sh 执行，避免远端登录shell（如csh）的引号差异。
+        
+        Args:
+            client: SSH客户端
+            host_key: 主机标识（host:port），用于缓存 /proc/stat 计数
+            
+        Returns:
+            指标字典；探针执行失败或输出不完整时返回None
+        """
+        try:
+            result = self.execute_command(client, '/bin/sh -s', timeout=30, stdin_data=METRIC_PROBE_SCRIPT)
+        except Exception as e:
+            logger.warning(f"探针脚本执行异常，本次使用逐条命令采集: {str(e)}")
+            return None
+        
+        sections = parse_probe_sections(result['stdout'])
+        if 'end' not in sections:
+            # 超时、连接中断等情况退出码为-1，属于临时故障，下次仍尝试探针
+            if result['exit_code'] == -1:
+                logger.warning(f"探针脚本未执行完成，本次使用逐条命令采集: {result['stderr'][:200]}")
+                return None
+            
+            logger.warning(f"探针脚本输出不完整，退出码: {result['exit_code']}，错误: {result['stderr'][:200]}")
+            if host_key:
+                self._mark_probe_unsupported(host_key)
+            return None
+        
+        metrics = parse_probe_metrics(sections)
+        resolve_cpu_metrics(metrics, host_key)
+        
+        # 个别指标解析失败时，只对该指标补充一次逐条命令采集
+        if metrics['cpu_usage'] is None:
+            metrics['cpu_usage'] = self._get_cpu_usage_vmstat(client)
+        if metrics['memory_info'] is None:
+            metrics['memory_info'] = self.get_memory_usage(client)
+        
+        return metrics
+    
+    def _mark_probe_unsupported(self, host_key: str):
+        """记录探针输出不完整的主机，在 metric_probe_retry_interval 内改用逐条命令采集"""
+        retry_interval = ssh_pool_config_manager.get_config().metric_probe_retry_interval
+        with self._probe_lock:
+            self._probe_unsupported_hosts[host_key] = time.time() + retry_interval
+        logger.warning(f"主机 {host_key} 探针脚本输出不完整，{retry_interval} 秒内使用逐条命令采集")
+    
+    def get_probe_unsupported_hosts(self) -> Dict[str, str]:
+        """
+        获取当前改用逐条命令采集的主机
+        
+        Returns:
+            主机标识（host:port）到重新尝试探针时间的字典
+        """
+        now = time.time()
+        with self._probe_lock:
+            return {
+                host_key: datetime.fromtimestamp(retry_at).isoformat()
+                for host_key, retry_at in self._probe_unsupported_hosts.items() if retry_at > now
+            }
+    
+    def reset_probe_unsupported(self, host_key: Optional[str] = None) -> int:
+        """
+        清除探针不可用记录，下次巡视重新尝试探针脚本
+        
+        Args:
+            host_key: 主机标识（host:port），为None时清除全部
+            
+        Returns:
+            清除的记录数
+        """
+        with self._probe_lock:
+            if host_key is None:
+                count = len(self._probe_unsupported_hosts)
+                self._probe_unsupported_hosts.clear()
+                return count
+            return 1 if self._probe_unsupported_hosts.pop(host_key, None) is not None else 0
+
+
+# 系统信息采集命令
+SYSTEM_INFO_COMMANDS = {
+    'hostname': 'hostname',
+    'uptime': 'uptime',
+    'os_info': 'cat /etc/os-release 2>/dev/null || uname -a',
+    'kernel': 'uname -r',
+    'architecture': 'uname -m',
+    'load_average': 'cat /proc/loadavg',
+    'users': 'who | wc -l'
+}
+
+TOP_CPU_COMMAND = "top -bn1 | grep 'Cpu(s)' | awk '{print $2}' | cut -d'%' -f1"
+FREE_MEMORY_COMMAND = "free -m | grep Mem | awk '{print $2,$3,$4,$7}'"
+
+
+def format_bytes(value: int) -> str:
+    """按 df -h 的风格格式化字节数（1024进制）"""
+    size = float(value)
+    for unit in ('', 'K', 'M', 'G', 'T', 'P'):
+        if size < 1024 or unit == 'P':
+            break
+        size /= 1024
+    if not unit:
+        return str(int(size))
+    return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+
+
+def _split_config_list(value: str, pattern: str) -> List[str]:
+    """拆分逗号分隔的配置项，丢弃含有不允许字符的条目（命令在远端shell中执行）"""
+    items = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item and re.fullmatch(pattern, item):
+            items.append(item)
+        elif item:
+            logger.warning(f"忽略无效的磁盘过滤配置项: {item}")
+    return items
+
+
+def _build_df_disk_command() -> str:
+    """
+    生成磁盘采集命令
+    
+    优先 df -P -B1 -x <类型> 在远端按文件系统类型过滤并输出字节数，不支持这些参数的系统
+    （如BusyBox）回退到 df -kP；两种输出都再经 awk 按文件系统名和挂载点前缀过滤，只把需要的行传回。
+    
+    回退按 df 是否支持 -B1 判断而不是按退出码：单个挂载点无法访问时（如普通用户读取fuse/gvfs挂载）
+    GNU df 退出码为1但已输出完整列表，按退出码回退会再追加一份列表。
+    """
+    from config import Config
+    
+    fstypes = _split_config_list(getattr(Config, 'DISK_EXCLUDE_FSTYPES', ''), r'[A-Za-z0-9._-]+')
+    mounts = _split_config_list(getattr(Config, 'DISK_EXCLUDE_MOUNTS', ''), r'/[A-Za-z0-9._/-]*')
+    
+    exclude_types = ''.join(f" -x {fstype}" for fstype in fstypes)
+    # 部分挂载点失败时仍使用已输出的列表，不把整条命令当作失败
+    command = f"if df -P -B1 / >/dev/null 2>&1; then df -P -B1{exclude_types}; else df -kP; fi 2>/dev/null || true"
+    
+    conditions = []
+    if fstypes:
+        names = '|'.join(fstype.replace('.', '[.]') for fstype in fstypes)
+        conditions.append(f"$1 ~ /^({names})$/")
+    if mounts:
+        prefixes = '|'.join(mount.rstrip('/').replace('.', '[.]').replace('/', '\\/') for mount in mounts if mount != '/')
+        if prefixes:
+            conditions.append(f"$6 ~ /^({prefixes})(\\/|$)/")
+    if not conditions:
+        return command
+    return f"{{ {command} ; }} | awk 'NR == 1 || !({' || '.join(conditions)})'"
+
+
+DF_DISK_COMMAND = _build_df_disk_command()
+
+# 探针脚本的分段标记
+PROBE_SECTION_MARKER = '@@HM_SECTION:'
+
+
+def _build_metric_probe_script() -> str:
+    """生成指标探针脚本，每个指标输出前打印分段标记"""
+    sections = list(SYSTEM_INFO_COMMANDS.items()) + [
+        ('proc_stat', PROC_STAT_COMMAND),
+        # 只有读不到 /proc/stat 的主机才运行top
+        ('cpu', f"[ -r /proc/stat ] || {{ {TOP_CPU_COMMAND} ; }}"),
+        ('memory', FREE_MEMORY_COMMAND),
+        ('disk', DF_DISK_COMMAND),
+    ]
+    
+    lines = []
+    for name, command in sections:
+        lines.append(f"echo '{PROBE_SECTION_MARKER}{name}'")
+        lines.append(f"{{ {command} ; }} 2>/dev/null")
+    lines.append(f"echo '{PROBE_SECTION_MARKER}end'")
+    return '\n'.join(lines) + '\n'
+
+
+METRIC_PROBE_SCRIPT = _build_metric_probe_script()
+
+
+def parse_probe_sections(output: str) -> Dict[str, str]:
+    """
+    将探针脚本输出按分段标记切分
+    
+    Args:
+        output: 探针脚本的标准输出
+        
+    Returns:
+        分段名称到分段内容的字典
+    """
+    sections = {}
+    current = None
+    buffer = []
+    
+    for line in output.splitlines():
+        if line.startswith(PROBE_SECTION_MARKER):
+            if current is not None:
+                sections[current] = '\n'.join(buffer).strip()
+            current = line[len(PROBE_SECTION_MARKER):].strip()
+            buffer = []
+        elif current is not None:
+            buffer.append(line)
+    
+    if current is not None:
+        sections[current] = '\n'.join(buffer).strip()
+    
+    return sections
+
+
+def parse_probe_metrics(sections: Dict[str, str]) -> Dict[str, Any]:
+    """
+    将探针分段内容解析为与逐条命令采集一致的指标结构
+    
+    Args:
+        sections: parse_probe_sections 的返回值
+        
+    Returns:
+        指标字典，无法解析的 cpu_usage / memory_info 为None
+    """
+    system_info = {}
+    for key in SYSTEM_INFO_COMMANDS:
+        value = sections.get(key, '')
+        system_info[key] = value if value else "获取失败: 无输出"
+    
+    cpu_usage = None
+    cpu_text = sections.get('cpu', '')
+    if cpu_text:
+        try:
+            cpu_usage = float(cpu_text.split()[0])
+        except (ValueError, IndexError):
+            cpu_usage = None
+    
+    return {
+        'system_info': system_info,
+        'cpu_usage': cpu_usage,
+        'cpu_stats': None,
+        'proc_stat': sections.get('proc_stat', ''),
+        'memory_info': SSHConnectionManager._parse_memory_output(sections.get('memory', '')),
+        'disk_info': SSHConnectionManager._parse_disk_output(sections.get('disk', '')),
+        'collection_mode': 'probe'
+    }
+
+
+def resolve_cpu_metrics(metrics: Dict[str, Any], host_key: Optional[str]) -> None:
+    """
+    用探针输出的 /proc/stat 计数计算CPU指标（原地修改 metrics）
+    
+    Args:
+        metrics: parse_probe_metrics 的返回值
+        host_key: 主机标识（host:port）；为None时只能按开机以来的累计值计算
+    """
+    proc_stat = metrics.pop('proc_stat', '')
+    if not proc_stat:
+        return
+    
+    sampler = cpu_sampler if host_key else ProcStatCPUSampler()
+    cpu_stats = sampler.sample(host_key or '', proc_stat)
+    if cpu_stats is not None:
+        metrics['cpu_stats'] = cpu_stats
+        metrics['cpu_usage'] = cpu_stats['usage']
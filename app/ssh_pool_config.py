@@ -14,7 +14,8 @@ class SSHPoolConfig:
     """SSH连接池配置类"""
     
     # 连接池基本配置
-    max_connections_per_server: int = 3  # 每个服务器的最大连接数
+    max_connections_per_server: int = 3  # 每个服务器的最大连接数（借用时强制限制）
+    borrow_timeout: int = 30  # 服务器连接数已满时借用连接的最长等待时间（秒）
     max_idle_time: int = 3600  # 连接最大空闲时间（秒）
     cleanup_interval: int = 60  # 清理线程运行间隔（秒）
     
@@ -40,10 +41,25 @@ class SSHPoolConfig:
     validate_connection_on_borrow: bool = True  # 借用连接时是否验证
     validate_connection_on_return: bool = False  # 归还连接时是否验证
     
+    # 指标采集配置
+    metric_probe_enabled: bool = True  # 是否使用单次往返的指标探针脚本采集
+    metric_probe_retry_interval: int = 3600  # 探针输出不完整的主机改用逐条命令采集的时长（秒），到期后重新尝试探针
+    
+    # 通道复用配置
+    multiplex_channels: bool = True  # 是否在同一个SSH连接上并发打开多个通道
+    max_channels_per_transport: int = 8  # 每个SSH连接同时借出的最大通道数（需小于服务端 MaxSessions）
+    
+    # 主机熔断配置
+    circuit_breaker_enabled: bool = True  # 是否对连续连接失败的主机熔断
+    circuit_failure_threshold: int = 3  # 连续连接失败多少次后熔断
+    circuit_open_timeout: int = 300  # 熔断后放行探测连接前的冷却时间（秒）
+    circuit_max_open_timeout: int = 1800  # 探测连续失败时冷却时间加倍的上限（秒）
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         return {
             'max_connections_per_server': self.max_connections_per_server,
+            'borrow_timeout': self.borrow_timeout,
             'max_idle_time': self.max_idle_time,
             'cleanup_interval': self.cleanup_interval,
             'connect_timeout': self.connect_timeout,
@@ -57,7 +73,15 @@ class SSHPoolConfig:
             'enable_pool_monitoring': self.enable_pool_monitoring,
             'pool_stats_log_interval': self.pool_stats_log_interval,
             'validate_connection_on_borrow': self.validate_connection_on_borrow,
-            'validate_connection_on_return': self.validate_connection_on_return
+            'validate_connection_on_return': self.validate_connection_on_return,
+            'metric_probe_enabled': self.metric_probe_enabled,
+            'metric_probe_retry_interval': self.metric_probe_retry_interval,
+            'multiplex_channels': self.multiplex_channels,
+            'max_channels_per_transport': self.max_channels_per_transport,
+            'circuit_breaker_enabled': self.circuit_breaker_enabled,
+            'circuit_failure_threshold': self.circuit_failure_threshold,
+            'circuit_open_timeout': self.circuit_open_timeout,
+            'circuit_max_open_timeout': self.circuit_max_open_timeout
         }
     
     @classmethod
@@ -72,6 +96,10 @@ class SSHPoolConfig:
                 logger.error("max_connections_per_server 必须大于 0")
                 return False
             
+            if self.borrow_timeout <= 0:
+                logger.error("borrow_timeout 必须大于 0")
+                return False
+            
             if self.max_idle_time <= 0:
                 logger.error("max_idle_time 必须大于 0")
                 return False
@@ -101,6 +129,27 @@ class SSHPoolConfig:
                     logger.error("health_check_command 不能为空")
                     return False
             
+            if self.metric_probe_retry_interval < 0:
+                logger.error("metric_probe_retry_interval 不能小于 0")
+                return False
+            
+            if self.max_channels_per_transport <= 0:
+                logger.error("max_channels_per_transport 必须大于 0")
+                return False
+            
+            if self.circuit_breaker_enabled:
+                if self.circuit_failure_threshold <= 0:
+                    logger.error("circuit_failure_threshold 必须大于 0")
+                    return False
+                
+                if self.circuit_open_timeout <= 0:
+                    logger.error("circuit_open_timeout 必须大于 0")
+                    return False
+                
+                if self.circuit_max_open_timeout < self.circuit_open_timeout:
+                    logger.error("circuit_max_open_timeout 不能小于 circuit_open_timeout")
+                    return False
+            
             if self.max_retries < 0:
                 logger.error("max_retries 不能小于 0")
                 return False
@@ -163,6 +212,7 @@ class SSHPoolConfigManager:
             'is_valid': self._config.validate(),
             'description': {
                 'max_connections_per_server': '每个服务器的最大连接数',
+                'borrow_timeout': '连接数已满时借用连接的最长等待时间（秒）',
                 'max_idle_time': '连接最大空闲时间（秒）',
                 'cleanup_interval': '清理线程运行间隔（秒）',
                 'connect_timeout': '连接超时时间（秒）',
@@ -176,7 +226,15 @@ class SSHPoolConfigManager:
                 'enable_pool_monitoring': '是否启用连接池监控',
                 'pool_stats_log_interval': '连接池统计日志间隔（秒）',
                 'validate_connection_on_borrow': '借用连接时是否验证',
-                'validate_connection_on_return': '归还连接时是否验证'
+                'validate_connection_on_return': '归还连接时是否验证',
+                'metric_probe_enabled': '是否使用单次往返的指标探针脚本采集',
+                'metric_probe_retry_interval': '探针输出不完整的主机改用逐条命令采集的时长（秒）',
+                'multiplex_channels': '是否在同一个SSH连接上并发打开多个通道',
+                'max_channels_per_transport': '每个SSH连接同时借出的最大通道数',
+                'circuit_breaker_enabled': '是否对连续连接失败的主机熔断',
+                'circuit_failure_threshold': '连续连接失败多少次后熔断',
+                'circuit_open_timeout': '熔断后放行探测连接前的冷却时间（秒）',
+                'circuit_max_open_timeout': '探测连续失败时冷却时间加倍的上限（秒）'
             }
         }
 
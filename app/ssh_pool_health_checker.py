@@ -9,6 +9,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
+from app.circuit_breaker import CIRCUIT_CLOSED
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -34,7 +36,7 @@ class SSHPoolHealthChecker:
     
     def check_pool_health(self) -> Dict[str, Any]:
         """检查整个连接池的健康状态"""
-        if not hasattr(self.ssh_manager, 'ssh_pool') or not self.ssh_manager.ssh_pool:
+        if not getattr(self.ssh_manager, 'connection_pool', None):
             return {
                 'status': 'disabled',
                 'message': '连接池未启用',
@@ -44,8 +46,12 @@ class SSHPoolHealthChecker:
         pool_stats = self.ssh_manager.get_pool_stats()
         health_results = []
         
+        connection_pool = self.ssh_manager.connection_pool
+        with connection_pool.lock:
+            host_pools = list(connection_pool.pools.items())
+        
         # 检查每个服务器的连接健康状态
-        for conn_info, pool in self.ssh_manager.ssh_pool.pools.items():
+        for conn_info, pool in host_pools:
             server_key = f"{conn_info.host}:{conn_info.port}"
             
             # 统计该服务器的连接状态
@@ -53,13 +59,14 @@ class SSHPoolHealthChecker:
             healthy_connections = sum(1 for conn in pool if conn.is_healthy)
             in_use_connections = sum(1 for conn in pool if conn.is_in_use)
             
-            # 执行健康检查
+            # 执行健康检查（熔断中的主机直接判定为不健康，不发起连接）
             health_result = self._check_server_health(conn_info)
             health_results.append({
                 'server': server_key,
                 'total_connections': total_connections,
                 'healthy_connections': healthy_connections,
                 'in_use_connections': in_use_connections,
+                'circuit_breaker': self.ssh_manager.circuit_breaker.get_state(server_key),
                 'health_check': health_result.__dict__
             })
             
@@ -74,6 +81,7 @@ class SSHPoolHealthChecker:
             'overall_health': overall_health,
             'pool_statistics': pool_stats,
             'server_health': health_results,
+            'circuit_breakers': pool_stats.get('circuit_breakers'),
             'timestamp': datetime.now().isoformat()
         }
     
@@ -82,6 +90,16 @@ class SSHPoolHealthChecker:
         server_key = f"{conn_info.host}:{conn_info.port}"
         start_time = time.time()
         
+        # 熔断中的主机不发起连接，避免占用半开状态的探测名额
+        circuit = self.ssh_manager.circuit_breaker.get_state(server_key)
+        if circuit['state'] != CIRCUIT_CLOSED:
+            return HealthCheckResult(
+                server=server_key,
+                is_healthy=False,
+                response_time=0.0,
+                error_message=f"主机处于熔断状态: {circuit.get('last_error') or circuit['state']}"
+            )
+        
         try:
             # 尝试获取一个连接并执行简单命令
             with self.ssh_manager.get_connection(conn_info.host, conn_info.port, 
@@ -223,7 +241,7 @@ class SSHPoolHealthChecker:
         """诊断连接池问题"""
         issues = []
         
-        if not hasattr(self.ssh_manager, 'ssh_pool') or not self.ssh_manager.ssh_pool:
+        if not getattr(self.ssh_manager, 'connection_pool', None):
             issues.append({
                 'type': 'configuration',
                 'severity': 'warning',
@@ -272,6 +290,20 @@ class SSHPoolHealthChecker:
                     'recommendation': '检查服务器状态和网络连接'
                 })
         
+        # 检查熔断中的主机
+        circuit_stats = pool_stats.get('circuit_breakers', {})
+        open_hosts = [
+            host_key for host_key, state in circuit_stats.get('hosts', {}).items()
+            if state['state'] != 'closed'
+        ]
+        if open_hosts:
+            issues.append({
+                'type': 'availability',
+                'severity': 'error',
+                'message': f"{len(open_hosts)} 台主机连续连接失败已熔断: {', '.join(open_hosts[:10])}",
+                'recommendation': '检查主机是否在线及网络连通性，恢复后可通过连接测试立即解除熔断'
+            })
+        
         # 检查连接池命中率
         pool_hits = stats.get('pool_hits', 0)
         pool_misses = stats.get('pool_misses', 0)
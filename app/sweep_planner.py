@@ -0,0 +1,79 @@
+"""
+巡视计划模块
+按历史耗时安排主机的提交顺序：预计耗时最长的主机最先开始（LPT），
+缩短整轮巡视的尾部；上一轮因巡视期限未开始采集的主机本轮最先提交；
+最近连续失败的主机放到低优先级队列最后处理
+"""
+
+import logging
+import statistics
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models import Server, ServerLatestStatus
+
+logger = logging.getLogger(__name__)
+
+# IN 查询每批的参数数量，避免超过SQLite的变量上限
+_IN_CHUNK_SIZE = 500
+
+
+def plan_sweep_order(session, servers: List[Server], failure_streak: int = 3,
+                     overdue_ids: Optional[Iterable[int]] = None) -> Tuple[List[Server], Dict[str, Any]]:
+    """
+    计算本轮巡视的主机提交顺序
+
+    Args:
+        session: 数据库会话
+        servers: 待巡视的服务器列表
+        failure_streak: 连续失败达到该次数的主机进入低优先级队列，0表示不区分
+        overdue_ids: 上一轮未开始采集的服务器ID，排在正常队列最前，避免每轮都跳过同一批主机
+
+    Returns:
+        (排序后的服务器列表, 计划摘要)
+    """
+    history = {}
+    server_ids = [server.id for server in servers]
+    for start in range(0, len(server_ids), _IN_CHUNK_SIZE):
+        chunk = server_ids[start:start + _IN_CHUNK_SIZE]
+        rows = session.query(
+            ServerLatestStatus.server_id,
+            ServerLatestStatus.avg_execution_time,
+            ServerLatestStatus.consecutive_failures
+        ).filter(ServerLatestStatus.server_id.in_(chunk))
+        for server_id, avg_execution_time, consecutive_failures in rows:
+            history[server_id] = (avg_execution_time, consecutive_failures or 0)
+
+    known_times = [item[0] for item in history.values() if item[0] is not None]
+    # 没有历史耗时的主机按已知主机的中位数估计
+    default_time = statistics.median(known_times) if known_times else 0.0
+
+    overdue_ids = set(overdue_ids or ())
+    normal_lane = []
+    low_priority_lane = []
+    for index, server in enumerate(servers):
+        avg_execution_time, consecutive_failures = history.get(server.id, (None, 0))
+        expected = avg_execution_time if avg_execution_time is not None else default_time
+        entry = (expected, index, server)
+        if failure_streak > 0 and consecutive_failures >= failure_streak:
+            low_priority_lane.append(entry)
+        else:
+            normal_lane.append(entry)
+
+    # 上一轮未开始的主机在前，其余预计耗时长的在前，相同时保持原顺序
+    normal_lane.sort(key=lambda entry: (entry[2].id not in overdue_ids, -entry[0], entry[1]))
+    low_priority_lane.sort(key=lambda entry: (-entry[0], entry[1]))
+
+    ordered = [entry[2] for entry in normal_lane] + [entry[2] for entry in low_priority_lane]
+    plan = {
+        'strategy': 'longest_expected_first',
+        'known_hosts': len(known_times),
+        'unknown_hosts': len(servers) - len(known_times),
+        'default_expected_time': round(default_time, 3),
+        'expected_total_time': round(sum(entry[0] for entry in normal_lane + low_priority_lane), 3),
+        'low_priority_hosts': [entry[2].name for entry in low_priority_lane],
+        'overdue_hosts': [entry[2].name for entry in normal_lane if entry[2].id in overdue_ids],
+        'failure_streak': failure_streak
+    }
+    if low_priority_lane:
+        logger.info(f"{len(low_priority_lane)} 台最近连续失败的主机放在本轮巡视最后")
+    return ordered, plan
@@ -0,0 +1,76 @@
+"""
+后台线程应用上下文模块
+create_app 创建的应用在这里注册，调度任务、巡视线程等没有应用上下文的代码
+通过 worker_app_context() 复用同一个应用及其数据库引擎，不再为每次调用临时创建 Flask 应用
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from flask import Flask, current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+_app: Optional[Flask] = None
+_lock = threading.Lock()
+
+
+def register_app(app: Flask) -> None:
+    """
+    注册进程内的应用实例（由 create_app 调用）
+
+    Args:
+        app: Flask应用
+    """
+    global _app
+    with _lock:
+        _app = app
+
+
+def get_app() -> Flask:
+    """
+    获取已注册的应用实例
+
+    没有通过 create_app 注册应用时（例如独立脚本），创建一个只初始化数据库的最小应用，
+    之后所有线程复用它。
+
+    Returns:
+        Flask应用
+    """
+    global _app
+    if _app is not None:
+        return _app
+
+    with _lock:
+        if _app is None:
+            from config import Config
+            from app.models import db
+            from app.sqlite_profile import install_sqlite_profile
+
+            app = Flask(__name__)
+            app.config.from_object(Config)
+            # 只初始化数据库，不初始化调度器和服务监控
+            install_sqlite_profile(app.config)
+            db.init_app(app)
+            _app = app
+            logger.warning("未注册应用实例，已创建仅包含数据库的应用供后台线程复用")
+        return _app
+
+
+@contextmanager
+def worker_app_context() -> Iterator[Flask]:
+    """
+    确保代码在应用上下文中执行：已有上下文时直接使用，否则推入已注册应用的上下文
+
+    Yields:
+        当前使用的Flask应用
+    """
+    if has_app_context():
+        yield current_app._get_current_object()
+        return
+
+    app = get_app()
+    with app.app_context():
+        yield app
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/servers/with-services 接口基准测试
+
+在临时SQLite数据库中生成不同规模的服务器、服务配置和服务监控日志，
+测量接口的响应耗时和SQL查询次数，验证查询次数不随服务器数量增长。
+
+用法:
+    python benchmarks/bench_servers_with_services.py
+    python benchmarks/bench_servers_with_services.py --sizes 10 100 1000 5000 --services 5 --logs 3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, basedir)
+
+from sqlalchemy import event, insert
+
+from config import Config
+from app import create_app
+from app.models import db, AdminUser, Server, ServiceConfig, ServiceMonitorLog
+
+
+def seed(server_count: int, services_per_server: int, logs_per_service: int):
+    """批量生成测试数据"""
+    now = datetime.now()
+    db.session.execute(insert(Server), [
+        {'name': f'bench-{i}', 'host': f'10.0.{i // 256}.{i % 256}', 'port': 22,
+         'username': 'root', 'status': 'active'}
+        for i in range(server_count)
+    ])
+    server_ids = [server_id for (server_id,) in db.session.query(Server.id).all()]
+
+    db.session.execute(insert(ServiceConfig), [
+        {'server_id': server_id, 'service_name': f'svc-{j}', 'process_name': f'proc-{j}',
+         'is_monitoring': j % 4 != 3}
+        for server_id in server_ids for j in range(services_per_server)
+    ])
+    service_ids = [service_id for (service_id,) in db.session.query(ServiceConfig.id).all()]
+
+    statuses = ['running', 'running', 'stopped', 'error']
+    db.session.execute(insert(ServiceMonitorLog), [
+        {'service_config_id': service_id, 'status': statuses[(service_id + k) % len(statuses)],
+         'process_count': 1, 'monitor_time': now - timedelta(minutes=k)}
+        for service_id in service_ids for k in range(logs_per_service)
+    ])
+    db.session.commit()
+
+
+def run_case(server_count: int, args) -> dict:
+    """在独立数据库中测量一种规模"""
+    db_file = os.path.join(tempfile.mkdtemp(prefix='bench_with_services_'), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_file}'
+        CONSOLE_LOG_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        seed(server_count, args.services, args.logs)
+        user = AdminUser(username='bench', password_hash='-', salt='-', is_active=True)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        query_count = {'value': 0}
+
+        def count_queries(*_):
+            query_count['value'] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count_queries)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['login_time'] = datetime.now().isoformat()
+
+    row = {'servers': server_count}
+    for label, per_page in (('page', args.per_page), ('all', server_count)):
+        timings = []
+        for _ in range(args.repeat):
+            query_count['value'] = 0
+            start = time.perf_counter()
+            response = client.get(f'/api/servers/with-services?page=1&per_page={per_page}')
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.get_json()['success'], response.get_json()
+        timings.sort()
+        row[f'{label}_ms'] = timings[len(timings) // 2]
+        row[f'{label}_queries'] = query_count['value']
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/servers/with-services 基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000], help='服务器数量')
+    parser.add_argument('--services', type=int, default=5, help='每台服务器的服务数')
+    parser.add_argument('--logs', type=int, default=3, help='每个服务的历史日志条数')
+    parser.add_argument('--per-page', type=int, default=20, help='分页大小')
+    parser.add_argument('--repeat', type=int, default=5, help='每种规模的请求次数（取中位数）')
+    args = parser.parse_args()
+
+    print(f"{'服务器数':>8} | {'单页耗时(ms)':>12} | {'单页查询数':>10} | {'全量耗时(ms)':>12} | {'全量查询数':>10}")
+    for size in args.sizes:
+        row = run_case(size, args)
+        print(f"{row['servers']:>8} | {row['page_ms']:>12.1f} | {row['page_queries']:>10} | "
+              f"{row['all_ms']:>12.1f} | {row['all_queries']:>10}")
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
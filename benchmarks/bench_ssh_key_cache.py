@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH私钥缓存基准测试
+
+在临时目录生成 RSA、ECDSA、Ed25519 私钥，分别测量：
+  - parse: 每次重新解析私钥文件与走私钥缓存的单次加载耗时
+  - connect: 使用本地替身SSH服务器（公钥认证）建立新连接时，
+    重新解析私钥与使用缓存的平均建连耗时
+
+用法:
+    python benchmarks/bench_ssh_key_cache.py
+    python benchmarks/bench_ssh_key_cache.py --loads 50 --connects 30
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, basedir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from fake_ssh_server import FakeSSHServer
+from app import ssh_key_cache
+from app.ssh_key_cache import PrivateKeyCache
+from app.ssh_manager import SSHConnectionPool, ConnectionInfo
+from app.ssh_pool_config import SSHPoolConfig
+
+
+def write_keys(directory: str) -> dict:
+    """生成各类型私钥文件，返回 类型 -> 路径"""
+    keys = {
+        'rsa-2048': (rsa.generate_private_key(public_exponent=65537, key_size=2048), serialization.PrivateFormat.TraditionalOpenSSL),
+        'rsa-4096': (rsa.generate_private_key(public_exponent=65537, key_size=4096), serialization.PrivateFormat.TraditionalOpenSSL),
+        'ecdsa-p256': (ec.generate_private_key(ec.SECP256R1()), serialization.PrivateFormat.OpenSSH),
+        'ed25519': (ed25519.Ed25519PrivateKey.generate(), serialization.PrivateFormat.OpenSSH),
+    }
+    paths = {}
+    for name, (key, fmt) in keys.items():
+        path = os.path.join(directory, f'id_{name}')
+        with open(path, 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, fmt, serialization.NoEncryption()))
+        paths[name] = path
+    return paths
+
+
+def time_loads(load, path: str, count: int) -> float:
+    """平均单次加载耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(count):
+        load(path)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def time_connects(server: FakeSSHServer, path: str, count: int) -> float:
+    """平均建立一个新连接的耗时（毫秒），每次都新建连接池避免复用"""
+    info = ConnectionInfo(host=server.host, port=server.ports[0], username='bench', private_key_path=path)
+    config = SSHPoolConfig(enable_pool_monitoring=False, health_check_enabled=False)
+    total = 0.0
+    for _ in range(count):
+        pool = SSHConnectionPool(config=config)
+        start = time.perf_counter()
+        conn = pool.get_connection(info)
+        total += time.perf_counter() - start
+        pool.return_connection(conn)
+        pool.close_all()
+    return total * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSH私钥缓存基准测试')
+    parser.add_argument('--loads', type=int, default=20, help='每种私钥的加载次数')
+    parser.add_argument('--connects', type=int, default=20, help='每种模式的建连次数')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    directory = tempfile.mkdtemp(prefix='bench_key_cache_')
+    paths = write_keys(directory)
+
+    print(f"{'私钥类型':>12} | {'解析(ms)':>9} | {'缓存(ms)':>9}")
+    for name, path in paths.items():
+        parse_ms = time_loads(ssh_key_cache._parse_private_key, path, args.loads)
+        cache = PrivateKeyCache()
+        cache.load(path)
+        cached_ms = time_loads(cache.load, path, args.loads)
+        print(f"{name:>12} | {parse_ms:>9.3f} | {cached_ms:>9.4f}")
+
+    print()
+    print(f"{'私钥类型':>12} | {'建连-解析(ms)':>13} | {'建连-缓存(ms)':>13}")
+    with FakeSSHServer(host_count=1) as server:
+        for name in ('rsa-4096', 'ed25519'):
+            path = paths[name]
+            # 不使用缓存：每次建连前清空全局缓存
+            original_load = ssh_key_cache.private_key_cache.load
+
+            def uncached_load(key_path):
+                ssh_key_cache.private_key_cache.invalidate()
+                return original_load(key_path)
+
+            ssh_key_cache.private_key_cache.load = uncached_load
+            uncached = time_connects(server, path, args.connects)
+            ssh_key_cache.private_key_cache.load = original_load
+
+            ssh_key_cache.private_key_cache.load(path)
+            cached = time_connects(server, path, args.connects)
+            print(f"{name:>12} | {uncached:>13.2f} | {cached:>13.2f}")
+
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
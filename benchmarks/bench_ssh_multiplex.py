@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH通道复用基准测试
+
+使用本地替身SSH服务器模拟多台主机，每台主机同时有 --users 个借用方执行命令，
+对比每个借用方独占一个连接与多个借用方共享一个 Transport（multiplex_channels）时的
+握手次数和总耗时；最后断开服务端所有连接，验证复用模式下 Transport 能被自动重建。
+
+用法:
+    python benchmarks/bench_ssh_multiplex.py
+    python benchmarks/bench_ssh_multiplex.py --hosts 16 --users 8 --auth-delay 0.2 --command-delay 0.05
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, basedir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ssh_server import FakeSSHServer
+from app.ssh_manager import SSHConnectionPool, ConnectionInfo
+from app.ssh_pool_config import SSHPoolConfig
+
+
+def sweep(pool: SSHConnectionPool, infos, users: int) -> float:
+    """每台主机并发 users 个借用方各执行一条命令，返回总耗时"""
+
+    def run(conn_info):
+        conn = pool.get_connection(conn_info)
+        try:
+            stdin, stdout, stderr = conn.client.exec_command('uptime', timeout=10)
+            stdout.read()
+        finally:
+            pool.return_connection(conn)
+
+    tasks = [info for info in infos for _ in range(users)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        list(executor.map(run, tasks))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSH通道复用基准测试')
+    parser.add_argument('--hosts', type=int, default=8, help='模拟的主机数')
+    parser.add_argument('--users', type=int, default=6, help='每台主机的并发借用方数')
+    parser.add_argument('--auth-delay', type=float, default=0.2, help='每次认证的延迟（秒）')
+    parser.add_argument('--command-delay', type=float, default=0.05, help='每条命令的延迟（秒）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    # 断线阶段 paramiko 会大量输出连接重置日志
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    print(f"主机数={args.hosts}, 每台并发={args.users}, 认证延迟={args.auth_delay}s, 命令延迟={args.command_delay}s")
+    print(f"{'模式':>10} | {'握手次数':>8} | {'首轮(s)':>8} | {'复用轮(s)':>9} | {'断线后(s)':>9} | {'断线后握手':>10}")
+
+    for label, multiplex in (('exclusive', False), ('multiplex', True)):
+        with FakeSSHServer(host_count=args.hosts, auth_delay=args.auth_delay,
+                           command_delay=args.command_delay) as server:
+            infos = [
+                ConnectionInfo(host=server.host, port=port, username='bench', password=server.password)
+                for port in server.ports
+            ]
+            config = SSHPoolConfig(enable_pool_monitoring=False, health_check_interval=3600,
+                                   max_connections_per_server=args.users,
+                                   multiplex_channels=multiplex,
+                                   max_channels_per_transport=args.users)
+            pool = SSHConnectionPool(config=config)
+
+            cold = sweep(pool, infos, args.users)
+            handshakes = server.handshakes
+            warm = sweep(pool, infos, args.users)
+
+            server.drop_connections()
+            time.sleep(0.2)
+            before = server.handshakes
+            recovered = sweep(pool, infos, args.users)
+            pool.close_all()
+
+            print(f"{label:>10} | {handshakes:>8} | {cold:>8.2f} | {warm:>9.2f} | {recovered:>9.2f} | "
+                  f"{server.handshakes - before:>10}")
+
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
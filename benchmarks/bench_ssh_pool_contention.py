@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSH连接池锁竞争基准测试
+
+使用本地替身SSH服务器模拟多台主机（每台主机认证耗时 --auth-delay 秒），
+多个线程同时向不同主机借用连接，分别测量：
+  - cold: 首次借用，需要完成TCP/SSH握手和认证
+  - warm: 复用池中连接，借用时执行健康检查
+--serialize 会在借用外面再套一把全局锁，模拟所有主机串行建连的旧行为作对比。
+
+用法:
+    python benchmarks/bench_ssh_pool_contention.py
+    python benchmarks/bench_ssh_pool_contention.py --hosts 32 --threads 32 --auth-delay 0.2
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, basedir)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ssh_server import FakeSSHServer
+from app.ssh_manager import SSHConnectionPool, ConnectionInfo
+from app.ssh_pool_config import SSHPoolConfig
+
+
+def borrow_all(pool: SSHConnectionPool, infos, threads: int, serialize: bool) -> float:
+    """并发地向每台主机借用并归还一次连接，返回总耗时"""
+    global_lock = threading.Lock()
+
+    def borrow(conn_info):
+        if serialize:
+            with global_lock:
+                conn = pool.get_connection(conn_info)
+        else:
+            conn = pool.get_connection(conn_info)
+        pool.return_connection(conn)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(borrow, infos))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSH连接池锁竞争基准测试')
+    parser.add_argument('--hosts', type=int, default=16, help='模拟的主机数')
+    parser.add_argument('--threads', type=int, default=16, help='并发借用线程数')
+    parser.add_argument('--auth-delay', type=float, default=0.2, help='每次认证的延迟（秒）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with FakeSSHServer(host_count=args.hosts, auth_delay=args.auth_delay) as server:
+        infos = [
+            ConnectionInfo(host=server.host, port=port, username='bench', password=server.password)
+            for port in server.ports
+        ]
+
+        print(f"主机数={args.hosts}, 线程数={args.threads}, 认证延迟={args.auth_delay}s, "
+              f"串行建连的理论耗时≈{args.hosts * args.auth_delay:.2f}s")
+        print(f"{'模式':>10} | {'cold(s)':>8} | {'warm(s)':>8}")
+
+        for label, serialize in (('serialized', True), ('per-host', False)):
+            config = SSHPoolConfig(enable_pool_monitoring=False, health_check_interval=3600,
+                                   validate_connection_on_borrow=True)
+            pool = SSHConnectionPool(config=config)
+            cold = borrow_all(pool, infos, args.threads, serialize)
+            warm = borrow_all(pool, infos, args.threads, serialize)
+            pool.close_all()
+            print(f"{label:>10} | {cold:>8.2f} | {warm:>8.2f}")
+
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身SSH服务器（仅用于基准测试）
+
+基于 paramiko 的服务端实现，在多个本地端口上监听，每个端口相当于一台独立主机。
+支持密码和公钥认证、exec 请求；可以给认证过程加入延迟来模拟远端握手耗时。
+exec 的命令不会真正执行，统一回显一行文本，health check 的 echo 也能得到正常响应。
+"""
+
+import socket
+import threading
+import time
+from typing import List, Optional
+
+import paramiko
+
+
+class _FakeServerInterface(paramiko.ServerInterface):
+    """接受任意用户名、固定密码或任意公钥的服务端接口"""
+
+    def __init__(self, password: str, auth_delay: float):
+        self.password = password
+        self.auth_delay = auth_delay
+        self.exec_commands = []
+        self.exec_event = threading.Event()
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_auth_password(self, username, password):
+        if self.auth_delay:
+            time.sleep(self.auth_delay)
+        return paramiko.AUTH_SUCCESSFUL if password == self.password else paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        if self.auth_delay:
+            time.sleep(self.auth_delay)
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_exec_request(self, channel, command):
+        self.exec_commands.append((channel, command))
+        self.exec_event.set()
+        return True
+
+
+class FakeSSHServer:
+    """在若干本地端口上运行的替身SSH服务器"""
+
+    def __init__(self, host_count: int = 1, password: str = 'bench', auth_delay: float = 0.0,
+                 command_delay: float = 0.0, host: str = '127.0.0.1'):
+        """
+        Args:
+            host_count: 监听的端口数（模拟的主机数）
+            password: 接受的密码
+            auth_delay: 每次认证的额外延迟（秒），模拟握手耗时
+            command_delay: 每条命令返回前的延迟（秒）
+            host: 监听地址
+        """
+        self.host = host
+        self.password = password
+        self.auth_delay = auth_delay
+        self.command_delay = command_delay
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.ports: List[int] = []
+        self.handshakes = 0
+        self._sockets: List[socket.socket] = []
+        self._transports: List[paramiko.Transport] = []
+        self._lock = threading.Lock()
+        self._running = False
+
+        for _ in range(host_count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, 0))
+            sock.listen(512)
+            self._sockets.append(sock)
+            self.ports.append(sock.getsockname()[1])
+
+    def start(self) -> 'FakeSSHServer':
+        """启动所有监听线程"""
+        self._running = True
+        for sock in self._sockets:
+            threading.Thread(target=self._accept_loop, args=(sock,), daemon=True).start()
+        return self
+
+    def stop(self):
+        """停止监听并断开所有连接"""
+        self._running = False
+        for sock in self._sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        with self._lock:
+            transports = list(self._transports)
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception:
+                pass
+
+    def drop_connections(self):
+        """断开当前所有已建立的连接（用于模拟连接中断）"""
+        with self._lock:
+            transports = list(self._transports)
+            self._transports.clear()
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self, sock: socket.socket):
+        while self._running:
+            try:
+                client, _ = sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle_client, args=(client,), daemon=True).start()
+
+    def _handle_client(self, client: socket.socket):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        server = _FakeServerInterface(self.password, self.auth_delay)
+        try:
+            transport.start_server(server=server)
+        except Exception:
+            return
+
+        with self._lock:
+            self.handshakes += 1
+            self._transports.append(transport)
+
+        while transport.is_active() and self._running:
+            channel = transport.accept(timeout=1)
+            if channel is None:
+                continue
+            threading.Thread(target=self._serve_channel, args=(server, channel), daemon=True).start()
+
+    def _serve_channel(self, server: _FakeServerInterface, channel: paramiko.Channel):
+        """等待该通道的 exec 请求并回显"""
+        command: Optional[bytes] = None
+        deadline = time.time() + 10
+        while command is None and time.time() < deadline:
+            for item in list(server.exec_commands):
+                if item[0] is channel:
+                    command = item[1]
+                    server.exec_commands.remove(item)
+                    break
+            else:
+                server.exec_event.wait(0.05)
+                server.exec_event.clear()
+
+        try:
+            if self.command_delay:
+                time.sleep(self.command_delay)
+            text = (command or b'').decode('utf-8', errors='ignore')
+            if text.startswith('echo '):
+                output = text[5:].strip().strip('\'"') + '\n'
+            else:
+                output = f'ok: {text}\n'
+            channel.sendall(output.encode())
+            channel.send_exit_status(0)
+        except Exception:
+            pass
+        finally:
+            channel.close()
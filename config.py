@@ -23,6 +23,13 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(_basedir, "instance", "host_monitor.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite连接配置: 每个新连接执行的PRAGMA（WAL模式、同步级别、等待写锁的超时、页缓存和mmap大小）
+    SQLITE_PROFILE_ENABLED = os.environ.get('SQLITE_PROFILE_ENABLED', 'True').lower() in ['true', '1', 'yes']
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 30000)
+    SQLITE_CACHE_SIZE_MB = int(os.environ.get('SQLITE_CACHE_SIZE_MB') or 64)
+    SQLITE_MMAP_SIZE_MB = int(os.environ.get('SQLITE_MMAP_SIZE_MB') or 256)
     
     # SSH配置
     SSH_TIMEOUT = int(os.environ.get('SSH_TIMEOUT') or 30)
@@ -59,7 +66,67 @@ class Config:
     
     # 性能配置
     MAX_CONCURRENT_MONITORS = int(os.environ.get('MAX_CONCURRENT_MONITORS') or 10)
+    # 巡视并发模式: fixed（固定为MAX_CONCURRENT_MONITORS）/ adaptive（按耗时、失败率和本机CPU自动调整，最大为MAX_CONCURRENT_MONITORS）
+    # 自适应模式会把主机连接失败也当作拥塞信号，大量主机不可达时巡视会变慢，因此默认使用固定并发
+    MONITOR_CONCURRENCY_MODE = os.environ.get('MONITOR_CONCURRENCY_MODE') or 'fixed'
+    # 自适应模式的初始并发数，默认与原固定线程池大小相同
+    ADAPTIVE_INITIAL_CONCURRENCY = int(os.environ.get('ADAPTIVE_INITIAL_CONCURRENCY') or 5)
+    ADAPTIVE_MIN_CONCURRENCY = int(os.environ.get('ADAPTIVE_MIN_CONCURRENCY') or 2)
+    # 一轮采集的P90耗时超过基线的倍数、失败率、本机CPU使用率（%）超过阈值时减半并发
+    ADAPTIVE_LATENCY_TOLERANCE = float(os.environ.get('ADAPTIVE_LATENCY_TOLERANCE') or 2.0)
+    ADAPTIVE_ERROR_RATE = float(os.environ.get('ADAPTIVE_ERROR_RATE') or 0.3)
+    ADAPTIVE_CPU_THRESHOLD = float(os.environ.get('ADAPTIVE_CPU_THRESHOLD') or 85)
     MONITOR_TIMEOUT = int(os.environ.get('MONITOR_TIMEOUT') or 300)
+    # 按主机数量和历史耗时延长巡视期限、提高初始并发，MONITOR_TIMEOUT 作为最短期限
+    MONITOR_DEADLINE_AUTO = os.environ.get('MONITOR_DEADLINE_AUTO', 'True').lower() in ['true', '1', 'yes']
+    # 按历史耗时从长到短安排主机提交顺序；连续失败达到次数的主机放到本轮最后
+    SWEEP_PRIORITY_ORDER = os.environ.get('SWEEP_PRIORITY_ORDER', 'True').lower() in ['true', '1', 'yes']
+    SWEEP_FAILURE_STREAK = int(os.environ.get('SWEEP_FAILURE_STREAK') or 3)
+    
+    # 主机巡视采集引擎: thread（线程池+paramiko）/ async（asyncio+asyncssh）
+    MONITOR_ENGINE = os.environ.get('MONITOR_ENGINE') or 'thread'
+    ASYNC_MONITOR_CONCURRENCY = int(os.environ.get('ASYNC_MONITOR_CONCURRENCY') or 500)
+    ASYNC_MONITOR_HOST_TIMEOUT = int(os.environ.get('ASYNC_MONITOR_HOST_TIMEOUT') or 60)
+    
+    # 磁盘采集: 远端按文件系统类型（df -x）和挂载点前缀过滤，逗号分隔
+    DISK_EXCLUDE_FSTYPES = os.environ.get('DISK_EXCLUDE_FSTYPES', 'tmpfs,devtmpfs,overlay,squashfs,nsfs,ramfs,efivarfs,fuse.lxcfs')
+    DISK_EXCLUDE_MOUNTS = os.environ.get('DISK_EXCLUDE_MOUNTS', '/dev,/run,/sys,/proc,/snap,/var/lib/docker,/var/lib/kubelet,/var/lib/containers')
+    # 磁盘信息存储: full（每次保存完整列表）/ delta（挂载点集合或使用率区间变化时保存完整快照，否则只保存有变化的挂载点）
+    DISK_STORAGE_MODE = os.environ.get('DISK_STORAGE_MODE') or 'delta'
+    DISK_USAGE_BUCKET = float(os.environ.get('DISK_USAGE_BUCKET') or 5)
+    DISK_FULL_SNAPSHOT_INTERVAL = int(os.environ.get('DISK_FULL_SNAPSHOT_INTERVAL') or 24)
+    
+    # 监控指标聚合: 按5分钟、1小时、1天粒度增量聚合，各粒度保留天数（0表示不清理），历史查询每台服务器的点数上限
+    ROLLUP_ENABLED = os.environ.get('ROLLUP_ENABLED', 'True').lower() in ['true', '1', 'yes']
+    ROLLUP_RETENTION_5M_DAYS = int(os.environ.get('ROLLUP_RETENTION_5M_DAYS') or 7)
+    ROLLUP_RETENTION_1H_DAYS = int(os.environ.get('ROLLUP_RETENTION_1H_DAYS') or 90)
+    ROLLUP_RETENTION_1D_DAYS = int(os.environ.get('ROLLUP_RETENTION_1D_DAYS') or 730)
+    ROLLUP_MAX_POINTS = int(os.environ.get('ROLLUP_MAX_POINTS') or 500)
+    
+    # 日志定期清理: 按主键范围分批删除过期的主机监控日志和服务监控日志，批与批之间让出写锁
+    RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', 'False').lower() in ['true', '1', 'yes']
+    RETENTION_MONITOR_LOG_DAYS = int(os.environ.get('RETENTION_MONITOR_LOG_DAYS') or 30)
+    RETENTION_SERVICE_LOG_DAYS = int(os.environ.get('RETENTION_SERVICE_LOG_DAYS') or 30)
+    RETENTION_INTERVAL_HOURS = float(os.environ.get('RETENTION_INTERVAL_HOURS') or 24)
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE') or 1000)
+    RETENTION_BATCH_PAUSE_MS = int(os.environ.get('RETENTION_BATCH_PAUSE_MS') or 50)
+    
+    # 巡视结果批量写入: 缓冲达到批量大小或等待超过刷新间隔（毫秒）时在一个事务中写库
+    RESULT_SINK_BATCH_SIZE = int(os.environ.get('RESULT_SINK_BATCH_SIZE') or 200)
+    RESULT_SINK_FLUSH_INTERVAL_MS = int(os.environ.get('RESULT_SINK_FLUSH_INTERVAL_MS') or 2000)
+    
+    # 服务监控模式: snapshot（每台服务器取一次进程表，本地匹配各服务）/ per_service（每个服务执行一次ps|grep）
+    SERVICE_MONITOR_MODE = os.environ.get('SERVICE_MONITOR_MODE') or 'snapshot'
+    # 服务监控并发服务器数，以及单台服务器的监控期限（秒）
+    SERVICE_MONITOR_MAX_WORKERS = int(os.environ.get('SERVICE_MONITOR_MAX_WORKERS') or 10)
+    SERVICE_MONITOR_SERVER_TIMEOUT = int(os.environ.get('SERVICE_MONITOR_SERVER_TIMEOUT') or 120)
+    # 自动重启后延迟复检的等待时间（秒）
+    SERVICE_RESTART_VERIFY_DELAY = float(os.environ.get('SERVICE_RESTART_VERIFY_DELAY') or 3)
+    
+    # 仪表板数据缓存时间（秒），巡视完成时自动失效，0表示不缓存
+    DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL') or 10)
+    # 已解密服务器密码的缓存时间（秒），服务器更新或删除时失效，0表示不缓存
+    CREDENTIAL_CACHE_TTL = float(os.environ.get('CREDENTIAL_CACHE_TTL') or 300)
     
     # 通知配置
     WEBHOOK_TIMEOUT = int(os.environ.get('WEBHOOK_TIMEOUT') or 30)
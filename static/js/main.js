@@ -5567,7 +5567,7 @@ function deleteAllLogs() {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            showAlert(`成功删除所有监控日志，共删除 ${data.deleted_count} 条记录`, 'success');
+            showAlert(data.message, 'success');
             clearLogsSelection();
             loadLogs(1, currentLogsFilters);
         } else {
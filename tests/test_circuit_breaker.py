@@ -0,0 +1,118 @@
+"""
+主机熔断测试
+"""
+
+import os
+import socket
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import paramiko
+
+from app.circuit_breaker import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitOpenError, HostCircuitBreaker, is_unreachable_error
+)
+
+HOST = '10.0.0.1:22'
+
+
+class HostCircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('app.circuit_breaker.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = HostCircuitBreaker(failure_threshold=3, open_timeout=60, max_open_timeout=200)
+
+    def _fail(self, times=1, error=None):
+        for _ in range(times):
+            self.breaker.before_attempt(HOST)
+            self.breaker.record_failure(HOST, error or socket.timeout('timed out'))
+
+    def _state(self):
+        return self.breaker.get_state(HOST)['state']
+
+    def test_opens_after_threshold(self):
+        self._fail(2)
+        self.assertEqual(self._state(), CIRCUIT_CLOSED)
+        self._fail()
+        self.assertEqual(self._state(), CIRCUIT_OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_attempt(HOST)
+        self.assertEqual(self.breaker.get_stats()['rejected_attempts'], 1)
+
+    def test_success_resets_failures(self):
+        self._fail(2)
+        self.breaker.record_success(HOST)
+        self._fail(2)
+        self.assertEqual(self._state(), CIRCUIT_CLOSED)
+
+    def test_single_probe_after_cooldown(self):
+        self._fail(3)
+        self.now += 60
+        self.breaker.before_attempt(HOST)
+        self.assertEqual(self._state(), CIRCUIT_HALF_OPEN)
+        # 探测进行中，其他请求仍被拒绝
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_attempt(HOST)
+
+        self.breaker.record_success(HOST)
+        self.assertEqual(self._state(), CIRCUIT_CLOSED)
+        self.assertEqual(self.breaker.get_stats()['hosts'], {})
+
+    def test_failed_probe_doubles_cooldown(self):
+        self._fail(3)
+        # 冷却时间加倍，不超过上限
+        for expected in (120, 200, 200):
+            self.now += 300
+            self._fail()
+            state = self.breaker.get_state(HOST)
+            self.assertEqual(state['state'], CIRCUIT_OPEN)
+            self.assertEqual(state['open_timeout'], expected)
+
+    def test_local_error_releases_probe(self):
+        self._fail(3)
+        self.now += 60
+        self.breaker.before_attempt(HOST)
+        self.breaker.record_failure(HOST, paramiko.AuthenticationException('bad password'))
+        self.assertEqual(self._state(), CIRCUIT_HALF_OPEN)
+        # 探测没有网络层面的结果，下一次请求可以立即探测
+        self.breaker.before_attempt(HOST)
+
+    def test_auth_failures_do_not_open(self):
+        self._fail(5, paramiko.AuthenticationException('bad password'))
+        self.assertEqual(self._state(), CIRCUIT_CLOSED)
+
+    def test_disabled(self):
+        breaker = HostCircuitBreaker(failure_threshold=1, enabled=False)
+        breaker.record_failure(HOST, socket.timeout('timed out'))
+        breaker.before_attempt(HOST)
+        self.assertEqual(breaker.get_state(HOST)['state'], CIRCUIT_CLOSED)
+
+
+class UnreachableErrorTest(unittest.TestCase):
+
+    def test_network_errors(self):
+        self.assertTrue(is_unreachable_error(socket.timeout('timed out')))
+        self.assertTrue(is_unreachable_error(ConnectionRefusedError(111, 'refused')))
+        self.assertTrue(is_unreachable_error(paramiko.SSHException('Error reading SSH protocol banner')))
+        self.assertFalse(is_unreachable_error(paramiko.AuthenticationException('bad password')))
+        self.assertFalse(is_unreachable_error(ValueError('bad config')))
+        self.assertFalse(is_unreachable_error(None))
+
+    def test_asyncssh_errors(self):
+        try:
+            import asyncssh
+        except ImportError:
+            self.skipTest('未安装asyncssh')
+        self.assertTrue(is_unreachable_error(asyncssh.ConnectionLost('lost')))
+        self.assertFalse(is_unreachable_error(asyncssh.PermissionDenied('denied')))
+
+
+if __name__ == '__main__':
+    unittest.main()
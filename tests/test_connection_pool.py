@@ -0,0 +1,161 @@
+"""
+SSH连接池测试
+用不产生网络连接的客户端替身验证每台主机的连接上限和共享连接的淘汰
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.ssh_manager import ConnectionInfo, SSHConnectionPool, SSHPoolExhaustedError
+from app.ssh_pool_config import SSHPoolConfig
+
+
+class FakeStream:
+
+    def read(self):
+        return b'health_check\n'
+
+
+class FakeTransport:
+
+    def __init__(self, client):
+        self.client = client
+
+    def is_active(self):
+        return not self.client.closed
+
+
+class FakeSSHClient:
+    """只记录调用的 paramiko.SSHClient 替身"""
+
+    instances = []
+
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        FakeSSHClient.instances.append(self)
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, **kwargs):
+        time.sleep(0.01)
+
+    def get_transport(self):
+        return FakeTransport(self)
+
+    def exec_command(self, command, timeout=None):
+        if not self.healthy:
+            raise EOFError('channel closed')
+        return None, FakeStream(), None
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**overrides):
+    settings = dict(
+        max_connections_per_server=2,
+        borrow_timeout=2,
+        health_check_interval=3600,
+        cleanup_interval=3600,
+        enable_pool_monitoring=False,
+        validate_connection_on_borrow=False,
+        multiplex_channels=False
+    )
+    settings.update(overrides)
+    return SSHConnectionPool(config=SSHPoolConfig(**settings))
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        FakeSSHClient.instances = []
+        patcher = mock.patch('app.ssh_manager.paramiko.SSHClient', FakeSSHClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.info = ConnectionInfo(host='10.0.0.1', port=22, username='root', password='secret')
+
+    def test_connections_bounded_per_host(self):
+        pool = make_pool()
+        self.addCleanup(pool.close_all)
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def borrow():
+            conn = pool.get_connection(self.info)
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            pool.return_connection(conn)
+
+        threads = [threading.Thread(target=borrow) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(len(FakeSSHClient.instances), 2)
+        self.assertEqual(pool.stats['pool_hits'], 6)
+
+    def test_borrow_timeout(self):
+        pool = make_pool(borrow_timeout=0.2)
+        self.addCleanup(pool.close_all)
+        held = [pool.get_connection(self.info), pool.get_connection(self.info)]
+
+        started = time.time()
+        with self.assertRaises(SSHPoolExhaustedError):
+            pool.get_connection(self.info)
+        self.assertGreaterEqual(time.time() - started, 0.2)
+
+        # 归还后等待方可以借到同一个连接
+        pool.return_connection(held[0])
+        self.assertIs(pool.get_connection(self.info), held[0])
+
+    def test_unhealthy_connection_closed_on_return(self):
+        pool = make_pool(validate_connection_on_return=True)
+        self.addCleanup(pool.close_all)
+        conn = pool.get_connection(self.info)
+        conn.client.healthy = False
+
+        pool.return_connection(conn)
+        self.assertTrue(conn.client.closed)
+        self.assertIsNot(pool.get_connection(self.info), conn)
+
+    def test_shared_connection_retired_after_last_borrower(self):
+        pool = make_pool(multiplex_channels=True, max_channels_per_transport=4, validate_connection_on_return=True)
+        self.addCleanup(pool.close_all)
+        first = pool.get_connection(self.info)
+        second = pool.get_connection(self.info)
+        self.assertIs(first, second)
+        self.assertEqual(first.borrow_count, 2)
+
+        # 一个借用方归还时检查失败：仍有共享借用方，只标记为不健康
+        first.client.healthy = False
+        pool.return_connection(first)
+        self.assertFalse(first.client.closed)
+        self.assertFalse(first.is_healthy)
+
+        # 不健康的连接不再借出
+        third = pool.get_connection(self.info)
+        self.assertIsNot(third, first)
+
+        # 最后一个借用方归还后关闭
+        pool.return_connection(second)
+        self.assertTrue(first.client.closed)
+        self.assertEqual(first.borrow_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+开机以来CPU平均值测试
+重启后首次巡视（或计数回绕）时CPU使用率以开机以来的累计值计算，不能用于阈值告警
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.cpu_sampler import ProcStatCPUSampler
+from app.monitor import HostMonitor
+
+THRESHOLDS = {'cpu_threshold': 80.0, 'memory_threshold': 85.0, 'disk_threshold': 90.0}
+
+
+def proc_stat(user, idle):
+    return f"cpu  {user} 0 0 {idle} 0 0 0 0\n"
+
+
+def apply(cpu_stats):
+    monitor_result = {'alerts': []}
+    metrics = {
+        'system_info': {},
+        'cpu_usage': cpu_stats['usage'],
+        'cpu_stats': cpu_stats,
+        'memory_info': None,
+        'disk_info': []
+    }
+    HostMonitor._apply_metrics(None, monitor_result, metrics, THRESHOLDS)
+    return monitor_result
+
+
+class CPUSinceBootTest(unittest.TestCase):
+
+    def test_first_sample_skips_threshold(self):
+        sampler = ProcStatCPUSampler()
+        cpu_stats = sampler.sample('10.0.0.1:22', proc_stat(900, 100))
+        self.assertEqual(cpu_stats['sample_type'], 'since_boot')
+
+        monitor_result = apply(cpu_stats)
+        self.assertEqual(monitor_result['cpu_usage'], 90.0)
+        self.assertEqual(monitor_result['cpu_sample_type'], 'since_boot')
+        self.assertEqual(monitor_result['alerts'], [])
+
+    def test_delta_sample_raises_alert(self):
+        sampler = ProcStatCPUSampler()
+        sampler.sample('10.0.0.1:22', proc_stat(100, 900))
+        cpu_stats = sampler.sample('10.0.0.1:22', proc_stat(190, 910))
+        self.assertEqual(cpu_stats['sample_type'], 'delta')
+
+        monitor_result = apply(cpu_stats)
+        self.assertEqual([alert['type'] for alert in monitor_result['alerts']], ['cpu'])
+
+    def test_counter_wrap_skips_threshold(self):
+        sampler = ProcStatCPUSampler()
+        sampler.sample('10.0.0.1:22', proc_stat(5000, 5000))
+        # 主机重启后计数变小
+        cpu_stats = sampler.sample('10.0.0.1:22', proc_stat(950, 50))
+        self.assertEqual(cpu_stats['sample_type'], 'since_boot')
+        self.assertEqual(apply(cpu_stats)['alerts'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
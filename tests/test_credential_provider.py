@@ -0,0 +1,63 @@
+"""
+凭据缓存测试
+"""
+
+import base64
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from cryptography.fernet import Fernet
+
+from app.credential_provider import CredentialProvider
+
+
+class CredentialProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = CredentialProvider(ttl=300)
+        self.key = Fernet.generate_key()
+
+    def _decrypt(self, encrypted_password):
+        return self.provider.decrypt(self.key, encrypted_password)
+
+    def test_fallback_key_not_cached(self):
+        loaded = []
+
+        def loader():
+            loaded.append(True)
+            return None if len(loaded) == 1 else self.key
+
+        temporary = self.provider.get_cipher_key(loader)
+        self.assertNotEqual(temporary, self.key)
+        # 配置修正后重新解析并缓存
+        self.assertEqual(self.provider.get_cipher_key(loader), self.key)
+        self.assertEqual(self.provider.get_cipher_key(loader), self.key)
+        self.assertEqual(len(loaded), 2)
+
+    def test_password_cached_until_server_updated(self):
+        encrypted = base64.b64encode(Fernet(self.key).encrypt(b'secret')).decode()
+        self.assertEqual(self.provider.get_password(1, 'v1', encrypted, self._decrypt), 'secret')
+        self.assertEqual(self.provider.get_password(1, 'v1', encrypted, self._decrypt), 'secret')
+        self.assertEqual(self.provider.get_stats()['hits'], 1)
+
+        self.provider.get_password(1, 'v2', encrypted, self._decrypt)
+        self.assertEqual(self.provider.get_stats()['misses'], 2)
+
+    def test_failed_decrypt_not_cached(self):
+        other_key = Fernet.generate_key()
+        encrypted = base64.b64encode(Fernet(other_key).encrypt(b'secret')).decode()
+
+        with self.assertRaises(Exception):
+            self.provider.get_password(1, 'v1', encrypted, self._decrypt)
+        self.assertEqual(self.provider.get_stats()['cached_passwords'], 0)
+
+        # 密钥修正后同一条记录可以正常解密
+        self.key = other_key
+        self.assertEqual(self.provider.get_password(1, 'v1', encrypted, self._decrypt), 'secret')
+
+
+if __name__ == '__main__':
+    unittest.main()
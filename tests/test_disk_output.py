@@ -0,0 +1,70 @@
+"""
+df 输出解析测试
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.ssh_manager import SSHConnectionManager, format_bytes
+
+# df -P -B1 的输出
+BYTES_LISTING = """Filesystem        1-blocks        Used   Available Capacity Mounted on
+/dev/vda1      42140479488 10737418240 31403061248      26% /
+/dev/vdb1     214748364800 128849018880 85899345920      60% /data
+"""
+
+# df -kP 的输出
+KB_LISTING = """Filesystem     1024-blocks     Used Available Capacity Mounted on
+/dev/vda1         41152812 10485760  30667052      26% /
+/dev/vdb1        209715200 125829120 83886080      60% /data
+"""
+
+
+class ParseDiskOutputTest(unittest.TestCase):
+
+    def test_bytes_listing(self):
+        disks = SSHConnectionManager._parse_disk_output(BYTES_LISTING)
+        self.assertEqual([disk['mounted_on'] for disk in disks], ['/', '/data'])
+        self.assertEqual(disks[1]['size_bytes'], 214748364800)
+        self.assertEqual(disks[1]['size'], '200G')
+        self.assertEqual(disks[1]['use_percent'], 60.0)
+
+    def test_kb_listing_converted_to_bytes(self):
+        disks = SSHConnectionManager._parse_disk_output(KB_LISTING)
+        self.assertEqual(disks[0]['used_bytes'], 10485760 * 1024)
+        self.assertEqual(disks[0]['used'], '10G')
+
+    def test_partial_failure_listing_deduplicated(self):
+        # 单个挂载点失败时 df 退出码为1，旧命令回退后会再输出一份列表
+        output = BYTES_LISTING + KB_LISTING
+        disks = SSHConnectionManager._parse_disk_output(output)
+        self.assertEqual([disk['mounted_on'] for disk in disks], ['/', '/data'])
+        self.assertEqual(disks[0]['size_bytes'], 42140479488)
+
+    def test_mount_point_with_spaces(self):
+        output = "Filesystem 1-blocks Used Available Capacity Mounted on\n" \
+                 "//nas/share 1073741824 536870912 536870912 50% /mnt/my share\n"
+        disks = SSHConnectionManager._parse_disk_output(output)
+        self.assertEqual(disks[0]['mounted_on'], '/mnt/my share')
+
+    def test_human_listing_has_no_bytes(self):
+        output = "Filesystem Size Used Avail Use% Mounted on\n/dev/vda1 40G 10G 30G 25% /\n"
+        disks = SSHConnectionManager._parse_disk_output(output)
+        self.assertEqual(disks[0]['size'], '40G')
+        self.assertNotIn('size_bytes', disks[0])
+
+
+class FormatBytesTest(unittest.TestCase):
+
+    def test_units(self):
+        self.assertEqual(format_bytes(512), '512')
+        self.assertEqual(format_bytes(1536), '1.5K')
+        self.assertEqual(format_bytes(20 * 1024 ** 3), '20G')
+        self.assertEqual(format_bytes(5 * 1024 ** 6), '5120P')
+
+
+if __name__ == '__main__':
+    unittest.main()
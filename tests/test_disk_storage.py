@@ -0,0 +1,132 @@
+"""
+磁盘信息增量存储测试
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config import Config
+from app.disk_storage import rebase_disk_dependents
+from app.models import db, DiskMetric, MonitorLog, Server, ServerLatestStatus
+from app.result_sink import build_monitor_log, persist_monitor_logs
+
+
+def make_result(server_id, monitor_time, data_percent):
+    return {
+        'server_id': server_id,
+        'monitor_time': monitor_time,
+        'status': 'success',
+        'cpu_usage': 20.0,
+        'memory_usage': 40.0,
+        'execution_time': 1.0,
+        'error_message': None,
+        'disk_info': [
+            {'filesystem': '/dev/vda1', 'size': '40G', 'used': '10G', 'available': '30G',
+             'use_percent': 25.0, 'mounted_on': '/'},
+            {'filesystem': '/dev/vdb1', 'size': '200G', 'used': '120G', 'available': '80G',
+             'use_percent': data_percent, 'mounted_on': '/data'}
+        ],
+        'system_info': {},
+        'alerts': []
+    }
+
+
+@mock.patch.multiple(Config, DISK_STORAGE_MODE='delta', DISK_USAGE_BUCKET=5, DISK_FULL_SNAPSHOT_INTERVAL=24)
+class DiskDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        db.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.server = Server(name='web', host='10.0.0.1', username='root')
+        self.session.add(self.server)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _poll(self, monitor_time, data_percent):
+        log = build_monitor_log(make_result(self.server.id, monitor_time, data_percent))
+        persist_monitor_logs(self.session, [log])
+        self.session.commit()
+        return log.id
+
+    def _metric_mounts(self, log_id):
+        return sorted(row.mounted_on for row in self.session.query(DiskMetric).filter_by(monitor_log_id=log_id))
+
+    def test_unchanged_mounts_saved_as_delta(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        snapshot_id = self._poll(start, 60.0)
+        delta_id = self._poll(start + timedelta(minutes=5), 61.0)
+
+        delta = self.session.get(MonitorLog, delta_id)
+        self.assertEqual(delta.disk_snapshot_id, snapshot_id)
+        self.assertEqual(self._metric_mounts(delta_id), ['/data'])
+        self.assertEqual([disk['use_percent'] for disk in delta.get_disk_info()], [25.0, 61.0])
+
+        # 使用率跨过区间时保存完整快照
+        full_id = self._poll(start + timedelta(minutes=10), 66.0)
+        self.assertIsNone(self.session.get(MonitorLog, full_id).disk_snapshot_id)
+
+    def test_full_snapshot_after_interval(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        with mock.patch.object(Config, 'DISK_FULL_SNAPSHOT_INTERVAL', 2):
+            ids = [self._poll(start + timedelta(minutes=5 * i), 60.0) for i in range(4)]
+        snapshot_ids = [self.session.get(MonitorLog, log_id).disk_snapshot_id for log_id in ids]
+        self.assertEqual(snapshot_ids, [None, ids[0], ids[0], None])
+
+    def test_mount_change_saves_full_snapshot(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        self._poll(start, 60.0)
+        result = make_result(self.server.id, start + timedelta(minutes=5), 60.0)
+        result['disk_info'].append({'filesystem': '/dev/vdc1', 'size': '10G', 'used': '1G', 'available': '9G',
+                                    'use_percent': 10.0, 'mounted_on': '/backup'})
+        log = build_monitor_log(result)
+        persist_monitor_logs(self.session, [log])
+        self.session.commit()
+        self.assertIsNone(log.disk_snapshot_id)
+        self.assertEqual(self._metric_mounts(log.id), ['/', '/backup', '/data'])
+
+    def test_full_mode_never_encodes(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        with mock.patch.object(Config, 'DISK_STORAGE_MODE', 'full'):
+            ids = [self._poll(start + timedelta(minutes=5 * i), 60.0) for i in range(3)]
+        self.assertTrue(all(self.session.get(MonitorLog, log_id).disk_snapshot_id is None for log_id in ids))
+
+    def test_delete_snapshot_rebases_dependents(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        snapshot_id = self._poll(start, 60.0)
+        first_id = self._poll(start + timedelta(minutes=5), 61.0)
+        second_id = self._poll(start + timedelta(minutes=10), 62.0)
+
+        # 同时删除快照和第一条增量，只改写第二条
+        self.assertEqual(rebase_disk_dependents(self.session, [snapshot_id, first_id]), 1)
+        for log_id in (snapshot_id, first_id):
+            self.session.delete(self.session.get(MonitorLog, log_id))
+        self.session.commit()
+        self.session.expire_all()
+
+        second = self.session.get(MonitorLog, second_id)
+        self.assertIsNone(second.disk_snapshot_id)
+        self.assertEqual([disk['use_percent'] for disk in second.get_disk_info()], [25.0, 62.0])
+        self.assertEqual(self._metric_mounts(second_id), ['/', '/data'])
+
+        status = self.session.get(ServerLatestStatus, self.server.id)
+        self.assertIsNone(status.disk_snapshot_id)
+
+        # 下一次巡视重新保存完整快照
+        next_id = self._poll(start + timedelta(minutes=15), 62.0)
+        self.assertIsNone(self.session.get(MonitorLog, next_id).disk_snapshot_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+迟到结果修正测试
+主机连续几轮采集超过巡视期限（先写入超时日志），实际结果随后到达时，
+应撤回超时累计的连续失败并把实际耗时计入平均耗时，巡视计划不再把它放到低优先级队列
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import db, MetricRollup, Server, ServerLatestStatus
+from app.result_sink import build_monitor_log, persist_monitor_logs, apply_late_result
+from app.rollups import rebuild_rollups
+from app.sweep_planner import plan_sweep_order
+
+
+def make_result(server_id, monitor_time, status='success', execution_time=1.0):
+    return {
+        'server_id': server_id,
+        'monitor_time': monitor_time,
+        'status': status,
+        'cpu_usage': 20.0 if status != 'timeout' else None,
+        'memory_usage': 40.0 if status != 'timeout' else None,
+        'execution_time': execution_time,
+        'error_message': '采集超时' if status == 'timeout' else None,
+        'disk_info': [{'filesystem': '/dev/vda1', 'size': '40G', 'used': '10G', 'available': '30G',
+                       'use_percent': 25.0, 'mounted_on': '/'}] if status != 'timeout' else [],
+        'system_info': {},
+        'alerts': []
+    }
+
+
+class LateResultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        db.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.slow = Server(name='slow', host='10.0.0.1', username='root')
+        self.fast = Server(name='fast', host='10.0.0.2', username='root')
+        self.session.add_all([self.slow, self.fast])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _poll(self, result):
+        persist_monitor_logs(self.session, [build_monitor_log(result)])
+        self.session.commit()
+
+    def test_repeated_timeouts_then_late_success(self):
+        start = datetime(2026, 1, 1, 8, 0, 0)
+        # 先各成功一次，建立耗时历史
+        self._poll(make_result(self.slow.id, start, execution_time=20.0))
+        self._poll(make_result(self.fast.id, start, execution_time=1.0))
+
+        for sweep in range(1, 5):
+            monitor_time = start + timedelta(minutes=5 * sweep)
+            self._poll(make_result(self.fast.id, monitor_time, execution_time=1.0))
+            # 期限到达时先写入超时日志
+            self._poll(make_result(self.slow.id, monitor_time, status='timeout', execution_time=30.0))
+            status = self.session.get(ServerLatestStatus, self.slow.id)
+            self.assertEqual(status.consecutive_failures, 1)
+
+            # 实际结果随后到达
+            self.assertTrue(apply_late_result(self.session, self.slow.id, monitor_time,
+                                              make_result(self.slow.id, monitor_time, execution_time=40.0)))
+            self.session.commit()
+
+            status = self.session.get(ServerLatestStatus, self.slow.id)
+            self.assertEqual(status.consecutive_failures, 0)
+            self.assertEqual(status.status, 'success')
+
+        # 每次迟到结果的实际耗时都计入了平均耗时
+        status = self.session.get(ServerLatestStatus, self.slow.id)
+        self.assertGreater(status.avg_execution_time, 35.0)
+
+        ordered, summary = plan_sweep_order(self.session, [self.fast, self.slow], failure_streak=3)
+        self.assertEqual([server.name for server in ordered], ['slow', 'fast'])
+        self.assertEqual(summary['low_priority_hosts'], [])
+
+    def test_late_result_adjusts_rollups(self):
+        monitor_time = datetime(2026, 1, 1, 8, 10, 0)
+        self._poll(make_result(self.slow.id, monitor_time - timedelta(minutes=5), execution_time=20.0))
+        self._poll(make_result(self.slow.id, monitor_time, status='timeout', execution_time=30.0))
+        self.assertTrue(apply_late_result(self.session, self.slow.id, monitor_time,
+                                          make_result(self.slow.id, monitor_time, execution_time=40.0)))
+        self.session.commit()
+
+        adjusted = {(row.resolution, row.bucket_start): row.to_dict() for row in self.session.query(MetricRollup)}
+        hour = adjusted[('1h', datetime(2026, 1, 1, 8, 0, 0))]
+        self.assertEqual((hour['sample_count'], hour['success_count'], hour['failed_count']), (2, 2, 0))
+        self.assertEqual(hour['cpu']['count'], 2)
+
+        # 按差值修正的结果与按原始日志重算一致
+        rebuild_rollups(self.session, [self.slow.id], monitor_time, monitor_time)
+        self.session.commit()
+        rebuilt = {(row.resolution, row.bucket_start): row.to_dict() for row in self.session.query(MetricRollup)}
+        self.assertEqual(rebuilt, adjusted)
+
+    def test_late_failure_keeps_streak(self):
+        monitor_time = datetime(2026, 1, 1, 8, 0, 0)
+        self._poll(make_result(self.slow.id, monitor_time, status='timeout', execution_time=30.0))
+
+        failed = make_result(self.slow.id, monitor_time, status='failed', execution_time=35.0)
+        self.assertTrue(apply_late_result(self.session, self.slow.id, monitor_time, failed))
+        self.session.commit()
+
+        status = self.session.get(ServerLatestStatus, self.slow.id)
+        self.assertEqual(status.consecutive_failures, 1)
+        self.assertIsNone(status.avg_execution_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+指标探针脚本测试
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.ssh_manager import (
+    SSHConnectionManager,
+    METRIC_PROBE_SCRIPT,
+    PROBE_SECTION_MARKER,
+    parse_probe_sections,
+    parse_probe_metrics,
+)
+
+PROBE_OUTPUT = f"""motd banner
+{PROBE_SECTION_MARKER}hostname
+web-01
+{PROBE_SECTION_MARKER}uptime
+ 10:00:00 up 3 days,  2 users,  load average: 0.10, 0.20, 0.30
+{PROBE_SECTION_MARKER}users
+{PROBE_SECTION_MARKER}proc_stat
+cpu  100 0 50 850 0 0 0 0
+cpu0 100 0 50 850 0 0 0 0
+{PROBE_SECTION_MARKER}cpu
+{PROBE_SECTION_MARKER}memory
+7976 3000 1000 4500
+{PROBE_SECTION_MARKER}disk
+Filesystem 1-blocks Used Available Capacity Mounted on
+/dev/vda1 42949672960 10737418240 32212254720 25% /
+{PROBE_SECTION_MARKER}end
+"""
+
+
+def run_locally(command, stdin_data=None):
+    """在本机用 /bin/sh 执行命令，返回与 execute_command 相同结构的结果"""
+    completed = subprocess.run(['/bin/sh', '-c', command], input=stdin_data, capture_output=True,
+                               text=True, timeout=30)
+    return {
+        'success': completed.returncode == 0,
+        'exit_code': completed.returncode,
+        'stdout': completed.stdout,
+        'stderr': completed.stderr,
+        'execution_time': 0
+    }
+
+
+class ParseProbeTest(unittest.TestCase):
+
+    def test_sections(self):
+        sections = parse_probe_sections(PROBE_OUTPUT)
+        # 第一个标记之前的登录横幅被忽略
+        self.assertNotIn('motd banner', ''.join(sections.values()))
+        self.assertEqual(sections['hostname'], 'web-01')
+        self.assertEqual(sections['users'], '')
+        self.assertIn('end', sections)
+
+    def test_truncated_output_has_no_end(self):
+        truncated = PROBE_OUTPUT.split(f'{PROBE_SECTION_MARKER}disk')[0]
+        self.assertNotIn('end', parse_probe_sections(truncated))
+
+    def test_metrics(self):
+        metrics = parse_probe_metrics(parse_probe_sections(PROBE_OUTPUT))
+        self.assertEqual(metrics['system_info']['hostname'], 'web-01')
+        self.assertEqual(metrics['system_info']['users'], '获取失败: 无输出')
+        self.assertIsNone(metrics['cpu_usage'])
+        self.assertTrue(metrics['proc_stat'].startswith('cpu '))
+        self.assertEqual(metrics['memory_info']['total_mb'], 7976)
+        self.assertEqual(metrics['memory_info']['usage_percent'], round(3000 / 7976 * 100, 2))
+        self.assertEqual([disk['mounted_on'] for disk in metrics['disk_info']], ['/'])
+        self.assertEqual(metrics['collection_mode'], 'probe')
+
+    def test_top_cpu_section(self):
+        sections = parse_probe_sections(PROBE_OUTPUT)
+        sections['cpu'] = '12.5'
+        self.assertEqual(parse_probe_metrics(sections)['cpu_usage'], 12.5)
+
+
+class CollectMetricsProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = SSHConnectionManager(use_pool=False)
+
+    def _execute(self, result):
+        self.manager.execute_command = lambda client, command, timeout=None, stdin_data=None: result
+
+    @unittest.skipUnless(os.path.exists('/proc/stat'), '需要Linux的 /proc/stat')
+    def test_script_runs_under_sh(self):
+        self.manager.execute_command = lambda client, command, timeout=None, stdin_data=None: \
+            run_locally(command, stdin_data)
+
+        first = self.manager.collect_metrics_probe(None, 'local:22')
+        self.assertIsNotNone(first)
+        self.assertEqual(first['cpu_stats']['sample_type'], 'since_boot')
+        self.assertIsNotNone(first['memory_info'])
+        self.assertTrue(first['disk_info'])
+
+        second = self.manager.collect_metrics_probe(None, 'local:22')
+        self.assertEqual(second['cpu_stats']['sample_type'], 'delta')
+
+    def test_incomplete_output_marks_host(self):
+        truncated = PROBE_OUTPUT.split(f'{PROBE_SECTION_MARKER}end')[0]
+        self._execute({'success': True, 'exit_code': 0, 'stdout': truncated, 'stderr': ''})
+        self.assertIsNone(self.manager.collect_metrics_probe(None, 'web:22'))
+        self.assertIn('web:22', self.manager.get_probe_unsupported_hosts())
+
+        self.assertEqual(self.manager.reset_probe_unsupported('web:22'), 1)
+        self.assertEqual(self.manager.get_probe_unsupported_hosts(), {})
+
+    def test_interrupted_run_does_not_mark_host(self):
+        self._execute({'success': False, 'exit_code': -1, 'stdout': '', 'stderr': '命令执行超时'})
+        self.assertIsNone(self.manager.collect_metrics_probe(None, 'web:22'))
+        self.assertEqual(self.manager.get_probe_unsupported_hosts(), {})
+
+    def test_script_sections(self):
+        # 每个指标一个分段，最后是结束标记
+        markers = [line for line in METRIC_PROBE_SCRIPT.splitlines() if PROBE_SECTION_MARKER in line]
+        self.assertTrue(markers[-1].endswith("end'"))
+        self.assertIn(f"echo '{PROBE_SECTION_MARKER}disk'", markers)
+
+
+if __name__ == '__main__':
+    unittest.main()
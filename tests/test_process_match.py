@@ -0,0 +1,77 @@
+"""
+进程表匹配测试
+在本地进程表快照中的匹配结果应与 ps aux | grep '<进程名>' | grep -v grep 一致
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.service_monitor import ServiceMonitorService, _grep_basic_regex_to_python
+
+PROCESS_LINES = [
+    "root       812  0.0  0.1  12345  6789 ?        Ss   08:00   0:00 nginx: master process /usr/sbin/nginx",
+    "www-data   813  0.2  0.3  23456  7890 ?        S    08:00   0:01 nginx: worker process",
+    "mysql     1024  5.1 12.0 987654 43210 ?        Ssl  08:00  10:00 /usr/sbin/mysqld --port=3306",
+    "app       2048  1.0  2.0 123456 54321 ?        Sl   08:01   1:00 java -Xmx2g -jar /opt/app(1).jar",
+    "app       2049  0.5  1.0 123456 54321 ?        Sl   08:01   0:30 python3 worker.py --queue=a+b",
+    "root      3000  0.0  0.0   6000   700 pts/0    S+   09:00   0:00 grep --color=auto nginx",
+]
+
+PATTERNS = [
+    'nginx',
+    'nginx: worker',
+    'mysqld.*3306',
+    'app(1)',
+    'a+b',
+    'python3\\|mysqld',
+    '[m]ysqld',
+    '[]x]',
+    'worker\\.py',
+    '^www-data',
+    'x\\{2\\}',
+    'redis',
+]
+
+
+def match(pattern):
+    return ServiceMonitorService._match_process_lines(PROCESS_LINES, pattern)
+
+
+class GrepRegexTest(unittest.TestCase):
+
+    def test_conversion(self):
+        self.assertEqual(_grep_basic_regex_to_python('a+b'), 'a\\+b')
+        self.assertEqual(_grep_basic_regex_to_python('app(1)'), 'app\\(1\\)')
+        self.assertEqual(_grep_basic_regex_to_python('a\\|b'), 'a|b')
+        self.assertEqual(_grep_basic_regex_to_python('x\\{2\\}'), 'x{2}')
+        # 方括号内的内容原样保留
+        self.assertEqual(_grep_basic_regex_to_python('[+?]'), '[+?]')
+        self.assertEqual(_grep_basic_regex_to_python('[]x]'), '[\\]x]')
+
+    def test_match_process_lines(self):
+        self.assertEqual([line.split()[1] for line in match('nginx')], ['812', '813'])
+        self.assertEqual([line.split()[1] for line in match('app(1)')], ['2048'])
+        self.assertEqual([line.split()[1] for line in match('a+b')], ['2049'])
+        self.assertEqual([line.split()[1] for line in match('python3\\|mysqld')], ['1024', '2049'])
+        self.assertEqual(match('redis'), [])
+
+    def test_invalid_pattern_falls_back_to_substring(self):
+        lines = ["root 1 0.0 0.0 1 1 ? S 08:00 0:00 weird[name"]
+        self.assertEqual(ServiceMonitorService._match_process_lines(lines, 'weird[name'), lines)
+
+    @unittest.skipUnless(shutil.which('grep'), '需要grep')
+    def test_same_as_grep(self):
+        text = '\n'.join(PROCESS_LINES) + '\n'
+        for pattern in PATTERNS:
+            completed = subprocess.run(['grep', '--', pattern], input=text, capture_output=True, text=True)
+            expected = [line for line in completed.stdout.splitlines() if 'grep' not in line]
+            self.assertEqual(match(pattern), expected, pattern)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+接口响应缓存测试
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.response_cache import TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('app.response_cache.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = 0
+
+    def _compute(self, value='fresh'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def test_hit_and_expire(self):
+        cache = TTLCache(10)
+        self.assertEqual(cache.get_or_compute('k', self._compute('a')), 'a')
+        self.now += 9
+        self.assertEqual(cache.get_or_compute('k', self._compute('b')), 'a')
+        self.assertEqual(self.calls, 1)
+
+        self.now += 2
+        self.assertEqual(cache.get_or_compute('k', self._compute('b')), 'b')
+        self.assertEqual(self.calls, 2)
+
+    def test_disabled(self):
+        cache = TTLCache(0)
+        cache.get_or_compute('k', self._compute())
+        cache.get_or_compute('k', self._compute())
+        self.assertEqual(self.calls, 2)
+
+    def test_not_cacheable(self):
+        cache = TTLCache(10)
+        error = {'error': 'db locked'}
+        self.assertIs(cache.get_or_compute('k', self._compute(error), lambda value: 'error' not in value), error)
+        self.assertEqual(cache.get_or_compute('k', self._compute('ok')), 'ok')
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidate(self):
+        cache = TTLCache(10)
+        cache.get_or_compute('k', self._compute('old'))
+        cache.invalidate()
+        self.assertEqual(cache.get_or_compute('k', self._compute('new')), 'new')
+
+    def test_stale_result_not_written_back(self):
+        cache = TTLCache(10)
+
+        # 计算过程中发生失效（例如巡视完成），计算结果基于失效前的数据
+        def compute_during_invalidate():
+            cache.invalidate()
+            return 'stale'
+
+        self.assertEqual(cache.get_or_compute('k', compute_during_invalidate), 'stale')
+        # 过期结果没有写回，下次请求重新计算
+        self.assertEqual(cache.get_or_compute('k', self._compute('new')), 'new')
+        self.assertEqual(cache.get_or_compute('k', self._compute('newer')), 'new')
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+监控指标聚合测试
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import db, MetricRollup, Server
+from app.result_sink import build_monitor_log, persist_monitor_logs
+from app.rollups import (
+    bucket_start, choose_resolution, choose_summary_resolution, query_metric_history, rebuild_rollups,
+    summarize_servers
+)
+
+
+def make_result(server_id, monitor_time, cpu, status='success'):
+    return {
+        'server_id': server_id,
+        'monitor_time': monitor_time,
+        'status': status,
+        'cpu_usage': cpu,
+        'memory_usage': 50.0 if cpu is not None else None,
+        'execution_time': 1.0,
+        'error_message': None,
+        'disk_info': [{'filesystem': '/dev/vda1', 'size': '40G', 'used': '10G', 'available': '30G',
+                       'use_percent': 25.0, 'mounted_on': '/'},
+                      {'filesystem': '/dev/vdb1', 'size': '200G', 'used': '140G', 'available': '60G',
+                       'use_percent': 70.0, 'mounted_on': '/data'}] if cpu is not None else [],
+        'system_info': {},
+        'alerts': []
+    }
+
+
+class BucketTest(unittest.TestCase):
+
+    def test_bucket_start(self):
+        moment = datetime(2026, 3, 4, 13, 47, 31, 500)
+        self.assertEqual(bucket_start('5m', moment), datetime(2026, 3, 4, 13, 45))
+        self.assertEqual(bucket_start('1h', moment), datetime(2026, 3, 4, 13, 0))
+        self.assertEqual(bucket_start('1d', moment), datetime(2026, 3, 4))
+
+    def test_choose_resolution(self):
+        now = datetime(2026, 3, 4, 12, 0)
+        self.assertEqual(choose_resolution(now - timedelta(hours=6), now, max_points=500, now=now), '5m')
+        # 点数超过上限时使用更粗的粒度
+        self.assertEqual(choose_resolution(now - timedelta(days=3), now, max_points=500, now=now), '1h')
+        # 超出5分钟粒度的保留期
+        self.assertEqual(choose_resolution(now - timedelta(days=8), now - timedelta(days=7, hours=23),
+                                           max_points=500, now=now), '1h')
+
+    def test_choose_summary_resolution(self):
+        now = datetime(2026, 3, 10)
+        self.assertEqual(choose_summary_resolution(datetime(2026, 3, 1), datetime(2026, 3, 8), now), '1d')
+        self.assertEqual(choose_summary_resolution(datetime(2026, 3, 8, 6), datetime(2026, 3, 9), now), '1h')
+        self.assertEqual(choose_summary_resolution(datetime(2026, 3, 9, 6, 5), datetime(2026, 3, 9, 7), now), '5m')
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_metric_summary(self):
+        row = MetricRollup(server_id=1, resolution='1h', bucket_start=datetime(2026, 1, 1))
+        for value in range(1, 101):
+            row.add_sample('success', {'cpu': value - 0.5, 'memory': None})
+        row.add_sample('failed', {})
+
+        summary = row.metric_summary('cpu')
+        self.assertEqual((summary['min'], summary['max'], summary['count']), (0.5, 99.5, 100))
+        self.assertEqual(summary['avg'], 50.0)
+        # 直方图区间宽度为1个百分点，P95取所在区间的上界
+        self.assertEqual(summary['p95'], 95.0)
+        self.assertIsNone(row.metric_summary('memory'))
+        self.assertEqual((row.sample_count, row.success_count, row.failed_count), (101, 100, 1))
+
+    def test_percentile_capped_by_max(self):
+        histogram = {'42': 10}
+        self.assertEqual(MetricRollup.histogram_percentile(histogram, 95, high=42.3), 42.3)
+        self.assertEqual(MetricRollup.histogram_percentile(histogram, 95), 43.0)
+        self.assertIsNone(MetricRollup.histogram_percentile({}, 95))
+
+    def test_p95_skewed_distribution(self):
+        row = MetricRollup(server_id=1, resolution='5m', bucket_start=datetime(2026, 1, 1))
+        for _ in range(94):
+            row.add_sample('success', {'cpu': 10.2})
+        for _ in range(6):
+            row.add_sample('warning', {'cpu': 97.0})
+        self.assertEqual(row.metric_summary('cpu')['p95'], 97.0)
+
+
+class RollupWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        db.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.server = Server(name='web', host='10.0.0.1', username='root')
+        self.session.add(self.server)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _recent_hour(self):
+        # 使用最近的时间，避免写入路径上的过期清理删除测试数据
+        return bucket_start('1d', datetime.now()) - timedelta(hours=16)
+
+    def _poll(self, monitor_time, cpu, status='success'):
+        persist_monitor_logs(self.session, [build_monitor_log(make_result(self.server.id, monitor_time, cpu, status))])
+        self.session.commit()
+
+    def _rollups(self):
+        return {(row.resolution, row.bucket_start): row.to_dict() for row in self.session.query(MetricRollup)}
+
+    def test_incremental_matches_rebuild(self):
+        start = self._recent_hour()
+        for index, cpu in enumerate([10.0, 30.0, None, 50.0, 70.0]):
+            self._poll(start + timedelta(minutes=4 * index), cpu, 'success' if cpu is not None else 'failed')
+
+        incremental = self._rollups()
+        hour = incremental[('1h', start)]
+        self.assertEqual((hour['sample_count'], hour['success_count'], hour['failed_count']), (5, 4, 1))
+        self.assertEqual(hour['cpu']['avg'], 40.0)
+        self.assertEqual(hour['disk']['max'], 70.0)
+        self.assertEqual(incremental[('5m', start)]['sample_count'], 2)
+
+        rebuild_rollups(self.session, [self.server.id], start, start + timedelta(hours=1))
+        self.session.commit()
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_history_and_summary(self):
+        start = self._recent_hour()
+        for index in range(4):
+            self._poll(start + timedelta(minutes=30 * index), 20.0 + index)
+
+        history = query_metric_history(self.session, self.server.id, start, start + timedelta(hours=2), '1h')
+        self.assertEqual([point['sample_count'] for point in history['points']], [2, 2])
+
+        summary = summarize_servers(self.session, start, start + timedelta(hours=2))
+        self.assertEqual(summary['resolution'], '1h')
+        stat = summary['server_stats'][0]
+        self.assertEqual((stat['total_checks'], stat['success_rate']), (4, 100.0))
+        self.assertEqual(stat['cpu']['max'], 23.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+巡视顺序规划测试
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import db, Server, ServerLatestStatus
+from app.monitor import HostMonitor
+from app.sweep_planner import plan_sweep_order
+from config import Config
+
+
+class PlanSweepOrderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        db.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _add_servers(self, history):
+        """history: 名称 -> (平均耗时, 连续失败次数)，为None时没有最新状态"""
+        servers = []
+        for name, item in history.items():
+            server = Server(name=name, host=f'10.0.0.{len(servers) + 1}', username='root')
+            self.session.add(server)
+            self.session.flush()
+            if item is not None:
+                self.session.add(ServerLatestStatus(
+                    server_id=server.id, avg_execution_time=item[0], consecutive_failures=item[1]
+                ))
+            servers.append(server)
+        self.session.commit()
+        return servers
+
+    def test_longest_expected_first(self):
+        servers = self._add_servers({
+            'fast': (1.0, 0), 'slow': (9.0, 0), 'new': None, 'medium': (4.0, 0)
+        })
+        ordered, plan = plan_sweep_order(self.session, servers)
+
+        # 没有历史的主机按中位数4.0估计，与medium相同时保持原顺序
+        self.assertEqual([server.name for server in ordered], ['slow', 'new', 'medium', 'fast'])
+        self.assertEqual((plan['known_hosts'], plan['unknown_hosts']), (3, 1))
+        self.assertEqual(plan['default_expected_time'], 4.0)
+        self.assertEqual(plan['expected_total_time'], 18.0)
+        self.assertEqual(plan['low_priority_hosts'], [])
+
+    def test_failing_hosts_last(self):
+        servers = self._add_servers({
+            'down': (30.0, 3), 'flaky': (20.0, 2), 'ok': (2.0, 0), 'dead': (5.0, 7)
+        })
+        ordered, plan = plan_sweep_order(self.session, servers, failure_streak=3)
+
+        self.assertEqual([server.name for server in ordered], ['flaky', 'ok', 'down', 'dead'])
+        self.assertEqual(plan['low_priority_hosts'], ['down', 'dead'])
+
+        # 0表示不区分连续失败的主机
+        ordered, plan = plan_sweep_order(self.session, servers, failure_streak=0)
+        self.assertEqual([server.name for server in ordered], ['down', 'flaky', 'dead', 'ok'])
+        self.assertEqual(plan['low_priority_hosts'], [])
+
+    def test_overdue_hosts_first(self):
+        servers = self._add_servers({'a': (1.0, 0), 'b': (8.0, 0), 'c': (3.0, 0), 'd': (2.0, 4)})
+        overdue = [servers[0].id, servers[2].id, servers[3].id]
+        ordered, plan = plan_sweep_order(self.session, servers, overdue_ids=overdue)
+
+        # 上一轮未开始的主机排在正常队列最前，但连续失败的主机仍在最后
+        self.assertEqual([server.name for server in ordered], ['c', 'a', 'b', 'd'])
+        self.assertEqual(plan['overdue_hosts'], ['c', 'a'])
+
+    def test_no_history(self):
+        servers = self._add_servers({'a': None, 'b': None})
+        ordered, plan = plan_sweep_order(self.session, servers)
+
+        self.assertEqual([server.name for server in ordered], ['a', 'b'])
+        self.assertEqual(plan['expected_total_time'], 0.0)
+
+
+class SweepBudgetTest(unittest.TestCase):
+
+    def test_budget(self):
+        with mock.patch.multiple(Config, MONITOR_TIMEOUT=60, MONITOR_DEADLINE_AUTO=True,
+                                 ADAPTIVE_INITIAL_CONCURRENCY=5):
+            # 没有历史耗时时使用配置
+            self.assertEqual(HostMonitor._sweep_budget(10, {'expected_total_time': 0.0}, 10), (60, None))
+            # 预计耗时在期限内
+            self.assertEqual(HostMonitor._sweep_budget(10, {'expected_total_time': 100.0}, 10), (60, 5))
+            # 预计耗时超过期限时延长，初始并发数不超过最大并发
+            deadline, initial = HostMonitor._sweep_budget(200, {'expected_total_time': 1200.0}, 10)
+            self.assertEqual((deadline, initial), (180.0, 10))
+
+        with mock.patch.multiple(Config, MONITOR_TIMEOUT=60, MONITOR_DEADLINE_AUTO=False):
+            self.assertEqual(HostMonitor._sweep_budget(200, {'expected_total_time': 1200.0}, 10), (60, None))
+
+
+if __name__ == '__main__':
+    unittest.main()